@@ -27,6 +27,13 @@ import time
 import json
 from pathlib import Path
 
+# pollKey (OpenCV >= 4.5) processa eventos da janela sem dormir 1ms como waitKey(1)
+if hasattr(cv2, 'pollKey'):
+    _ler_tecla = cv2.pollKey
+else:
+    def _ler_tecla():
+        return cv2.waitKey(1)
+
 
 class CameraVirtual:
     """
@@ -139,7 +146,7 @@ class CameraVirtual:
         """
         try:
             dados = np.load('mapa_mundo_processado.npz')
-            self.matriz_walkable = dados['walkable']
+            self.matriz_walkable = np.ascontiguousarray(dados['walkable'], dtype=np.bool_)
             self.mundo_largura = dados['dimensoes'][0]
             self.mundo_altura = dados['dimensoes'][1]
             print(f"   ✅ Matriz walkable carregada: {self.mundo_largura}x{self.mundo_altura}")
@@ -603,14 +610,24 @@ class VisualizadorCameraVirtual:
 
         # Carregar mapa mundo
         print(f"📖 Carregando mapa: {mapa_path}")
-        self.mapa_original = cv2.imread(mapa_path)
+        mapa = cv2.imread(mapa_path, cv2.IMREAD_COLOR)
 
-        if self.mapa_original is None:
+        if mapa is None:
             raise FileNotFoundError(f"Mapa não encontrado: {mapa_path}")
 
+        # BGR uint8 contíguo: desenho e restauração caem no caminho rápido
+        self.mapa_original = np.ascontiguousarray(mapa)
+        assert self.mapa_original.dtype == np.uint8 and self.mapa_original.shape[2] == 3
+
         self.mapa_altura, self.mapa_largura = self.mapa_original.shape[:2]
         print(f"   ✅ Mapa carregado: {self.mapa_largura}x{self.mapa_altura}")
 
+        # Imagem de trabalho reaproveitada entre frames: em vez de copiar
+        # o mapa inteiro a cada frame, só as regiões desenhadas no frame
+        # anterior são restauradas a partir do original
+        self._img = self.mapa_original.copy()
+        self._regioes_sujas = []
+
         # Configurações de visualização
         self.janela_nome = "Camera Virtual - Debug ao Vivo"
         self.zoom_level = 1.0
@@ -623,6 +640,10 @@ class VisualizadorCameraVirtual:
         self.cor_historico = (128, 128, 128)      # Cinza (histórico)
         self.cor_destino = (0, 255, 0)            # Verde (próximo destino)
 
+        # Texto do HUD pré-renderizado (só refaz quando algum valor muda)
+        self._hud_chave = None
+        self._hud_texto = None
+
         # Estado
         self.rodando = False
         self.proximo_destino = None
@@ -644,6 +665,23 @@ class VisualizadorCameraVirtual:
         self.rodando = False
         cv2.destroyWindow(self.janela_nome)
 
+    def _marcar_sujo(self, x1, y1, x2, y2, margem=0):
+        """Registra uma região desenhada neste frame (restaurada no próximo)"""
+        x1, x2 = min(x1, x2) - margem, max(x1, x2) + margem + 1
+        y1, y2 = min(y1, y2) - margem, max(y1, y2) + margem + 1
+        x1 = max(0, x1)
+        y1 = max(0, y1)
+        x2 = min(self.mapa_largura, x2)
+        y2 = min(self.mapa_altura, y2)
+        if x2 > x1 and y2 > y1:
+            self._regioes_sujas.append((x1, y1, x2, y2))
+
+    def _restaurar_regioes_sujas(self):
+        """Copia do mapa original só as regiões desenhadas no frame anterior"""
+        for x1, y1, x2, y2 in self._regioes_sujas:
+            np.copyto(self._img[y1:y2, x1:x2], self.mapa_original[y1:y2, x1:x2])
+        self._regioes_sujas = []
+
     def atualizar(self, destino=None):
         """
         Atualiza visualização
@@ -656,15 +694,16 @@ class VisualizadorCameraVirtual:
 
         self.proximo_destino = destino
 
-        # Criar imagem de visualização
-        img = self.mapa_original.copy()
+        # Imagem de visualização (limpa só onde o frame anterior desenhou)
+        self._restaurar_regioes_sujas()
+        img = self._img
 
         # 1. Desenhar histórico de posições
         if self.mostrar_historico and len(self.historico_posicoes) > 1:
-            for i in range(len(self.historico_posicoes) - 1):
-                p1 = self.historico_posicoes[i]
-                p2 = self.historico_posicoes[i + 1]
-                cv2.line(img, p1, p2, self.cor_historico, 2)
+            pontos = np.array(self.historico_posicoes, dtype=np.int32)
+            cv2.polylines(img, [pontos], False, self.cor_historico, 2)
+            (hx1, hy1), (hx2, hy2) = pontos.min(axis=0), pontos.max(axis=0)
+            self._marcar_sujo(int(hx1), int(hy1), int(hx2), int(hy2), margem=2)
 
         # 2. Desenhar campo de visão (RETÂNGULO amarelo - tela do jogo)
         if self.camera.pos_x is not None:
@@ -685,15 +724,12 @@ class VisualizadorCameraVirtual:
                 self.cor_campo_visao,
                 3
             )
+            self._marcar_sujo(x1, y1, x2, y2, margem=2)
 
             # 3. Desenhar posição atual (círculo magenta no centro)
-            cv2.circle(
-                img,
-                (int(self.camera.pos_x), int(self.camera.pos_y)),
-                8,
-                self.cor_posicao,
-                -1
-            )
+            px, py = int(self.camera.pos_x), int(self.camera.pos_y)
+            cv2.circle(img, (px, py), 8, self.cor_posicao, -1)
+            self._marcar_sujo(px, py, px, py, margem=9)
 
             # Adicionar ao histórico
             pos_atual = (int(self.camera.pos_x), int(self.camera.pos_y))
@@ -719,10 +755,13 @@ class VisualizadorCameraVirtual:
                     2,
                     cv2.LINE_AA
                 )
+                self._marcar_sujo(int(self.camera.pos_x), int(self.camera.pos_y),
+                                  int(dest_x), int(dest_y), margem=3)
 
             # Círculo no destino (vermelho se parede, verde se OK)
             cor_circulo = (0, 0, 255) if eh_parede else self.cor_destino
             cv2.circle(img, (int(dest_x), int(dest_y)), 6, cor_circulo, -1)
+            self._marcar_sujo(int(dest_x), int(dest_y), int(dest_x), int(dest_y), margem=7)
 
             # Texto da distância e status
             if self.camera.pos_x is not None:
@@ -739,15 +778,18 @@ class VisualizadorCameraVirtual:
                     texto = f"{dist_px:.0f}px (OK)"
                     cor_texto = self.cor_destino
 
+                tx, ty = int(dest_x) + 10, int(dest_y) - 10
                 cv2.putText(
                     img,
                     texto,
-                    (int(dest_x) + 10, int(dest_y) - 10),
+                    (tx, ty),
                     cv2.FONT_HERSHEY_SIMPLEX,
                     0.5,
                     cor_texto,
                     2
                 )
+                (tw, th), base = cv2.getTextSize(texto, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+                self._marcar_sujo(tx, ty - th, tx + tw, ty + base, margem=2)
 
         # 5. Adicionar HUD (informações)
         self._desenhar_hud(img)
@@ -762,7 +804,7 @@ class VisualizadorCameraVirtual:
         cv2.imshow(self.janela_nome, img)
 
         # 8. Processar teclas
-        key = cv2.waitKey(1) & 0xFF
+        key = _ler_tecla() & 0xFF  # 255 = nenhuma tecla
         if key == 27:  # ESC
             self.parar()
         elif key == ord('h') or key == ord('H'):
@@ -780,38 +822,75 @@ class VisualizadorCameraVirtual:
 
     def _desenhar_hud(self, img):
         """Desenha HUD com informações"""
-        y_offset = 30
+        # Fundo semi-transparente para HUD (só a região do painel: escurecer
+        # 70% = misturar com preto, sem copiar a imagem inteira)
+        hud = img[10:231, 10:401]
+        cv2.addWeighted(hud, 0.3, hud, 0, 0, hud)
+        self._marcar_sujo(10, 10, 400, 238)  # inclui descendentes da última linha
+
+        # Texto: re-renderizar só quando algum valor exibido mudar
+        cam = self.camera
+        chave = (
+            int(cam.pos_x) if cam.pos_x else None,
+            int(cam.pos_y) if cam.pos_y else None,
+            cam.tela_largura, cam.tela_altura, cam.pixels_por_tile_jogo,
+            int(cam.tiles_visiveis_x), int(cam.tiles_visiveis_y),
+            int(cam.fov_largura_mapa), int(cam.fov_altura_mapa),
+            round(cam.escala_x, 1),
+            cam.validacao_parede_ativa,
+            cam.movimentos_desde_gps, cam.max_movimentos_sem_gps,
+            len(self.historico_posicoes),
+            round(self.zoom_level, 1),
+        )
+        if chave != self._hud_chave:
+            self._hud_texto = self._renderizar_texto_hud(chave)
+            self._hud_chave = chave
 
-        # Fundo semi-transparente para HUD
-        overlay = img.copy()
-        cv2.rectangle(overlay, (10, 10), (400, 230), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, img, 0.3, 0, img)
+        # Texto branco sobre fundo escurecido: max() preserva o anti-aliasing
+        regiao = img[10:238, 10:401]
+        cv2.max(regiao, self._hud_texto, dst=regiao)
 
-        # Informações
-        validacao_status = "ON" if self.camera.validacao_parede_ativa else "OFF"
+    def _renderizar_texto_hud(self, chave):
+        """
+        Renderiza as linhas do HUD numa imagem preta do tamanho do painel
+
+        Args:
+            chave: Tupla de valores montada em _desenhar_hud
+
+        Returns:
+            Imagem BGR (228, 391, 3) com o texto em branco
+        """
+        (pos_x, pos_y, tela_w, tela_h, px_tile, tiles_x, tiles_y,
+         fov_w, fov_h, escala, validacao, gps, max_gps, historico, zoom) = chave
+
+        validacao_status = "ON" if validacao else "OFF"
         info_lines = [
             f"Camera Virtual - Debug ao Vivo",
-            f"Posicao: ({int(self.camera.pos_x) if self.camera.pos_x else '?'}, {int(self.camera.pos_y) if self.camera.pos_y else '?'})",
-            f"Tela: {self.camera.tela_largura}x{self.camera.tela_altura}px (1 tile = {self.camera.pixels_por_tile_jogo}px)",
-            f"FOV: {int(self.camera.tiles_visiveis_x)}x{int(self.camera.tiles_visiveis_y)} tiles = {int(self.camera.fov_largura_mapa)}x{int(self.camera.fov_altura_mapa)}px",
-            f"Escala mapa: {self.camera.escala_x:.1f}px/tile",
+            f"Posicao: ({pos_x if pos_x is not None else '?'}, {pos_y if pos_y is not None else '?'})",
+            f"Tela: {tela_w}x{tela_h}px (1 tile = {px_tile}px)",
+            f"FOV: {tiles_x}x{tiles_y} tiles = {fov_w}x{fov_h}px",
+            f"Escala mapa: {escala:.1f}px/tile",
             f"Validacao Parede: {validacao_status}",
-            f"GPS: {self.camera.movimentos_desde_gps}/{self.camera.max_movimentos_sem_gps}",
-            f"Historico: {len(self.historico_posicoes)} pos",
-            f"Zoom: {self.zoom_level:.1f}x"
+            f"GPS: {gps}/{max_gps}",
+            f"Historico: {historico} pos",
+            f"Zoom: {zoom:.1f}x"
         ]
 
+        # Coordenadas relativas ao canto (10, 10) do painel
+        texto = np.zeros((228, 391, 3), dtype=np.uint8)
+        y_offset = 20
         for i, line in enumerate(info_lines):
             cv2.putText(
-                img,
+                texto,
                 line,
-                (20, y_offset + i * 25),
+                (10, y_offset + i * 25),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.5,
                 (255, 255, 255),
                 1,
                 cv2.LINE_AA
             )
+        return texto
 
     def _aplicar_zoom(self, img):
         """Aplica zoom centralizado na câmera"""
@@ -1047,32 +1126,31 @@ if __name__ == "__main__":
         direcao = 'direita'  # 'direita', 'esquerda', 'cima', 'baixo'
         pixels_clique = 20  # Quantidade de PIXELS do clique (distância no mundo = 1 tile no mapa)
 
+        setas = {
+            'direita': '→',
+            'esquerda': '←',
+            'cima': '↑',
+            'baixo': '↓'
+        }
+        # Direção → deslocamento unitário (x, y)
+        direcoes_unitarias = {
+            'direita': (1, 0),
+            'esquerda': (-1, 0),
+            'cima': (0, -1),
+            'baixo': (0, 1)
+        }
+
         while visualizador.rodando:
             # Mostrar estado atual
-            setas = {
-                'direita': '→',
-                'esquerda': '←',
-                'cima': '↑',
-                'baixo': '↓'
-            }
-
             # Calcular em tiles para referência (1 tile = 32px)
             tiles_equiv = pixels_clique / 32.0
 
             print(f"\r[Direção: {setas[direcao]} {direcao.upper()}] [Pixels: {pixels_clique}px = {tiles_equiv:.2f} tiles] [FOV: {camera.fov_largura_mapa:.0f}x{camera.fov_altura_mapa:.0f}px]", end='', flush=True)
 
             # Calcular destino baseado na direção e pixels
-            destino_x = camera.pos_x
-            destino_y = camera.pos_y
-
-            if direcao == 'direita':
-                destino_x = camera.pos_x + pixels_clique
-            elif direcao == 'esquerda':
-                destino_x = camera.pos_x - pixels_clique
-            elif direcao == 'cima':
-                destino_y = camera.pos_y - pixels_clique
-            elif direcao == 'baixo':
-                destino_y = camera.pos_y + pixels_clique
+            dx, dy = direcoes_unitarias[direcao]
+            destino_x = camera.pos_x + dx * pixels_clique
+            destino_y = camera.pos_y + dy * pixels_clique
 
             # Atualizar visualizador com destino proposto
             visualizador.atualizar(destino=(destino_x, destino_y))
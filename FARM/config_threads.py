@@ -0,0 +1,41 @@
+"""
+Threads por estágio do Farm Bot
+
+numpy/OpenBLAS/MKL/OpenMP leem *_NUM_THREADS uma vez só, ao serem
+importados: configurar_threads() precisa rodar no ponto de entrada
+(farm_bot.py, farm_integrado.py) ANTES de qualquer import pesado.
+Este módulo não importa nada pesado no topo por esse motivo.
+
+Uso (topo do script, antes de numpy/cv2):
+    if __name__ == "__main__":
+        from config_threads import configurar_threads
+        configurar_threads()
+"""
+
+import os
+
+# Sobram ~3 núcleos para captura, decisão e OpenCV; o resto vai para a inferência
+THREADS_INFERENCIA = max(1, (os.cpu_count() or 4) - 3)
+
+# Um cvtColor de 1080p não precisa de 8 threads disputando núcleo com o YOLO
+THREADS_OPENCV = 2
+
+
+def configurar_threads():
+    """
+    Limita as threads de BLAS/OpenMP, OpenCV e torch
+
+    Variáveis já definidas no ambiente são respeitadas.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(THREADS_INFERENCIA))
+
+    import cv2
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(THREADS_OPENCV)
+
+    try:
+        import torch
+    except ImportError:  # ultralytics exportado (ONNX/OpenVINO) pode rodar sem torch
+        return
+    torch.set_num_threads(THREADS_INFERENCIA)
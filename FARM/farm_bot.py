@@ -17,25 +17,80 @@ Controles:
 Execute: python farm_bot.py
 """
 
+import os
+import sys
+from pathlib import Path
+
+# Threads por estágio: numpy/cv2/torch leem a configuração ao serem
+# importados, então o ponto de entrada configura antes de tudo
+if __name__ == "__main__":
+    from config_threads import configurar_threads
+    configurar_threads()
+
 import cv2
 import numpy as np
 import tkinter as tk
 from PIL import Image, ImageTk, ImageDraw, ImageFont
 from adbutils import adb
 from ultralytics import YOLO
+try:
+    import torch
+except ImportError:  # ultralytics exportado (ONNX/OpenVINO) pode rodar sem torch
+    torch = None
 import time
-import os
 import json
 import math
+import queue
+import threading
 from collections import deque
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Optional, Tuple, List
 from mapa_virtual_tempo import MapaVirtualComTempo
+from shell_persistente import ShellPersistente
+from farm_kernels import (NUMBA_DISPONIVEL, bgr_resize_to_rgb, nearest_and_actions,
+                          aquecer as aquecer_kernels)
 
+# fast_capture fica na raiz do projeto (um nível acima de FARM)
+sys.path.append(str(Path(__file__).parent.parent))
+from fast_capture import decodificar_screencap_raw
 
-@dataclass
+
+# Classes de mobs (qualquer outra classe é tratada como item, ex: coin)
+MOBS = ('crab', 'rat', 'crow', 'spider', 'skeleton', 'cobra', 'worm', 'scorpion')
+
+# Máximo de detecções por frame (mesmo padrão do ultralytics)
+MAX_DET = 300
+
+# Maior lote aceito na inferência em lote (ver ArcherFarmBot.lote_deteccao)
+LOTE_MAX_DETECCAO = 4
+
+# Conjuntos de buffers de detecção em rodízio: com o pipeline em threads,
+# até um lote inteiro fica na fila + 1 em uso pela decisão + 1 lote sendo escrito
+N_SLOTS_DET = 2 * LOTE_MAX_DETECCAO + 1
+
+# Buffers de frame em rodízio: fila de captura + lote no YOLO + fila de
+# detecção + 1 na decisão + 1 sendo escrito pela captura
+N_SLOTS_FRAME = 3 * LOTE_MAX_DETECCAO + 2
+
+# Frame "parado": diferença média por pixel (miniatura 64x36) abaixo deste
+# limiar reaproveita as detecções anteriores sem rodar o YOLO; no máximo
+# MAX_REUSO_DETECCOES frames seguidos, para não ficar cego a mudanças lentas
+TAMANHO_MINIATURA = (64, 36)
+LIMIAR_FRAME_PARADO = 1.0
+MAX_REUSO_DETECCOES = 10
+
+# Raio (px) para considerar que um mob é o mesmo alvo do frame anterior
+RAIO_RASTREIO_ALVO = 60
+
+
+@dataclass(frozen=True)
 class FarmConfig:
-    """Configurações do farm (carregadas de farm_config.json)"""
+    """
+    Configurações do farm (carregadas de farm_config.json)
+
+    Imutável: para alterar ranges use ArcherFarmBot.aplicar_config(),
+    que também atualiza o cache de escalares usado no hot path.
+    """
     tile_size: int
     screen_width: int
     screen_height: int
@@ -65,6 +120,31 @@ class FarmConfig:
         )
 
 
+@dataclass
+class Deteccoes:
+    """
+    Detecções de um frame em formato SoA (struct of arrays)
+
+    Os arrays são views dos buffers do bot, reaproveitados em rodízio
+    (ver N_SLOTS_DET). Distâncias ao player são calculadas uma vez, na
+    extração, e reaproveitadas por cerco, alvo, coins e desenho.
+    """
+    bboxes: np.ndarray      # (N, 4) int32 - x1, y1, x2, y2
+    confs: np.ndarray       # (N,) float32
+    classes: np.ndarray     # (N,) int32 - IDs do modelo
+    centros: np.ndarray     # (N, 2) int32
+    dist_px: np.ndarray     # (N,) float - distância ao centro da tela
+    dist_tiles: np.ndarray  # (N,) float
+    nomes: dict             # ID → nome da classe (dicionário do modelo)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def mascara(self, ids):
+        """Máscara booleana das detecções cujas classes estão em ids"""
+        return np.isin(self.classes, ids)
+
+
 class ArcherFarmBot:
     """Bot de farm para Arqueiro com kiting"""
 
@@ -80,10 +160,18 @@ class ArcherFarmBot:
             print("   Execute: python calibrate_tile.py")
             exit(1)
 
+        self._cachear_config()
+
         # Dispositivo e modelo
         self.model_path = model_path
         self.device = None
+        self.tap_shell = None  # Shell ADB persistente para os taps
         self.model = None
+        self.meia_precisao = False  # FP16 na GPU (ligado em carregar_modelo)
+        # Lado da entrada do YOLO (None = o do treino). O ultralytics faz o
+        # letterbox e devolve as caixas já na escala do frame original.
+        self.imgsz = None
+        self.screencap_raw = True  # Desliga sozinho se o formato cru não for reconhecido
 
         # Mapa Virtual com Rastreamento Temporal
         try:
@@ -103,6 +191,10 @@ class ArcherFarmBot:
         self.show_visualization = True
         self.debug_mode = False  # Mostra TODAS detecções com confiança
 
+        # Detecções do último frame processado (para quem roda junto com o
+        # pipeline e não pode capturar/detectar por conta própria)
+        self.ultimas_deteccoes = None
+
         # Alvo atual
         self.current_target = None
         self.target_lock_time = 0  # Timestamp de quando travou no alvo
@@ -142,9 +234,110 @@ class ArcherFarmBot:
             'scorpion': (255, 200, 0),
         }
 
+        # Buffers de detecção (SoA) reutilizados em rodízio
+        self._bbox_buf = np.empty((N_SLOTS_DET, MAX_DET, 4), dtype=np.int32)
+        self._conf_buf = np.empty((N_SLOTS_DET, MAX_DET), dtype=np.float32)
+        self._cls_buf = np.empty((N_SLOTS_DET, MAX_DET), dtype=np.int32)
+        self._centro_buf = np.empty((N_SLOTS_DET, MAX_DET, 2), dtype=np.int32)
+        self._slot_det = 0
+
+        # Captura sem alocação por frame: bytes crus do screencap lidos num
+        # bytearray reaproveitado e convertidos direto nos buffers BGR
+        self._raw_buf = bytearray()
+        self._frame_buf = [None] * N_SLOTS_FRAME  # alocados no 1º uso de cada slot
+        self._slot_frame = 0
+        self._screencap_stream = True  # False se o adbutils não expuser o socket
+
+        # Pipeline em threads (captura → detecção → decisão/display)
+        self.pipeline_ativo = False
+        self._parar_pipeline = threading.Event()
+        self._cap_q = None
+        self._det_q = None
+        self._threads_pipeline = []
+        # Limpo durante pausar_pipeline() (ex: GPS com o mapa aberto)
+        self._captura_liberada = threading.Event()
+        # Itens capturados antes disso são descartados (ver retomar_pipeline)
+        self._descartar_antes = 0.0
+        self.dropped_frames = 0  # Frames descartados por estarem velhos
+        # Idade máxima (s desde a captura) de um frame para o bot agir sobre
+        # ele: as filas bloqueiam quando a decisão trava (tap, GPS) e os
+        # frames presos nelas voltam velhos (ver _frame_fresco)
+        self.idade_max_frame = 0.5
+        # Frames por chamada do YOLO no pipeline (1..LOTE_MAX_DETECCAO).
+        # O bot só age sobre o frame mais novo, então o padrão é 1; lotes
+        # maiores só compensam em GPU quando todos os resultados interessam.
+        self.lote_deteccao = 1
+        self._ultimo_log_descartes = time.monotonic()
+
+        # Gate de frame parado (ver LIMIAR_FRAME_PARADO)
+        self._mini = np.empty((TAMANHO_MINIATURA[1], TAMANHO_MINIATURA[0], 3), dtype=np.uint8)
+        self._mini_anterior = np.empty_like(self._mini)
+        self._deteccoes_anteriores = None
+        self._reusos_seguidos = 0
+        self.frames_reaproveitados = 0
+
+        # Métricas do pipeline: tempo por estágio (média móvel exponencial)
+        # e tamanho das filas, logados a cada intervalo_log_pipeline segundos
+        self._ewma_cap = 0.0
+        self._ewma_det = 0.0
+        self._ewma_dec = 0.0
+        self.intervalo_log_pipeline = 5.0
+        self._ultimo_log_pipeline = time.monotonic()
+
+        # Nomes e IDs de classe (preenchidos em carregar_modelo)
+        self._nomes = {}
+        self._mob_ids = np.empty(0, dtype=np.int32)
+        self._coin_ids = np.empty(0, dtype=np.int32)
+
         # UI
         self.root = None
         self.canvas = None
+        self.photo = None  # PhotoImage único, atualizado com paste()
+        self._canvas_item = None
+
+        # Buffer RGB da visualização (já no tamanho da janela)
+        self._disp = None
+        self._disp_fonte = None  # (h, w) do frame que gerou o buffer
+        self._disp_escala = 1.0
+        self._disp_tick = 0
+        self.display_a_cada = 2  # Desenhar 1 a cada N frames (inferência segue no máximo)
+
+        # Processamento fora da thread do Tk: a thread de trabalho deixa a
+        # imagem pronta em _pending_img e o Tk só troca o PhotoImage
+        self._thread_processamento = None
+        self._lock_display = threading.Lock()
+        self._pending_img = None
+        self._janela_visivel = True  # Atualizado pela thread do Tk
+        self._tela_tamanho = (1920, 1080)  # Lido da janela em start()
+
+    def _cachear_config(self):
+        """
+        Copia escalares do FarmConfig para atributos simples do bot
+
+        Evita o lookup self.config.X (dois níveis de atributo) dentro
+        das funções chamadas para cada detecção em cada frame.
+        """
+        cfg = self.config
+        self._tile = cfg.tile_size
+        self._sw = cfg.screen_width
+        self._sh = cfg.screen_height
+        self._cx = cfg.center_x
+        self._cy = cfg.center_y
+        # float: assinatura estável para os kernels Numba
+        self._min_safe = float(cfg.min_safe_distance)
+        self._ideal = float(cfg.ideal_distance)
+        self._max_atk = float(cfg.max_attack_range)
+        self._aggro = float(cfg.aggro_range)
+
+    def aplicar_config(self, **alteracoes):
+        """
+        Altera campos da configuração (ex: ideal_distance=3.0)
+
+        FarmConfig é imutável, então cria uma cópia alterada e
+        recalcula o cache de escalares.
+        """
+        self.config = replace(self.config, **alteracoes)
+        self._cachear_config()
 
     def configurar_area_farm(self, center_screen_x, center_screen_y, radius_px):
         """
@@ -166,12 +359,24 @@ class ArcherFarmBot:
                 return False
 
             self.device = devices[0]
+            self.abrir_shell_tap()
             print(f"✅ Conectado: {self.device.serial}")
             return True
         except Exception as e:
             print(f"❌ Erro: {e}")
             return False
 
+    def abrir_shell_tap(self):
+        """
+        (Re)cria o shell persistente dos taps para o dispositivo atual
+
+        Chamar de novo se self.device for trocado (ex: dispositivo
+        compartilhado com o GPS no FarmIntegrado).
+        """
+        if self.tap_shell is not None:
+            self.tap_shell.fechar()
+        self.tap_shell = ShellPersistente(self.device)
+
     def carregar_modelo(self):
         """Carrega modelo YOLO"""
         try:
@@ -180,15 +385,135 @@ class ArcherFarmBot:
                 return False
 
             print(f"📦 Carregando modelo...")
-            self.model = YOLO(self.model_path)
+            if torch is not None and torch.cuda.is_available():
+                # GPU CUDA: inferência em FP16 (metade da banda, tensor cores)
+                self.model = YOLO(self.model_path)
+                self.meia_precisao = True
+                print(f"   ⚡ GPU: {torch.cuda.get_device_name(0)} (FP16)")
+            elif os.path.isdir(self._caminho_int8()):
+                # Só CPU: preferir o modelo INT8 do OpenVINO, se já exportado
+                self.model = YOLO(self._caminho_int8(), task='detect')
+                print(f"   ⚡ CPU: OpenVINO INT8 ({self._caminho_int8()})")
+            else:
+                self.model = YOLO(self.model_path)
+
+            # Comparar IDs inteiros em vez de nomes de classe por detecção
+            self._nomes = self.model.names
+            self._mob_ids = self.ids_de_classes(MOBS)
+            self._coin_ids = self.ids_de_classes(('coin',))
+
             print(f"✅ Modelo carregado!")
             return True
         except Exception as e:
             print(f"❌ Erro: {e}")
             return False
 
+    def _caminho_int8(self):
+        """Pasta gerada pelo export OpenVINO INT8 do ultralytics"""
+        return os.path.splitext(self.model_path)[0] + "_int8_openvino_model"
+
+    def exportar_int8_openvino(self, dados="calibration.yaml"):
+        """
+        Exporta o modelo para OpenVINO INT8 (uso em máquinas sem GPU)
+
+        A quantização é calibrada com as imagens do dataset em `dados`
+        (~200 screenshots representativos do jogo). Conferir o mAP num
+        conjunto separado antes de usar: aceitar se cair menos de 2%.
+        Depois de exportado, carregar_modelo passa a usar o INT8 sozinho.
+
+        Args:
+            dados: YAML de dataset do ultralytics com as imagens de calibração
+
+        Returns:
+            Caminho da pasta exportada, ou None se falhar
+        """
+        try:
+            print(f"📦 Exportando INT8 (OpenVINO) com calibração: {dados}")
+            caminho = YOLO(self.model_path).export(format='openvino', int8=True, data=dados)
+            print(f"✅ Modelo INT8 salvo em: {caminho}")
+            return caminho
+        except Exception as e:
+            print(f"❌ Erro ao exportar INT8: {e}")
+            return None
+
+    def ids_de_classes(self, nomes):
+        """Converte nomes de classe do modelo em array de IDs (int32)"""
+        nomes = set(nomes)
+        return np.array([i for i, nome in self._nomes.items() if nome in nomes],
+                        dtype=np.int32)
+
+    def _sem_deteccoes(self):
+        """Resultado vazio no mesmo formato de detectar_objetos"""
+        vazio = np.empty(0)
+        return Deteccoes(self._bbox_buf[0, :0], self._conf_buf[0, :0],
+                         self._cls_buf[0, :0], self._centro_buf[0, :0],
+                         vazio, vazio, self._nomes)
+
     def capturar_frame(self):
-        """Captura screenshot"""
+        """
+        Captura screenshot
+
+        Usa `screencap` sem -p: pixels RGBA crus + cabeçalho, sem o
+        custo de comprimir (no Android) e descomprimir (aqui) um PNG.
+        Se o formato cru não for reconhecido, volta para PNG.
+        """
+        if not self.screencap_raw:
+            return self._capturar_frame_png()
+
+        try:
+            raw = self._ler_screencap_raw()
+            img_bgr = decodificar_screencap_raw(raw, self._proximo_buffer_frame)
+            if img_bgr is None:
+                print("⚠️ screencap cru não reconhecido, usando PNG")
+                self.screencap_raw = False
+                return self._capturar_frame_png()
+
+            # IMPORTANTE: YOLO espera BGR
+            return img_bgr
+        except Exception as e:
+            print(f"❌ Erro ao capturar: {e}")
+            return None
+
+    def _ler_screencap_raw(self):
+        """
+        Lê a saída de `screencap` para o bytearray reaproveitado
+
+        Returns:
+            memoryview dos bytes lidos (válida até a próxima captura)
+        """
+        if self._screencap_stream:
+            try:
+                conn = self.device.shell("screencap", stream=True)
+                try:
+                    sock = conn.conn
+                    n = 0
+                    while True:
+                        if n == len(self._raw_buf):
+                            # Cresce só nos primeiros frames (tamanho estabiliza)
+                            self._raw_buf.extend(bytes(max(1 << 20, n)))
+                        lidos = sock.recv_into(memoryview(self._raw_buf)[n:])
+                        if lidos == 0:
+                            break
+                        n += lidos
+                finally:
+                    conn.close()
+                return memoryview(self._raw_buf)[:n]
+            except AttributeError:
+                print("⚠️ adbutils sem acesso ao socket, lendo screencap em bytes")
+                self._screencap_stream = False
+
+        return self.device.shell("screencap", encoding=None)
+
+    def _proximo_buffer_frame(self, height, width):
+        """Próximo buffer BGR do rodízio (realocado só se o tamanho mudar)"""
+        slot = self._slot_frame = (self._slot_frame + 1) % N_SLOTS_FRAME
+        buf = self._frame_buf[slot]
+        if buf is None or buf.shape[:2] != (height, width):
+            buf = self._frame_buf[slot] = np.empty((height, width, 3), dtype=np.uint8)
+        return buf
+
+    def _capturar_frame_png(self):
+        """Captura screenshot via PNG (screencap -p)"""
         try:
             screenshot_bytes = self.device.shell("screencap -p", encoding=None)
             if not screenshot_bytes or len(screenshot_bytes) < 100:
@@ -209,70 +534,113 @@ class ArcherFarmBot:
             return None
 
     def detectar_objetos(self, img):
-        """Detecta objetos na imagem"""
+        """
+        Detecta objetos na imagem (ou numa lista de imagens, em lote)
+
+        Args:
+            img: Frame BGR, ou lista de até LOTE_MAX_DETECCAO frames para
+                 uma única chamada do YOLO
+
+        Returns:
+            Deteccoes (ou uma lista, se img for lista). Os arrays são
+            views dos buffers pré-alocados, reaproveitados em rodízio
+            (N_SLOTS_DET conjuntos).
+        """
+        lote = isinstance(img, list)
         try:
-            if img is None or img.size == 0:
-                return []
+            if lote:
+                if not img:
+                    return []
+            elif img is None or img.size == 0:
+                return self._sem_deteccoes()
 
             # Threshold mais baixo para detectar mais (ajustável)
-            results = self.model(img, conf=0.25, verbose=False)
-
-            deteccoes = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf = float(box.conf[0].cpu().numpy())
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
-
-                    deteccoes.append({
-                        'class': class_name,
-                        'conf': conf,
-                        'bbox': (int(x1), int(y1), int(x2), int(y2))
-                    })
-
-            return deteccoes
+            extra = {'imgsz': self.imgsz} if self.imgsz else {}
+            results = self.model(img, conf=0.25, max_det=MAX_DET, verbose=False,
+                                 half=self.meia_precisao, **extra)
+
+            if lote:
+                return [self._extrair_deteccoes(result) for result in results]
+            return self._extrair_deteccoes(results[0])
         except Exception as e:
             print(f"❌ Erro na detecção: {e}")
-            return []
+            if lote:
+                return [self._sem_deteccoes() for _ in img]
+            return self._sem_deteccoes()
+
+    def detectar_se_mudou(self, img):
+        """
+        detectar_objetos, mas pulando o YOLO se o frame quase não mudou
+
+        Compara uma miniatura 64x36 com a do frame anterior (custo < 1ms);
+        se a diferença média ficar abaixo de LIMIAR_FRAME_PARADO, devolve
+        as detecções do frame anterior.
+        """
+        if img is None or img.size == 0:
+            return self._sem_deteccoes()
+
+        cv2.resize(img, TAMANHO_MINIATURA, dst=self._mini, interpolation=cv2.INTER_AREA)
+
+        if (self._deteccoes_anteriores is not None
+                and self._reusos_seguidos < MAX_REUSO_DETECCOES
+                and cv2.norm(self._mini, self._mini_anterior, cv2.NORM_L1) < LIMIAR_FRAME_PARADO * self._mini.size):
+            self._reusos_seguidos += 1
+            self.frames_reaproveitados += 1
+            return self._deteccoes_anteriores
+
+        deteccoes = self.detectar_objetos(img)
+        self._mini, self._mini_anterior = self._mini_anterior, self._mini
+        self._deteccoes_anteriores = deteccoes
+        self._reusos_seguidos = 0
+        return deteccoes
+
+    def _extrair_deteccoes(self, result):
+        """Copia as caixas de um Result do YOLO para o próximo slot de buffers"""
+        boxes = result.boxes
+        n = len(boxes)
+        if n == 0:
+            return self._sem_deteccoes()
+
+        # Uma única transferência GPU→CPU (uma sincronização por frame):
+        # data = [x1, y1, x2, y2, (track_id), conf, cls]
+        data = boxes.data.cpu().numpy()
+
+        # Próximo conjunto de buffers (o anterior pode estar na fila)
+        slot = self._slot_det = (self._slot_det + 1) % N_SLOTS_DET
+        bboxes = self._bbox_buf[slot, :n]
+        confs = self._conf_buf[slot, :n]
+        cls_ids = self._cls_buf[slot, :n]
+        centros = self._centro_buf[slot, :n]
+
+        # Cast para int32 trunca igual ao int() usado antes
+        bboxes[:] = data[:, :4]
+        confs[:] = data[:, -2]
+        cls_ids[:] = data[:, -1]
+
+        # Centros de todas as caixas de uma vez: ((x1+x2)//2, (y1+y2)//2)
+        np.floor_divide(bboxes[:, :2] + bboxes[:, 2:], 2, out=centros)
+
+        # Distâncias ao player (centro da tela), usadas por todo o frame
+        dist_px = np.hypot(centros[:, 0] - self._cx, centros[:, 1] - self._cy)
+
+        return Deteccoes(bboxes, confs, cls_ids, centros,
+                         dist_px, dist_px / self._tile, self._nomes)
 
     def detectar_cerco(self, deteccoes):
         """
         Detecta se está sendo cercado por mobs (PERIGOSO!)
         Retorna (cercado, num_mobs_proximos, direcao_fuga)
         """
-        mobs = [d for d in deteccoes if d['class'] in ['crab', 'rat', 'crow', 'spider', 'skeleton', 'cobra', 'worm', 'scorpion']]
-
-        # Contar mobs a 1 tile de distância
-        mobs_muito_proximos = []
-        for mob in mobs:
-            dist_px, dist_tiles = self.calcular_distancia(mob['bbox'])
-            if dist_tiles <= 1.0:
-                x1, y1, x2, y2 = mob['bbox']
-                mob_center_x = (x1 + x2) // 2
-                mob_center_y = (y1 + y2) // 2
-                mobs_muito_proximos.append({
-                    'bbox': mob['bbox'],
-                    'center': (mob_center_x, mob_center_y),
-                    'dist': dist_tiles
-                })
-
-        num_proximos = len(mobs_muito_proximos)
+        # Mobs a 1 tile de distância
+        proximos = deteccoes.mascara(self._mob_ids) & (deteccoes.dist_tiles <= 1.0)
+        num_proximos = int(np.count_nonzero(proximos))
 
         # 3+ mobs a 1 tile = CERCO PERIGOSO!
         if num_proximos >= 3:
             # Calcular direção média dos mobs (para fugir na direção oposta)
-            avg_dx = 0
-            avg_dy = 0
-            for mob in mobs_muito_proximos:
-                dx = mob['center'][0] - self.config.center_x
-                dy = mob['center'][1] - self.config.center_y
-                avg_dx += dx
-                avg_dy += dy
-
-            avg_dx /= num_proximos
-            avg_dy /= num_proximos
+            centros = deteccoes.centros[proximos]
+            avg_dx = float(centros[:, 0].mean()) - self._cx
+            avg_dy = float(centros[:, 1].mean()) - self._cy
 
             # Direção de fuga: oposta aos mobs
             fuga_dx = -avg_dx
@@ -285,9 +653,9 @@ class ArcherFarmBot:
                 fuga_dy /= dist
 
             # Ponto de fuga: 3 tiles na direção oposta
-            fuga_distance = self.config.tile_size * 3.0
-            fuga_x = int(self.config.center_x + fuga_dx * fuga_distance)
-            fuga_y = int(self.config.center_y + fuga_dy * fuga_distance)
+            fuga_distance = self._tile * 3.0
+            fuga_x = int(self._cx + fuga_dx * fuga_distance)
+            fuga_y = int(self._cy + fuga_dy * fuga_distance)
 
             return True, num_proximos, (fuga_x, fuga_y)
 
@@ -301,24 +669,24 @@ class ArcherFarmBot:
 
         # Distância euclidiana até o centro da tela (player)
         dist_px = math.sqrt(
-            (mob_center_x - self.config.center_x) ** 2 +
-            (mob_center_y - self.config.center_y) ** 2
+            (mob_center_x - self._cx) ** 2 +
+            (mob_center_y - self._cy) ** 2
         )
 
         # Converter para tiles
-        dist_tiles = dist_px / self.config.tile_size
+        dist_tiles = dist_px / self._tile
 
         return dist_px, dist_tiles
 
     def classificar_zona(self, dist_tiles):
         """Classifica em qual zona o mob está"""
-        if dist_tiles < self.config.min_safe_distance:
+        if dist_tiles < self._min_safe:
             return "MUITO_PERTO"  # Recuar
-        elif dist_tiles <= self.config.ideal_distance:
+        elif dist_tiles <= self._ideal:
             return "IDEAL"  # Atacar
-        elif dist_tiles <= self.config.max_attack_range:
+        elif dist_tiles <= self._max_atk:
             return "ATACAVEL"  # Aproximar um pouco
-        elif dist_tiles <= self.config.aggro_range:
+        elif dist_tiles <= self._aggro:
             return "AGGRO"  # Ir até o mob
         else:
             return "MUITO_LONGE"  # Ignorar
@@ -331,24 +699,34 @@ class ArcherFarmBot:
         current_time = time.time()
 
         # Filtrar apenas mobs (não coins)
-        mobs = [d for d in deteccoes if d['class'] in ['crab', 'rat', 'crow', 'spider', 'skeleton', 'cobra', 'worm', 'scorpion']]
+        mobs = np.flatnonzero(deteccoes.mascara(self._mob_ids))
 
-        if not mobs:
+        if mobs.size == 0:
             self.current_target = None
             return None
 
-        # Calcular distâncias
-        mobs_com_info = []
-        for mob in mobs:
-            dist_px, dist_tiles = self.calcular_distancia(mob['bbox'])
-            zona = self.classificar_zona(dist_tiles)
-
-            mobs_com_info.append({
-                'mob': mob,
-                'dist_px': dist_px,
-                'dist_tiles': dist_tiles,
-                'zona': zona
-            })
+        # Distâncias já calculadas na extração
+        bboxes = deteccoes.bboxes
+        cls_ids = deteccoes.classes
+        cx = deteccoes.centros[mobs, 0]
+        cy = deteccoes.centros[mobs, 1]
+        dist_px = deteccoes.dist_px[mobs]
+        dist_tiles = deteccoes.dist_tiles[mobs]
+        mob_cls = cls_ids[mobs]
+
+        def info(j):
+            """Monta dict do alvo (só para o mob escolhido)"""
+            i = mobs[j]
+            cls_id = int(cls_ids[i])
+            return {
+                'cls_id': cls_id,
+                'classe': self._nomes[cls_id],
+                'bbox': tuple(bboxes[i].tolist()),
+                'center': (int(cx[j]), int(cy[j])),
+                'dist_px': float(dist_px[j]),
+                'dist_tiles': float(dist_tiles[j]),
+                'zona': self.classificar_zona(dist_tiles[j])
+            }
 
         # PERSISTÊNCIA: Se tem alvo atual e ainda está visível, manter por um tempo
         if self.current_target is not None:
@@ -356,37 +734,37 @@ class ArcherFarmBot:
 
             # Se ainda não passou o tempo de lock, verificar se alvo atual ainda existe
             if time_locked < self.target_lock_duration:
-                # Procurar alvo atual nas detecções
-                for mob_info in mobs_com_info:
-                    if mob_info['mob']['class'] == self.current_target['mob']['class']:
-                        # Verificar se é aproximadamente a mesma posição (dentro de 50px)
-                        if mob_info['dist_px'] - self.current_target['dist_px'] < 50:
-                            # Manter alvo atual
-                            return mob_info
+                # Mob da mesma classe com centro mais próximo do centro anterior
+                # (comparar só o raio confundia mobs iguais à mesma distância)
+                tx, ty = self.current_target['center']
+                d2 = (cx - tx) ** 2 + (cy - ty) ** 2
+                d2 = np.where(mob_cls == self.current_target['cls_id'], d2, np.iinfo(np.int32).max)
+                j = int(np.argmin(d2))
+                if d2[j] < RAIO_RASTREIO_ALVO ** 2:
+                    # Manter alvo atual
+                    return info(j)
 
         # Trocar de alvo ou selecionar novo
         self.target_lock_time = current_time
 
-        # Prioridade: mobs na zona IDEAL, depois mais próximos
-        ideal = [m for m in mobs_com_info if m['zona'] == 'IDEAL']
-        if ideal:
-            return min(ideal, key=lambda m: m['dist_px'])
+        # Prioridade: IDEAL, depois ATACAVEL, depois AGGRO (ir até ele);
+        # dentro de cada zona, o mais próximo
+        if NUMBA_DISPONIVEL:
+            j, _ = nearest_and_actions(dist_px, dist_tiles, self._min_safe,
+                                       self._ideal, self._max_atk, self._aggro)
+            return info(int(j))
 
-        # Se nenhum ideal, pegar zona ATACAVEL
-        atacavel = [m for m in mobs_com_info if m['zona'] == 'ATACAVEL']
-        if atacavel:
-            return min(atacavel, key=lambda m: m['dist_px'])
+        ideal = (dist_tiles >= self._min_safe) & (dist_tiles <= self._ideal)
+        atacavel = (dist_tiles > self._ideal) & (dist_tiles <= self._max_atk)
+        aggro = (dist_tiles > self._max_atk) & (dist_tiles <= self._aggro)
 
-        # Se nenhum atacável, pegar AGGRO (ir até ele)
-        aggro = [m for m in mobs_com_info if m['zona'] == 'AGGRO']
-        if aggro:
-            return min(aggro, key=lambda m: m['dist_px'])
+        for zona in (ideal, atacavel, aggro):
+            candidatos = np.flatnonzero(zona)
+            if candidatos.size:
+                return info(candidatos[np.argmin(dist_px[candidatos])])
 
         # Se nenhum, pegar o mais próximo (mesmo que MUITO_PERTO)
-        if mobs_com_info:
-            return min(mobs_com_info, key=lambda m: m['dist_px'])
-
-        return None
+        return info(int(np.argmin(dist_px)))
 
     def calcular_ponto_kite(self, mob_bbox, kite_type="strafe", combat_style="ranged"):
         """
@@ -402,8 +780,8 @@ class ArcherFarmBot:
         mob_center_y = (y1 + y2) // 2
 
         # Vetor do mob para o player
-        dx = self.config.center_x - mob_center_x
-        dy = self.config.center_y - mob_center_y
+        dx = self._cx - mob_center_x
+        dy = self._cy - mob_center_y
 
         # Distância atual
         dist = math.sqrt(dx**2 + dy**2)
@@ -420,13 +798,13 @@ class ArcherFarmBot:
 
             if kite_type == "back":
                 # Emergência: recuar um pouco
-                kite_distance = self.config.tile_size * 1.5
-                kite_x = self.config.center_x + int(dx_norm * kite_distance)
-                kite_y = self.config.center_y + int(dy_norm * kite_distance)
+                kite_distance = self._tile * 1.5
+                kite_x = self._cx + int(dx_norm * kite_distance)
+                kite_y = self._cy + int(dy_norm * kite_distance)
             else:
                 # Movimento circular: orbitar ao redor do mob
                 # Distância fixa de 1 tile (alcance melee)
-                ideal_distance = self.config.tile_size * 1.0
+                ideal_distance = self._tile * 1.0
 
                 # Incrementar ângulo para movimento circular
                 self.kite_angle += 45  # 45 graus por movimento
@@ -447,13 +825,13 @@ class ArcherFarmBot:
             # RANGED (ARQUEIRO/MAGO): Movimento original
             if kite_type == "back":
                 # Recuar direto (para emergências - mob muito perto)
-                kite_distance = self.config.tile_size * 2.5
-                kite_x = self.config.center_x + int(dx_norm * kite_distance)
-                kite_y = self.config.center_y + int(dy_norm * kite_distance)
+                kite_distance = self._tile * 2.5
+                kite_x = self._cx + int(dx_norm * kite_distance)
+                kite_y = self._cy + int(dy_norm * kite_distance)
 
             else:  # strafe (movimento lateral/circular)
                 # Distância ideal: 2.5 tiles (sweet spot para arqueiro)
-                ideal_distance = self.config.tile_size * 2.5
+                ideal_distance = self._tile * 2.5
 
                 # Se muito perto, aumentar distância
                 # Se muito longe, diminuir distância
@@ -483,12 +861,12 @@ class ArcherFarmBot:
                     combined_dy /= combined_dist
 
                 # Calcular ponto de kite
-                kite_x = self.config.center_x + int(combined_dx * target_distance)
-                kite_y = self.config.center_y + int(combined_dy * target_distance)
+                kite_x = self._cx + int(combined_dx * target_distance)
+                kite_y = self._cy + int(combined_dy * target_distance)
 
         # Garantir que está dentro da tela
-        kite_x = max(100, min(self.config.screen_width - 100, kite_x))
-        kite_y = max(100, min(self.config.screen_height - 100, kite_y))
+        kite_x = max(100, min(self._sw - 100, kite_x))
+        kite_y = max(100, min(self._sh - 100, kite_y))
 
         return kite_x, kite_y
 
@@ -510,8 +888,16 @@ class ArcherFarmBot:
 
     def executar_tap_direto(self, x, y):
         """Executa tap direto no dispositivo (sem validação)"""
+        comando = f"input tap {x} {y}"
         try:
-            self.device.shell(f"input tap {x} {y}")
+            if self.tap_shell is not None:
+                try:
+                    self.tap_shell.enviar(comando)
+                    return True
+                except Exception as e:
+                    print(f"⚠️ Shell persistente falhou ({e}), usando adb shell")
+                    self.tap_shell = None
+            self.device.shell(comando)
             return True
         except Exception as e:
             print(f"❌ Erro ao executar tap: {e}")
@@ -522,20 +908,21 @@ class ArcherFarmBot:
         try:
             # ZONA MORTA: Não clicar muito perto do personagem (centro da tela)
             # para evitar abrir menu do personagem
-            dx = x - self.config.center_x
-            dy = y - self.config.center_y
-            dist_from_center = math.sqrt(dx**2 + dy**2)
+            dx = x - self._cx
+            dy = y - self._cy
+            dist_sq = dx * dx + dy * dy
 
             # Raio da zona morta: ~80 pixels (personagem + margem de segurança)
             DEAD_ZONE_RADIUS = 80
 
-            if dist_from_center < DEAD_ZONE_RADIUS:
+            # Comparar ao quadrado: sqrt só quando precisar reescalar
+            if dist_sq < DEAD_ZONE_RADIUS * DEAD_ZONE_RADIUS:
                 # Ajustar clique para borda da zona morta
-                if dist_from_center > 0:
+                if dist_sq > 0:
                     # Normalizar e multiplicar pelo raio da zona morta
-                    scale = DEAD_ZONE_RADIUS / dist_from_center
-                    x = self.config.center_x + int(dx * scale)
-                    y = self.config.center_y + int(dy * scale)
+                    scale = DEAD_ZONE_RADIUS / math.sqrt(dist_sq)
+                    x = self._cx + int(dx * scale)
+                    y = self._cy + int(dy * scale)
                     # print(f"   ⚠️ Clique ajustado para fora da zona morta")
                 else:
                     # Exatamente no centro, não clicar
@@ -555,7 +942,7 @@ class ArcherFarmBot:
                 return sucesso
             else:
                 # Fallback: executar tap direto sem validação
-                self.device.shell(f"input tap {x} {y}")
+                self.executar_tap_direto(x, y)
                 if description:
                     print(f"   🎯 Tap: {description} ({x}, {y})")
                 return True
@@ -566,20 +953,12 @@ class ArcherFarmBot:
 
     def coletar_coins(self, deteccoes):
         """Coleta coins próximos"""
-        coins = [d for d in deteccoes if d['class'] == 'coin']
-
-        for coin in coins:
-            dist_px, dist_tiles = self.calcular_distancia(coin['bbox'])
-
-            # Se coin está perto (< 3 tiles), clicar nele
-            if dist_tiles < 3.0:
-                x1, y1, x2, y2 = coin['bbox']
-                coin_x = (x1 + x2) // 2
-                coin_y = (y1 + y2) // 2
-
-                self.executar_tap(coin_x, coin_y, "Coletar coin")
-                self.coins_collected += 1
-                time.sleep(0.2)  # Pequeno delay
+        # Se coin está perto (< 3 tiles), clicar nele
+        perto = deteccoes.mascara(self._coin_ids) & (deteccoes.dist_tiles < 3.0)
+        for coin_x, coin_y in deteccoes.centros[perto].tolist():
+            self.executar_tap(coin_x, coin_y, "Coletar coin")
+            self.coins_collected += 1
+            time.sleep(0.2)  # Pequeno delay
 
     def executar_acao(self, alvo_info):
         """Executa ação baseada no alvo (COM KITING ATIVO)"""
@@ -597,19 +976,18 @@ class ArcherFarmBot:
             return "IDLE"
 
         zona = alvo_info['zona']
-        mob = alvo_info['mob']
+        classe = alvo_info['classe']
+        mob_bbox = alvo_info['bbox']
         dist_tiles = alvo_info['dist_tiles']
-        x1, y1, x2, y2 = mob['bbox']
-        mob_center_x = (x1 + x2) // 2
-        mob_center_y = (y1 + y2) // 2
+        mob_center_x, mob_center_y = alvo_info['center']
 
         action = None
 
         if zona == "MUITO_PERTO":
             # EMERGÊNCIA: Mob MUITO perto (< 1 tile)
             # Recuar urgente!
-            kite_x, kite_y = self.calcular_ponto_kite(mob['bbox'], kite_type="back", combat_style=self.combat_style)
-            self.executar_tap(kite_x, kite_y, f"🔴 RECUAR URGENTE de {mob['class']}")
+            kite_x, kite_y = self.calcular_ponto_kite(mob_bbox, kite_type="back", combat_style=self.combat_style)
+            self.executar_tap(kite_x, kite_y, f"🔴 RECUAR URGENTE de {classe}")
             action = "RECUAR"
             self.kite_state = "MOVE"  # Forçar movimento no próximo frame
 
@@ -619,25 +997,25 @@ class ArcherFarmBot:
 
             if self.kite_state == "ATTACK":
                 # ATACAR: Clicar no mob para dar dano
-                self.executar_tap(mob_center_x, mob_center_y, f"⚔️ Atacar {mob['class']}")
+                self.executar_tap(mob_center_x, mob_center_y, f"⚔️ Atacar {classe}")
                 action = "ATACAR"
                 self.kite_state = "MOVE"  # Próxima ação: mover
 
             else:  # kite_state == "MOVE"
                 # MOVER: Kiting para manter distância
-                kite_x, kite_y = self.calcular_ponto_kite(mob['bbox'], kite_type="strafe", combat_style=self.combat_style)
-                self.executar_tap(kite_x, kite_y, f"🏃 Kite de {mob['class']}")
+                kite_x, kite_y = self.calcular_ponto_kite(mob_bbox, kite_type="strafe", combat_style=self.combat_style)
+                self.executar_tap(kite_x, kite_y, f"🏃 Kite de {classe}")
                 action = "KITE"
                 self.kite_state = "ATTACK"  # Próxima ação: atacar
                 self.last_kite_move = current_time
 
         elif zona == "AGGRO":
             # Mob longe (4-6 tiles) - APROXIMAR
-            dx = mob_center_x - self.config.center_x
-            dy = mob_center_y - self.config.center_y
-            approach_x = self.config.center_x + int(dx * 0.7)
-            approach_y = self.config.center_y + int(dy * 0.7)
-            self.executar_tap(approach_x, approach_y, f"Aproximar de {mob['class']}")
+            dx = mob_center_x - self._cx
+            dy = mob_center_y - self._cy
+            approach_x = self._cx + int(dx * 0.7)
+            approach_y = self._cy + int(dy * 0.7)
+            self.executar_tap(approach_x, approach_y, f"Aproximar de {classe}")
             action = "APROXIMAR"
             self.kite_state = "ATTACK"  # Reset para atacar quando chegar
 
@@ -650,38 +1028,259 @@ class ArcherFarmBot:
         self.last_action_time = current_time
         self.actions_history.append({
             'action': action,
-            'target': mob['class'],
+            'target': classe,
             'dist': dist_tiles
         })
 
         return action
 
+    def iniciar_pipeline(self):
+        """
+        Inicia captura e detecção em threads separadas
+
+        Enquanto o YOLO processa o frame N, a captura já busca o N+1 e
+        processar_frame consome o resultado do N-1. As filas pequenas
+        dão back-pressure: se um estágio atrasa, o anterior bloqueia.
+        Cada item leva o perf_counter() do fim da captura: o que ficou
+        preso nas filas durante uma trava da decisão volta velho e é
+        descartado antes do YOLO e da decisão (ver _frame_fresco).
+        """
+        if self.pipeline_ativo:
+            return
+
+        self._parar_pipeline.clear()
+        self._captura_liberada.set()
+        self.lote_deteccao = max(1, min(self.lote_deteccao, LOTE_MAX_DETECCAO))
+        tamanho_fila = max(2, self.lote_deteccao)
+        self._cap_q = queue.Queue(maxsize=tamanho_fila)
+        self._det_q = queue.Queue(maxsize=tamanho_fila)
+        self._threads_pipeline = [
+            threading.Thread(target=self._capture_worker, name="farm-captura", daemon=True),
+            threading.Thread(target=self._detect_worker, name="farm-deteccao", daemon=True),
+        ]
+        for thread in self._threads_pipeline:
+            thread.start()
+
+        self.pipeline_ativo = True
+        print("✅ Pipeline de captura/detecção iniciado")
+
+    def parar_pipeline(self):
+        """Para as threads do pipeline e espera terminarem"""
+        if not self.pipeline_ativo:
+            return
+
+        self._parar_pipeline.set()
+        for thread in self._threads_pipeline:
+            thread.join(timeout=2.0)
+
+        self._threads_pipeline = []
+        self.pipeline_ativo = False
+
+    def pausar_pipeline(self):
+        """
+        Para de capturar sem derrubar as threads
+
+        Para quando algo vai mudar a tela fora do farm (GPS abrindo o
+        mapa): nenhum frame dessa janela deve chegar em processar_frame.
+        """
+        if self.pipeline_ativo:
+            self._captura_liberada.clear()
+
+    def retomar_pipeline(self):
+        """Descarta tudo que foi capturado até agora e volta a capturar"""
+        if not self.pipeline_ativo:
+            return
+
+        # Itens em voo (captura terminando, YOLO rodando, put bloqueado)
+        # chegam nas filas depois do esvaziamento: o carimbo os descarta
+        self._descartar_antes = time.perf_counter()
+        for fila in (self._cap_q, self._det_q):
+            while True:
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    break
+                self._contar_descartes(1)
+        self._captura_liberada.set()
+
+    def _colocar_na_fila(self, fila, item):
+        """put() bloqueante que desiste se o pipeline for parado"""
+        while not self._parar_pipeline.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _mais_recente(self, fila, item):
+        """
+        Esvazia a fila e devolve só o item mais novo (drain-to-latest)
+
+        Agir sobre frames atrasados faz o bot clicar onde o mob estava
+        há meio segundo; descartar os velhos limita a latência a um ciclo.
+        """
+        descartados = 0
+        while True:
+            try:
+                item = fila.get_nowait()
+                descartados += 1
+            except queue.Empty:
+                break
+
+        if descartados:
+            self._contar_descartes(descartados)
+
+        return item
+
+    def _contar_descartes(self, n):
+        """Soma frames descartados e loga o total no máximo a cada 10s"""
+        self.dropped_frames += n
+        agora = time.monotonic()
+        if agora - self._ultimo_log_descartes >= 10.0:
+            print(f"   ⏭️ Frames descartados (atrasados): {self.dropped_frames}")
+            self._ultimo_log_descartes = agora
+
+    def _frame_fresco(self, item):
+        """
+        True se o item da fila (t_captura, ...) ainda serve para agir
+
+        As filas dão back-pressure (os buffers de frame são reaproveitados
+        em rodízio, então os produtores não podem descartar e seguir
+        capturando): depois de uma trava da decisão, o que estava preso nas
+        filas é de antes dela. A folga cresce com o tempo do YOLO para não
+        descartar tudo em CPU lenta.
+        """
+        limite = self.idade_max_frame + self.lote_deteccao * self._ewma_det
+        if item[0] >= self._descartar_antes and time.perf_counter() - item[0] <= limite:
+            return True
+        self._contar_descartes(1)
+        return False
+
+    def _proximo_detectado(self, timeout):
+        """
+        (img, deteccoes) mais novo da fila de detecção, pulando os velhos
+
+        Raises:
+            queue.Empty se nenhum frame fresco chegar dentro do timeout
+        """
+        limite = time.perf_counter() + timeout
+        while True:
+            restante = max(0.0, limite - time.perf_counter())
+            item = self._mais_recente(self._det_q, self._det_q.get(timeout=restante))
+            if self._frame_fresco(item):
+                return item[1], item[2]
+
+    @staticmethod
+    def _ewma(media, amostra, alfa=0.1):
+        """Média móvel exponencial (a primeira amostra inicializa)"""
+        if media == 0.0:
+            return amostra
+        return (1.0 - alfa) * media + alfa * amostra
+
+    def _log_pipeline(self):
+        """Imprime filas e tempos dos estágios, no máximo 1x por intervalo"""
+        agora = time.monotonic()
+        if agora - self._ultimo_log_pipeline < self.intervalo_log_pipeline:
+            return
+        self._ultimo_log_pipeline = agora
+
+        print(f"   📈 cap_q={self._cap_q.qsize()}/{self._cap_q.maxsize} "
+              f"det_q={self._det_q.qsize()}/{self._det_q.maxsize} "
+              f"t_cap={self._ewma_cap*1e3:.1f}ms t_det={self._ewma_det*1e3:.1f}ms "
+              f"t_dec={self._ewma_dec*1e3:.1f}ms descartados={self.dropped_frames}")
+
+    def _capture_worker(self):
+        """Thread 1: captura frames do dispositivo"""
+        while not self._parar_pipeline.is_set():
+            if not self._captura_liberada.wait(timeout=0.1):
+                continue  # pausado (ver pausar_pipeline)
+            t0 = time.perf_counter()
+            img = self.capturar_frame()
+            t_captura = time.perf_counter()
+            self._ewma_cap = self._ewma(self._ewma_cap, t_captura - t0)
+            if img is None:
+                time.sleep(0.05)  # ADB falhou, não girar em loop apertado
+                continue
+            self._colocar_na_fila(self._cap_q, (t_captura, img))
+
+    def _detect_worker(self):
+        """Thread 2: roda o YOLO nos frames capturados"""
+        while not self._parar_pipeline.is_set():
+            try:
+                item = self._cap_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if self.lote_deteccao > 1:
+                # Lote com os frames mais novos disponíveis (descarta os mais velhos)
+                itens = deque(maxlen=self.lote_deteccao)
+                while True:
+                    if self._frame_fresco(item):
+                        itens.append(item)
+                    try:
+                        item = self._cap_q.get_nowait()
+                    except queue.Empty:
+                        break
+                if not itens:
+                    continue
+                t0 = time.perf_counter()
+                resultados = self.detectar_objetos([img for _, img in itens])
+                self._ewma_det = self._ewma(self._ewma_det,
+                                            (time.perf_counter() - t0) / len(itens))
+                for (t_captura, frame), deteccoes in zip(itens, resultados):
+                    self._colocar_na_fila(self._det_q, (t_captura, frame, deteccoes))
+                self._log_pipeline()
+                continue
+
+            item = self._mais_recente(self._cap_q, item)
+            if not self._frame_fresco(item):
+                continue
+            t_captura, img = item
+
+            t0 = time.perf_counter()
+            deteccoes = self.detectar_se_mudou(img)
+            self._ewma_det = self._ewma(self._ewma_det, time.perf_counter() - t0)
+            self._colocar_na_fila(self._det_q, (t_captura, img, deteccoes))
+            self._log_pipeline()
+
     def processar_frame(self):
         """Processa um frame completo"""
         if self.paused:
             return
 
-        # Capturar
-        img = self.capturar_frame()
-        if img is None:
-            return
+        # Capturar (e detectar, se o pipeline estiver rodando)
+        deteccoes = None
+        if self.pipeline_ativo:
+            try:
+                img, deteccoes = self._proximo_detectado(timeout=1.0)
+            except queue.Empty:
+                return
+        else:
+            img = self.capturar_frame()
+            if img is None:
+                return
+        t0 = time.perf_counter()
+        agora = time.time()
 
         # Verificar movimento completo (se mapa virtual ativo)
         if self.usar_mapa_virtual and self.mapa_virtual:
             if self.mapa_virtual.movimento_ativo:
                 # Verificar se movimento foi concluído
-                if self.mapa_virtual.verificar_movimento_completo(img):
+                if self.mapa_virtual.verificar_movimento_completo(img, agora):
                     # Finalizar movimento e atualizar posição virtual
                     self.mapa_virtual.finalizar_movimento()
                 else:
                     # Movimento ainda em progresso, não executar novas ações
                     # Apenas atualizar visualização se necessário
                     if self.show_visualization:
-                        self.atualizar_display(img, [])
+                        self.atualizar_display(img, self._sem_deteccoes())
                     return
 
         # Detectar
-        deteccoes = self.detectar_objetos(img)
+        if deteccoes is None:
+            deteccoes = self.detectar_se_mudou(img)
+        self.ultimas_deteccoes = deteccoes
 
         # Bot ativo
         if self.bot_active:
@@ -716,10 +1315,19 @@ class ArcherFarmBot:
         if self.show_visualization:
             self.atualizar_display(img, deteccoes)
 
+        if self.pipeline_ativo:
+            self._ewma_dec = self._ewma(self._ewma_dec, time.perf_counter() - t0)
+
         self.frame_count += 1
 
-    def desenhar_deteccoes(self, img_pil, deteccoes):
-        """Desenha detecções e informações do bot"""
+    def desenhar_deteccoes(self, img_pil, deteccoes, escala=1.0):
+        """
+        Desenha detecções e informações do bot
+
+        Args:
+            escala: Fator entre o frame original e img_pil (bboxes são
+                    do frame original)
+        """
         draw = ImageDraw.Draw(img_pil)
 
         try:
@@ -729,18 +1337,28 @@ class ArcherFarmBot:
             font = ImageFont.load_default()
             font_small = ImageFont.load_default()
 
-        # Desenhar bounding boxes
-        for det in deteccoes:
-            class_name = det['class']
-            conf = det['conf']
-            x1, y1, x2, y2 = det['bbox']
+        if len(deteccoes) == 0:
+            return img_pil
+
+        bboxes = deteccoes.bboxes
+        confs = deteccoes.confs
+        cls_ids = deteccoes.classes
+        dists = deteccoes.dist_tiles
+        eh_mob = deteccoes.mascara(self._mob_ids)
+        alvo_bbox = self.current_target['bbox'] if self.current_target else None
+        caixas = (bboxes * escala).astype(np.int32) if escala != 1.0 else bboxes
 
-            # Calcular distância
-            dist_px, dist_tiles = self.calcular_distancia(det['bbox'])
+        # Desenhar bounding boxes
+        for i in range(len(bboxes)):
+            class_name = self._nomes[int(cls_ids[i])]
+            conf = float(confs[i])
+            bbox = tuple(bboxes[i].tolist())
+            x1, y1, x2, y2 = caixas[i].tolist()
+            dist_tiles = float(dists[i])
             zona = self.classificar_zona(dist_tiles)
 
             # Cor baseada na zona (para mobs)
-            if class_name in ['crab', 'rat', 'crow', 'spider', 'skeleton', 'cobra', 'worm', 'scorpion']:
+            if eh_mob[i]:
                 if zona == "MUITO_PERTO":
                     color = (255, 0, 0)  # Vermelho (perigo)
                 elif zona == "IDEAL":
@@ -753,8 +1371,7 @@ class ArcherFarmBot:
                 color = self.class_colors.get(class_name, (255, 255, 255))
 
             # Destacar alvo atual
-            thickness = 5 if (self.current_target and
-                            self.current_target['mob'] == det) else 3
+            thickness = 5 if bbox == alvo_bbox else 3
 
             draw.rectangle([x1, y1, x2, y2], outline=color, width=thickness)
 
@@ -824,7 +1441,7 @@ class ArcherFarmBot:
 
         # Alvo atual
         if self.current_target:
-            target_text = f"Alvo: {self.current_target['mob']['class']} ({self.current_target['dist_tiles']:.1f}t)"
+            target_text = f"Alvo: {self.current_target['classe']} ({self.current_target['dist_tiles']:.1f}t)"
             draw.text((10, 110), target_text,
                      fill=(255, 255, 255), font=font)
 
@@ -852,40 +1469,82 @@ class ArcherFarmBot:
         return img_pil
 
     def atualizar_display(self, img, deteccoes):
-        """Atualiza visualização"""
+        """
+        Prepara a imagem da visualização (roda na thread de processamento)
+
+        Não toca em widgets do Tk: deixa a PIL.Image pronta em _pending_img
+        e _flush_to_canvas faz a troca na thread do Tk.
+        """
         # Se não tem interface gráfica (modo headless), não faz nada
         if self.root is None:
             return
 
-        # Converter BGR para RGB para PIL
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb)
+        # Janela minimizada/oculta: não gastar CPU desenhando
+        if not self._janela_visivel:
+            return
+
+        # Throttle: contador próprio (frame_count não avança durante movimento)
+        self._disp_tick += 1
+        if self._disp_tick % self.display_a_cada:
+            return
+
+        # Tamanho da janela: 80% da tela (recalculado só se o frame mudar)
+        height, width = img.shape[:2]
+        if self._disp is None or self._disp_fonte != (height, width):
+            max_width = int(self._tela_tamanho[0] * 0.8)
+            max_height = int(self._tela_tamanho[1] * 0.8)
+            self._disp_escala = min(max_width/width, max_height/height, 1.0)
+            self._disp = np.empty((int(height * self._disp_escala),
+                                   int(width * self._disp_escala), 3), dtype=np.uint8)
+            self._disp_fonte = (height, width)
+
+        # Redimensionar + BGR→RGB numa passada só, direto no buffer
+        if NUMBA_DISPONIVEL:
+            bgr_resize_to_rgb(img, self._disp)
+        else:
+            disp_h, disp_w = self._disp.shape[:2]
+            cv2.resize(img, (disp_w, disp_h), dst=self._disp, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._disp, cv2.COLOR_BGR2RGB, dst=self._disp)
+
+        img_pil = Image.fromarray(self._disp)
 
-        # Desenhar detecções
-        img_pil = self.desenhar_deteccoes(img_pil, deteccoes)
+        # Desenhar detecções (já na escala da janela)
+        img_pil = self.desenhar_deteccoes(img_pil, deteccoes, self._disp_escala)
 
         # Overlay info
         img_pil = self.criar_overlay_info(img_pil, deteccoes)
 
-        # Redimensionar
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
+        # Entregar para a thread do Tk
+        with self._lock_display:
+            self._pending_img = img_pil
 
-        max_width = int(screen_width * 0.8)
-        max_height = int(screen_height * 0.8)
+    def _flush_to_canvas(self):
+        """Troca a imagem do canvas (thread do Tk, ~60 Hz)"""
+        if not self.running or self.root is None:
+            return
 
-        width, height = img_pil.size
-        scale = min(max_width/width, max_height/height, 1.0)
+        # Estado da janela só pode ser consultado na thread do Tk
+        self._janela_visivel = (self.root.winfo_viewable()
+                                and self.root.state() != 'iconic')
 
-        if scale < 1.0:
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            img_pil = img_pil.resize((new_width, new_height), Image.LANCZOS)
+        with self._lock_display:
+            img_pil = self._pending_img
+            self._pending_img = None
 
-        # Atualizar canvas
-        self.photo = ImageTk.PhotoImage(img_pil)
-        self.canvas.config(width=img_pil.width, height=img_pil.height)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+        if img_pil is not None:
+            if self.photo is not None and (self.photo.width(), self.photo.height()) == img_pil.size:
+                # Mesmo tamanho: copiar os pixels para o PhotoImage existente
+                self.photo.paste(img_pil)
+            else:
+                # ImageTk precisa ser criado na thread do Tk
+                self.photo = ImageTk.PhotoImage(img_pil)
+                self.canvas.config(width=img_pil.width, height=img_pil.height)
+                if self._canvas_item is None:
+                    self._canvas_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+                else:
+                    self.canvas.itemconfig(self._canvas_item, image=self.photo)
+
+        self.root.after(15, self._flush_to_canvas)
 
     def on_key_press(self, event):
         """Handler de teclas"""
@@ -905,11 +1564,18 @@ class ArcherFarmBot:
             status = "ON" if self.debug_mode else "OFF"
             print(f"🔍 Debug Mode: {status} (mostra confiança das detecções)")
 
-    def update_loop(self):
-        """Loop principal"""
-        if self.running:
-            self.processar_frame()
-            self.root.after(1, self.update_loop)
+    def _processing_loop(self):
+        """Loop principal (thread própria, fora do mainloop do Tk)"""
+        while self.running:
+            if self.paused:
+                time.sleep(0.05)
+                continue
+
+            try:
+                self.processar_frame()
+            except Exception as e:
+                print(f"❌ Erro no processamento: {e}")
+                time.sleep(0.1)
 
     def start(self):
         """Inicia bot"""
@@ -925,6 +1591,9 @@ class ArcherFarmBot:
         if not self.carregar_modelo():
             return
 
+        # Compilar kernels Numba antes do primeiro frame
+        aquecer_kernels()
+
         print("\n✅ Tudo pronto!")
         print("\n🎮 CONTROLES:")
         print("   P           - Ativar/Pausar bot")
@@ -953,9 +1622,16 @@ class ArcherFarmBot:
         self.root.bind('<Key>', self.on_key_press)
         self.root.protocol("WM_DELETE_WINDOW", self.stop)
 
+        self._tela_tamanho = (self.root.winfo_screenwidth(),
+                              self.root.winfo_screenheight())
+
         # Iniciar
         self.running = True
-        self.update_loop()
+        self.iniciar_pipeline()
+        self._thread_processamento = threading.Thread(
+            target=self._processing_loop, name="processamento", daemon=True)
+        self._thread_processamento.start()
+        self.root.after(15, self._flush_to_canvas)
 
         # Rodar
         self.root.mainloop()
@@ -967,12 +1643,20 @@ class ArcherFarmBot:
         print(f"\n📊 ESTATÍSTICAS:")
         print(f"   Frames processados: {self.frame_count}")
         print(f"   Coins coletados: {self.coins_collected}")
+        print(f"   Frames descartados: {self.dropped_frames}")
+        print(f"   Frames sem mudança (YOLO pulado): {self.frames_reaproveitados}")
 
         if self.fps_buffer:
             avg_fps = sum(self.fps_buffer) / len(self.fps_buffer)
             print(f"   FPS médio: {avg_fps:.1f}")
 
         self.running = False
+        self.parar_pipeline()
+        if self.tap_shell is not None:
+            self.tap_shell.fechar()
+        if self._thread_processamento and self._thread_processamento is not threading.current_thread():
+            self._thread_processamento.join(timeout=2.0)
+            self._thread_processamento = None
         if self.root:
             self.root.quit()
             self.root.destroy()
@@ -17,8 +17,15 @@ import os
 import json
 import time
 import math
+import traceback
 from pathlib import Path
 
+# Threads por estágio: numpy/cv2/torch leem a configuração ao serem
+# importados, então precisa vir antes do navegador/GPS/farm_bot
+if __name__ == "__main__":
+    from config_threads import configurar_threads
+    configurar_threads()
+
 # Adicionar diretório pai ao path para importar módulos
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -29,6 +36,18 @@ from adbutils import adb
 import cv2
 import numpy as np
 
+# Cadência do loop de farm (~8 FPS): o sleep desconta o tempo gasto no frame
+TARGET_DT = 1.0 / 8
+
+# Entrada reduzida do YOLO no farm (mobs ocupam vários tiles, 320 basta)
+IMGSZ_FARM = 320
+
+# Pontos sorteados por vez ao explorar a área procurando mobs
+N_CANDIDATOS_EXPLORAR = 16
+
+# Frames seguidos acima do orçamento antes de avisar (~5s a 8 FPS)
+MAX_ATRASOS_SEGUIDOS = 40
+
 
 class FarmIntegrado:
     """Sistema integrado de navegação e farm"""
@@ -55,6 +74,16 @@ class FarmIntegrado:
         self.selected_zone = None
         self.running = False
 
+        # Dados da zona selecionada (cacheados em selecionar_zona)
+        self._zone_data = None
+        self._mob_set = frozenset()
+        self._mob_ids_zona = None  # IDs do modelo (precisa do modelo carregado)
+        self._farm_center = (0, 0)
+        self._farm_radius = 0
+
+        # Gerador aleatório da exploração (criado uma vez)
+        self._rng = np.random.default_rng()
+
     def load_farm_zones(self):
         """Carrega configurações de zonas de farm"""
         try:
@@ -125,6 +154,7 @@ class FarmIntegrado:
 
                 if 0 <= idx < len(zone_names):
                     self.selected_zone = zone_names[idx]
+                    self._cachear_zona()
                     print(f"\n✅ Zona selecionada: {self.selected_zone}")
                     return
                 else:
@@ -133,6 +163,15 @@ class FarmIntegrado:
             except (ValueError, KeyError):
                 print("❌ Opção inválida!")
 
+    def _cachear_zona(self):
+        """Guarda os dados da zona selecionada (evita lookups no loop de farm)"""
+        self._zone_data = self.zones[self.selected_zone]
+        self._mob_set = frozenset(self._zone_data['mobs'])
+        self._mob_ids_zona = None
+        area = self._zone_data['farm_area']
+        self._farm_center = (area['center']['x'], area['center']['y'])
+        self._farm_radius = area['radius']
+
     def inicializar_sistemas(self):
         """Inicializa navegador e farm bot"""
         print("\n" + "=" * 70)
@@ -163,8 +202,12 @@ class FarmIntegrado:
             print(f"   ⚠️ Verifique se o arquivo existe: {model_path}")
             return False
 
-        # Compartilhar dispositivo ADB
+        # Inferência em resolução menor (FP16/INT8 já escolhidos em carregar_modelo)
+        self.farm_bot.imgsz = IMGSZ_FARM
+
+        # Compartilhar dispositivo ADB (e abrir o shell de taps nele)
         self.farm_bot.device = self.gps.device
+        self.farm_bot.abrir_shell_tap()
 
         # Configurar kiting baseado na classe
         self.configurar_kiting_classe()
@@ -177,9 +220,11 @@ class FarmIntegrado:
         config = self.class_configs[self.selected_class]
 
         # Atualizar configurações do farm bot
-        self.farm_bot.config.ideal_distance = config['ideal_distance']
-        self.farm_bot.config.min_safe_distance = config['min_distance']
-        self.farm_bot.config.max_attack_range = config['max_distance']
+        self.farm_bot.aplicar_config(
+            ideal_distance=config['ideal_distance'],
+            min_safe_distance=config['min_distance'],
+            max_attack_range=config['max_distance']
+        )
         self.farm_bot.action_cooldown = config['attack_cooldown']
 
         # Configurar combat style (melee vs ranged)
@@ -229,13 +274,11 @@ class FarmIntegrado:
         x_atual, y_atual = pos['x'], pos['y']
 
         # Área de farm
-        zone_data = self.zones[self.selected_zone]
-        center_x = zone_data['farm_area']['center']['x']
-        center_y = zone_data['farm_area']['center']['y']
-        radius = zone_data['farm_area']['radius']
+        center_x, center_y = self._farm_center
+        radius = self._farm_radius
 
         # Calcular distância ao centro
-        dist = math.sqrt((x_atual - center_x)**2 + (y_atual - center_y)**2)
+        dist = math.hypot(x_atual - center_x, y_atual - center_y)
 
         return dist <= radius, dist, radius
 
@@ -245,53 +288,69 @@ class FarmIntegrado:
         para encontrar mais mobs (SEM SAIR DO BIOMA)
         """
         print("   🔍 Procurando mobs na área...")
+        bot = self.farm_bot
+
+        if bot.pipeline_ativo:
+            # Threads do pipeline já capturam e detectam: usar o último
+            # resultado (capturar aqui disputaria os buffers delas)
+            deteccoes = bot.ultimas_deteccoes
+            if deteccoes is None:
+                return
+        else:
+            # Capturar frame para detecção
+            img = bot.capturar_frame()
+            if img is None:
+                return
 
-        # Capturar frame para detecção
-        img = self.farm_bot.capturar_frame()
-        if img is None:
-            return
-
-        deteccoes = self.farm_bot.detectar_objetos(img)
+            deteccoes = bot.detectar_objetos(img)
 
         # Verificar se há mobs visíveis
-        mobs = [d for d in deteccoes if d['class'] in self.zones[self.selected_zone]['mobs']]
+        if self._mob_ids_zona is None:
+            self._mob_ids_zona = bot.ids_de_classes(self._mob_set)
 
-        if len(mobs) == 0:
+        if not deteccoes.mascara(self._mob_ids_zona).any():
             # Nenhum mob visível - mover para explorar área
             print("   ➡️ Nenhum mob visível, explorando área...")
 
             # Movimento em coordenadas de TELA (não usar GPS)
-            # Calcular ponto aleatório a 3-4 tiles de distância
-
-            import random
-
-            # Distância aleatória: 3-4 tiles
-            tile_size = self.farm_bot.config.tile_size
-            distance = random.uniform(tile_size * 3, tile_size * 4)
-
-            # Ângulo aleatório
-            angle = random.uniform(0, 2 * math.pi)
-
-            # Calcular ponto relativo ao personagem (centro da tela)
-            center_x = self.farm_bot.config.center_x
-            center_y = self.farm_bot.config.center_y
-
-            offset_x = int(distance * math.cos(angle))
-            offset_y = int(distance * math.sin(angle))
-
-            move_x = center_x + offset_x
-            move_y = center_y + offset_y
-
-            # Limitar à tela (não clicar fora)
-            move_x = max(100, min(self.farm_bot.config.screen_width - 100, move_x))
-            move_y = max(100, min(self.farm_bot.config.screen_height - 100, move_y))
+            # Sortear vários pontos a 3-4 tiles de distância de uma vez
+            # e ficar com o primeiro que cair em chão walkable
+            cfg = bot.config
+            tile_size = cfg.tile_size
+            distancias = self._rng.uniform(tile_size * 3, tile_size * 4, N_CANDIDATOS_EXPLORAR)
+            angulos = self._rng.uniform(0, 2 * np.pi, N_CANDIDATOS_EXPLORAR)
+
+            # Pontos relativos ao personagem (centro da tela), limitados à
+            # tela (não clicar fora)
+            xs = np.clip(cfg.center_x + (distancias * np.cos(angulos)).astype(np.int32),
+                         100, cfg.screen_width - 100)
+            ys = np.clip(cfg.center_y + (distancias * np.sin(angulos)).astype(np.int32),
+                         100, cfg.screen_height - 100)
+
+            escolhido = 0
+            mapa = bot.mapa_virtual
+            if bot.usar_mapa_virtual and mapa and mapa.player_x is not None:
+                mundo_xs, mundo_ys = mapa.converter_tela_para_mundo_batch(xs, ys)
+                walkable = np.flatnonzero(mapa.validar_clicks(mundo_xs, mundo_ys))
+                if walkable.size:
+                    escolhido = walkable[0]
+
+            move_x = int(xs[escolhido])
+            move_y = int(ys[escolhido])
+            distance = distancias[escolhido]
 
             print(f"   📍 Explorando: ({move_x}, {move_y}) - {distance/tile_size:.1f} tiles")
 
             # Executar movimento
-            self.farm_bot.executar_tap(move_x, move_y, "🔍 Explorar área")
+            bot.executar_tap(move_x, move_y, "🔍 Explorar área")
+
+            if mapa is not None and mapa.movimento_ativo:
+                # Mapa virtual rastreando: processar_frame já segura novas
+                # ações até a linha verde sumir (ou o tempo estimado passar),
+                # então não bloquear o loop aqui
+                return
 
-            time.sleep(1.5)  # Esperar movimento
+            time.sleep(1.5)  # Sem rastreamento: esperar movimento
 
     def executar_farm_loop(self):
         """Loop principal de farm"""
@@ -319,6 +378,15 @@ class FarmIntegrado:
         self.running = True
         self.farm_bot.bot_active = True
 
+        # Captura e YOLO em threads próprias: enquanto este loop decide e
+        # clica sobre o frame N, o N+1 já está sendo capturado/detectado
+        self.farm_bot.iniciar_pipeline()
+
+        # Locais do loop (evita self.farm_bot.X a cada frame)
+        bot = self.farm_bot
+        processar = bot.processar_frame
+        usar_mapa_virtual = bot.usar_mapa_virtual
+
         frame_count = 0
         last_mob_check = time.time()
         last_heartbeat = time.time()
@@ -328,33 +396,42 @@ class FarmIntegrado:
         gps_check_interval = 60.0  # Verificar GPS a cada 60 segundos
         failed_captures = 0
         max_failed_captures = 10  # Parar após 10 falhas consecutivas
+        proximo_frame = time.monotonic()  # monotonic: imune a ajuste do relógio
+        atrasos_seguidos = 0
 
         while self.running:
             try:
+                # Um relógio por iteração, reaproveitado por todas as checagens
+                now = time.time()
+
                 # Heartbeat: Log periódico de status
-                current_time = time.time()
-                if (current_time - last_heartbeat) >= heartbeat_interval:
-                    print(f"\n💚 [Heartbeat] Frame {frame_count}, Bot ativo: {self.farm_bot.bot_active}")
-                    last_heartbeat = current_time
+                if (now - last_heartbeat) >= heartbeat_interval:
+                    print(f"\n💚 [Heartbeat] Frame {frame_count}, Bot ativo: {bot.bot_active}")
+                    last_heartbeat = now
 
                 # GPS RECALIBRAÇÃO: Verificar se precisa atualizar posição virtual
-                if self.farm_bot.usar_mapa_virtual and (current_time - last_gps_check) >= gps_check_interval:
-                    if self.farm_bot.precisa_gps_recalibracao():
+                if usar_mapa_virtual and (now - last_gps_check) >= gps_check_interval:
+                    if bot.precisa_gps_recalibracao():
                         print("\n🔄 GPS recalibração necessária...")
+                        # O GPS abre e fecha o mapa: nenhum frame com o mapa
+                        # aberto pode chegar no processar_frame
+                        bot.pausar_pipeline()
                         try:
                             pos = self.gps.get_current_position(keep_map_open=False, verbose=False)
                             if pos and 'x' in pos and 'y' in pos:
-                                self.farm_bot.atualizar_posicao_gps(pos['x'], pos['y'])
+                                bot.atualizar_posicao_gps(pos['x'], pos['y'])
                                 print(f"   ✅ Posição atualizada: ({pos['x']}, {pos['y']})")
                             else:
                                 print("   ⚠️ GPS recalibração falhou")
                         except Exception as e:
                             print(f"   ⚠️ Erro na recalibração GPS: {e}")
-                    last_gps_check = current_time
+                        finally:
+                            bot.retomar_pipeline()
+                    last_gps_check = now
 
                 # Processar frame de farm
                 try:
-                    self.farm_bot.processar_frame()
+                    processar()
                     failed_captures = 0  # Reset contador de falhas
                 except Exception as e:
                     failed_captures += 1
@@ -366,26 +443,38 @@ class FarmIntegrado:
                     continue
 
                 # Procurar mobs ativamente se não houver alvo
-                if (current_time - last_mob_check) >= check_interval:
-                    if self.farm_bot.current_target is None:
+                if (now - last_mob_check) >= check_interval:
+                    if bot.current_target is None:
                         self.procurar_mobs_ativamente()
-                    last_mob_check = current_time
+                    last_mob_check = now
 
                 frame_count += 1
 
-                # DELAY ENTRE FRAMES: Evitar sobrecarga de CPU e flood de comandos
-                time.sleep(0.15)  # 150ms entre frames (~6-7 FPS)
+                # DELAY ENTRE FRAMES: cadência fixa, dormindo só o que sobrou
+                proximo_frame += TARGET_DT
+                espera = proximo_frame - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                    atrasos_seguidos = 0
+                else:
+                    # Frame estourou o orçamento: recomeçar a contagem (sem rajada)
+                    proximo_frame = time.monotonic()
+                    atrasos_seguidos += 1
+                    if atrasos_seguidos == MAX_ATRASOS_SEGUIDOS:
+                        print(f"⚠️ Loop acima de {TARGET_DT*1000:.0f}ms/frame há "
+                              f"{atrasos_seguidos} frames seguidos")
+                        atrasos_seguidos = 0
 
             except KeyboardInterrupt:
                 print("\n\n⏹️ Farm interrompido pelo usuário!")
                 break
             except Exception as e:
                 print(f"\n❌ Erro no farm: {e}")
-                import traceback
                 traceback.print_exc()
                 break
 
         self.farm_bot.bot_active = False
+        self.farm_bot.parar_pipeline()
         print("\n✅ Farm finalizado!")
         print(f"📊 Total de frames processados: {frame_count}")
 
@@ -462,7 +551,6 @@ def main():
         print("\n\n⏹️ Sistema encerrado pelo usuário!")
     except Exception as e:
         print(f"\n❌ Erro fatal: {e}")
-        import traceback
         traceback.print_exc()
 
 
@@ -0,0 +1,263 @@
+"""
+Kernels numéricos do Farm Bot (compilados com Numba quando disponível)
+
+Numba é opcional: sem ele, NUMBA_DISPONIVEL fica False e quem chama
+deve usar o caminho OpenCV/NumPy equivalente (os kernels continuam
+importáveis, mas rodam como Python puro - lento para imagens).
+
+Instalar: pip install numba
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_DISPONIVEL = True
+except ImportError:
+    NUMBA_DISPONIVEL = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Fallback sem Numba: devolve a função Python original"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorador(func):
+            return func
+        return decorador
+
+
+@njit(parallel=True, cache=True)
+def bgr_resize_to_rgb(src, dst):
+    """
+    Redimensiona (nearest neighbor) e converte BGR → RGB em uma passada
+
+    Args:
+        src: Imagem BGR (H, W, 3) uint8
+        dst: Destino RGB (h, w, 3) uint8 pré-alocado (define o tamanho final)
+    """
+    sh = src.shape[0]
+    sw = src.shape[1]
+    dh = dst.shape[0]
+    dw = dst.shape[1]
+
+    for y in prange(dh):
+        sy = y * sh // dh
+        for x in range(dw):
+            sx = x * sw // dw
+            dst[y, x, 0] = src[sy, sx, 2]
+            dst[y, x, 1] = src[sy, sx, 1]
+            dst[y, x, 2] = src[sy, sx, 0]
+
+
+@njit(cache=True, fastmath=True)
+def nearest_and_actions(dist_px, dist_tiles, min_safe, ideal, max_atk, aggro):
+    """
+    Escolhe o mob mais próximo respeitando a prioridade de zonas
+
+    Uma passada só sobre as detecções: IDEAL (min_safe..ideal), depois
+    ATACAVEL (ideal..max_atk), depois AGGRO (max_atk..aggro) e, se nenhum
+    cair nessas zonas, o mais próximo de todos (MUITO_PERTO ou LONGE).
+
+    Args:
+        dist_px: Distâncias em pixels (N,) float
+        dist_tiles: Distâncias em tiles (N,) float
+        min_safe, ideal, max_atk, aggro: Limites das zonas em tiles
+
+    Returns:
+        (índice escolhido ou -1 se N == 0, prioridade 0..3)
+    """
+    melhor = np.full(4, -1, dtype=np.int64)
+    melhor_d = np.full(4, np.inf)
+
+    for i in range(dist_px.shape[0]):
+        t = dist_tiles[i]
+        if min_safe <= t <= ideal:
+            z = 0
+        elif ideal < t <= max_atk:
+            z = 1
+        elif max_atk < t <= aggro:
+            z = 2
+        else:
+            z = 3
+
+        d = dist_px[i]
+        if d < melhor_d[z]:
+            melhor_d[z] = d
+            melhor[z] = i
+        # Fallback (prioridade 3) considera todos os mobs
+        if z != 3 and d < melhor_d[3]:
+            melhor_d[3] = d
+            melhor[3] = i
+
+    for z in range(4):
+        if melhor[z] >= 0:
+            return melhor[z], z
+    return -1, 3
+
+
+@njit(cache=True, boundscheck=False)
+def validate_batch(xs, ys, walkable, largura, altura, out):
+    """
+    Valida vários pontos do mundo contra a matriz walkable
+
+    Args:
+        xs, ys: Coordenadas no mundo (N,) int32
+        walkable: Matriz [y, x] bool
+        largura, altura: Dimensões do mundo
+        out: Resultado (N,) bool pré-alocado
+    """
+    for i in range(xs.shape[0]):
+        x = xs[i]
+        y = ys[i]
+        out[i] = 0 <= x < largura and 0 <= y < altura and walkable[y, x]
+
+
+@njit(cache=True)
+def tela_para_mundo_batch(tela_xs, tela_ys, px, py, cx, cy):
+    """
+    Converte pontos da tela para o mundo (jogador sempre no centro da tela)
+
+    Args:
+        tela_xs, tela_ys: Coordenadas na tela (N,)
+        px, py: Posição do jogador no mundo
+        cx, cy: Centro da tela
+
+    Returns:
+        (mundo_xs, mundo_ys) int32, truncados como int()
+    """
+    n = tela_xs.shape[0]
+    mundo_xs = np.empty(n, dtype=np.int32)
+    mundo_ys = np.empty(n, dtype=np.int32)
+    for i in range(n):
+        mundo_xs[i] = int(px + (tela_xs[i] - cx))
+        mundo_ys[i] = int(py + (tela_ys[i] - cy))
+    return mundo_xs, mundo_ys
+
+
+@njit(cache=True)
+def bresenham_corredor(x0, y0, x1, y1, meia_banda, largura, altura):
+    """
+    Pixels da reta (x0, y0) → (x1, y1) por Bresenham, com banda de ±meia_banda
+
+    A banda vai no eixo menor (vertical para retas mais horizontais e
+    vice-versa). Pontos fora do frame são descartados.
+
+    Returns:
+        (xs, ys) int64 (N,)
+    """
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    horizontal = dx >= -dy
+
+    n = max(dx, -dy) + 1
+    largura_banda = 2 * meia_banda + 1
+    xs = np.empty(n * largura_banda, dtype=np.int64)
+    ys = np.empty(n * largura_banda, dtype=np.int64)
+
+    k = 0
+    x = x0
+    y = y0
+    erro = dx + dy
+    for _ in range(n):
+        for d in range(-meia_banda, meia_banda + 1):
+            if horizontal:
+                px = x
+                py = y + d
+            else:
+                px = x + d
+                py = y
+            if 0 <= px < largura and 0 <= py < altura:
+                xs[k] = px
+                ys[k] = py
+                k += 1
+
+        e2 = 2 * erro
+        if e2 >= dy:
+            erro += dy
+            x += sx
+        if e2 <= dx:
+            erro += dx
+            y += sy
+
+    return xs[:k], ys[:k]
+
+
+@njit(cache=True, boundscheck=False)
+def contar_verde(img, xs, ys):
+    """
+    Conta pixels da linha verde (#00ff00) nos pontos dados
+
+    Mesmo critério BGR do calibrador (equivalente ao inRange em HSV
+    H 50-70, S >= 150, V >= 150).
+
+    Args:
+        img: Imagem BGR/BGRA (H, W, C) uint8
+        xs, ys: Pontos a testar (N,)
+    """
+    c = 0
+    for i in range(xs.shape[0]):
+        b = np.int32(img[ys[i], xs[i], 0])
+        g = np.int32(img[ys[i], xs[i], 1])
+        r = np.int32(img[ys[i], xs[i], 2])
+        if g < 150 or g < b or g < r:
+            continue
+        croma = g - min(b, r)
+        if 255 * croma >= 150 * g and 3 * abs(b - r) <= croma:
+            c += 1
+    return c
+
+
+@njit(cache=True, boundscheck=False)
+def tem_verde_roi(img, y0, y1, x0, x1, minimo):
+    """
+    True se o retângulo [y0:y1, x0:x1] tem mais de `minimo` pixels verdes
+
+    Mesmo critério de contar_verde, lendo cada pixel uma vez (sem HSV
+    nem máscaras intermediárias) e parando assim que passa do mínimo.
+
+    Args:
+        img: Imagem BGR/BGRA (H, W, C) uint8
+        y0, y1, x0, x1: Limites do retângulo (já recortados ao frame)
+        minimo: Quantidade de pixels que precisa ser ultrapassada
+    """
+    c = 0
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            g = np.int32(img[y, x, 1])
+            if g < 150:
+                continue
+            b = np.int32(img[y, x, 0])
+            r = np.int32(img[y, x, 2])
+            if g < b or g < r:
+                continue
+            croma = g - min(b, r)
+            if 255 * croma >= 150 * g and 3 * abs(b - r) <= croma:
+                c += 1
+                if c > minimo:
+                    return True
+    return False
+
+
+def aquecer():
+    """Força a compilação JIT (evita travada de ~1s no primeiro frame)"""
+    if not NUMBA_DISPONIVEL:
+        return
+
+    src = np.zeros((4, 4, 3), dtype=np.uint8)
+    dst = np.empty((2, 2, 3), dtype=np.uint8)
+    bgr_resize_to_rgb(src, dst)
+
+    dist = np.zeros(1, dtype=np.float32)
+    nearest_and_actions(dist, dist, 1.0, 2.0, 3.0, 4.0)
+
+    pontos = np.zeros(1, dtype=np.int32)
+    validate_batch(pontos, pontos, np.zeros((1, 1), dtype=np.bool_), 1, 1,
+                   np.empty(1, dtype=np.bool_))
+    tela_para_mundo_batch(pontos, pontos, 0.0, 0.0, 0.0, 0.0)
+
+    xs, ys = bresenham_corredor(0, 0, 3, 1, 1, 4, 4)
+    contar_verde(src, xs, ys)
+    tem_verde_roi(src, 0, 4, 0, 4, 1)
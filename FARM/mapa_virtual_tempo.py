@@ -17,12 +17,19 @@ Vantagens:
 - Funciona em labirintos complexos
 """
 
-import cv2
 import numpy as np
 import time
 import json
+import os
 from pathlib import Path
 import math
+from farm_kernels import NUMBA_DISPONIVEL, validate_batch, tela_para_mundo_batch
+
+# Mapa processado (gerado por processar_mapa_mundo.py) e as cópias .npy
+# descompactadas dele, carregadas com mmap (o SO só lê as páginas usadas)
+ARQUIVO_MAPA = 'FARM/mapa_mundo_processado.npz'
+ARQUIVO_WALKABLE = 'FARM/mapa_walkable.npy'
+ARQUIVO_BIOMAS = 'FARM/mapa_biomas.npy'
 
 
 class MapaVirtualComTempo:
@@ -55,6 +62,12 @@ class MapaVirtualComTempo:
         self.verde_y1 = 350
         self.verde_x2 = 900
         self.verde_y2 = 550
+        self._verde_v_min = int(self.verde_lower[2])
+        self._verde_s_min = int(self.verde_lower[1])
+        self._alocar_buffers_verde((
+            len(range(self.verde_y1, self.verde_y2, 2)),
+            len(range(self.verde_x1, self.verde_x2, 2))
+        ))
 
         # 6. Dimensões da tela
         self.tela_largura = 1600
@@ -72,14 +85,20 @@ class MapaVirtualComTempo:
     def carregar_matriz(self):
         """Carrega matriz walkable do arquivo processado"""
         try:
-            dados = np.load('FARM/mapa_mundo_processado.npz')
-            self.matriz_walkable = dados['walkable']
-            self.matriz_biomas = dados['biomas']
-            self.dimensoes = dados['dimensoes']
+            self._migrar_para_npy()
+
+            # bool: 1 byte por célula e o gather já devolve o resultado.
+            # asarray tira a subclasse memmap sem copiar (Numba aceita direto)
+            self.matriz_walkable = np.asarray(np.load(ARQUIVO_WALKABLE, mmap_mode='r'))
+            self.matriz_biomas = np.asarray(np.load(ARQUIVO_BIOMAS, mmap_mode='r'))
+            # Versão compactada (1 bit por célula): gerada no 1º walkable_bit
+            self.walkable_packed = None
 
-            # Dimensões do mapa mundo
-            self.mundo_largura = self.dimensoes[0]
-            self.mundo_altura = self.dimensoes[1]
+            # Dimensões do mapa mundo (largura, altura)
+            altura, largura = self.matriz_walkable.shape
+            self.dimensoes = np.array([largura, altura])
+            self.mundo_largura = largura
+            self.mundo_altura = altura
 
             print(f"   📂 Matriz carregada: {self.mundo_largura}x{self.mundo_altura}")
 
@@ -88,6 +107,25 @@ class MapaVirtualComTempo:
             print("   Execute: python processar_mapa_mundo.py")
             raise
 
+    def _migrar_para_npy(self):
+        """
+        Gera os .npy a partir do .npz (uma vez, ou se o .npz for mais novo)
+
+        .npz comprimido não pode ser mapeado em memória; os .npy sim.
+        """
+        if (os.path.exists(ARQUIVO_WALKABLE) and os.path.exists(ARQUIVO_BIOMAS)
+                and (not os.path.exists(ARQUIVO_MAPA)
+                     or os.path.getmtime(ARQUIVO_WALKABLE) >= os.path.getmtime(ARQUIVO_MAPA))):
+            return
+
+        print("   🔄 Convertendo mapa para .npy (carregamento com mmap)...")
+        dados = np.load(ARQUIVO_MAPA)
+        np.save(ARQUIVO_WALKABLE, np.ascontiguousarray(dados['walkable'], dtype=np.bool_))
+        biomas = dados['biomas']
+        if biomas.max() < 256:
+            biomas = biomas.astype(np.uint8)
+        np.save(ARQUIVO_BIOMAS, np.ascontiguousarray(biomas))
+
     def carregar_velocidade(self):
         """Carrega configuração de velocidade calibrada"""
         try:
@@ -162,6 +200,27 @@ class MapaVirtualComTempo:
 
         return mundo_x, mundo_y
 
+    def converter_tela_para_mundo_batch(self, tela_xs, tela_ys):
+        """
+        converter_tela_para_mundo para vários pontos de uma vez
+
+        Returns:
+            (mundo_xs, mundo_ys) int32, ou (None, None) sem posição GPS
+        """
+        if self.player_x is None or self.player_y is None:
+            return None, None
+
+        tela_xs = np.asarray(tela_xs)
+        tela_ys = np.asarray(tela_ys)
+        if NUMBA_DISPONIVEL:
+            return tela_para_mundo_batch(tela_xs, tela_ys, float(self.player_x),
+                                         float(self.player_y), float(self.centro_x),
+                                         float(self.centro_y))
+
+        mundo_xs = (self.player_x + (tela_xs - self.centro_x)).astype(np.int32)
+        mundo_ys = (self.player_y + (tela_ys - self.centro_y)).astype(np.int32)
+        return mundo_xs, mundo_ys
+
     def validar_click(self, mundo_x, mundo_y):
         """
         Valida se click em coordenadas do mundo é walkable
@@ -173,15 +232,58 @@ class MapaVirtualComTempo:
         Returns:
             True se walkable, False se parede/fora do mapa
         """
+        return bool(self.validar_clicks(np.array([mundo_x]), np.array([mundo_y]))[0])
+
+    def validar_clicks(self, xs, ys):
+        """
+        Valida vários clicks de uma vez (versão vetorizada de validar_click)
+
+        Args:
+            xs: coordenadas X no mundo (array ou lista)
+            ys: coordenadas Y no mundo (array ou lista)
+
+        Returns:
+            Array bool: True onde walkable, False se parede/fora do mapa
+        """
+        xs = np.asarray(xs).astype(np.int32)
+        ys = np.asarray(ys).astype(np.int32)
+
+        if NUMBA_DISPONIVEL:
+            walkable = np.empty(xs.size, dtype=np.bool_)
+            validate_batch(xs.ravel(), ys.ravel(), self.matriz_walkable,
+                           int(self.mundo_largura), int(self.mundo_altura), walkable)
+            return walkable.reshape(xs.shape)
+
         # Verificar limites
-        if mundo_x < 0 or mundo_x >= self.mundo_largura:
-            return False
-        if mundo_y < 0 or mundo_y >= self.mundo_altura:
-            return False
+        ok = (xs >= 0) & (xs < self.mundo_largura) & (ys >= 0) & (ys < self.mundo_altura)
 
         # Verificar walkability
         # Matriz está em [y, x] (linha, coluna)
-        return self.matriz_walkable[int(mundo_y), int(mundo_x)] == 1
+        walkable = np.zeros(ok.shape, dtype=bool)
+        walkable[ok] = self.matriz_walkable[ys[ok], xs[ok]]
+        return walkable
+
+    def walkable_bit(self, xs, ys):
+        """
+        Lê a walkability da matriz compactada (8 células por byte)
+
+        Para varreduras grandes de uma região (ex: vizinhança de um A*),
+        onde 8x menos memória mantém os dados no cache. Sem checagem de
+        limites: xs/ys devem estar dentro do mapa.
+
+        Args:
+            xs: coordenadas X no mundo (int ou array)
+            ys: coordenadas Y no mundo (int ou array)
+
+        Returns:
+            1 se walkable, 0 se parede (mesmo formato de xs/ys)
+        """
+        if self.walkable_packed is None:
+            self.walkable_packed = np.packbits(self.matriz_walkable, axis=1)
+
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        return (self.walkable_packed[ys, xs >> 3] >> (7 - (xs & 7))) & 1
 
     def calcular_distancia(self, x1, y1, x2, y2):
         """Calcula distância euclidiana entre dois pontos"""
@@ -217,6 +319,7 @@ class MapaVirtualComTempo:
         self.movimento_destino_y = destino_mundo_y
         self.movimento_inicio = time.time()
         self.movimento_tempo_estimado = tempo_estimado
+        self._calcular_prazos_movimento()
 
         print(f"🏃 Movimento iniciado:")
         print(f"   De: ({self.player_x:.0f}, {self.player_y:.0f})")
@@ -224,6 +327,17 @@ class MapaVirtualComTempo:
         print(f"   Distância: {distancia:.1f} px")
         print(f"   Tempo estimado: {tempo_estimado:.3f}s")
 
+    def _calcular_prazos_movimento(self):
+        """
+        Instantes absolutos usados por verificar_movimento_completo
+
+        - Timeout: tempo estimado + 50% de margem
+        - Início da checagem da linha verde: 30% do tempo estimado
+          (evita falsos positivos no início)
+        """
+        self._prazo_timeout = self.movimento_inicio + self.movimento_tempo_estimado * 1.5
+        self._prazo_checar_verde = self.movimento_inicio + self.movimento_tempo_estimado * 0.3
+
     def detectar_linha_verde(self, img):
         """
         Detecta se linha verde está presente na imagem
@@ -232,27 +346,62 @@ class MapaVirtualComTempo:
         if img is None:
             return False
 
-        # Recortar região em torno do personagem
-        roi = img[self.verde_y1:self.verde_y2, self.verde_x1:self.verde_x2]
-
-        # Converter para HSV
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-
-        # Criar máscara para cor verde
-        mask = cv2.inRange(hsv, self.verde_lower, self.verde_upper)
-
-        # Contar pixels verdes
-        pixels_verdes = cv2.countNonZero(mask)
-
-        # Threshold: precisa de pelo menos 50 pixels verdes
-        return pixels_verdes > 50
-
-    def verificar_movimento_completo(self, img):
+        # Recortar região em torno do personagem (1 a cada 2 pixels: a linha
+        # tem vários px de espessura, 4x menos pixels continua detectando)
+        roi = img[self.verde_y1:self.verde_y2:2, self.verde_x1:self.verde_x2:2]
+        if self._verde_roi.shape != roi.shape:
+            self._alocar_buffers_verde(roi.shape)
+
+        # int32: 255 * croma estoura int16
+        np.copyto(self._verde_roi, roi)
+        b = self._verde_roi[..., 0]
+        g = self._verde_roi[..., 1]
+        r = self._verde_roi[..., 2]
+        minimo, croma, aux = self._verde_minimo, self._verde_croma, self._verde_aux
+        mask, tmp = self._verde_mask, self._verde_tmp
+
+        # Mesmo critério do inRange em HSV (H 40-80, S >= 100, V >= 100),
+        # escrito direto em BGR para não converter a ROI inteira:
+        #   H entre 80° e 160° → verde é o canal máximo e |B-R| <= 2/3 (V-min)
+        #   V = G >= 100;  S = 255 (V-min) / V >= 100
+        # Tudo com out= nos buffers pré-alocados (nada alocado por frame)
+        np.minimum(b, r, out=minimo)
+        np.subtract(g, minimo, out=croma)
+
+        np.greater_equal(g, b, out=mask)
+        mask &= np.greater_equal(g, r, out=tmp)
+        mask &= np.greater_equal(g, self._verde_v_min, out=tmp)
+
+        np.multiply(g, self._verde_s_min, out=aux)
+        np.multiply(croma, 255, out=minimo)  # mínimo já foi usado
+        mask &= np.greater_equal(minimo, aux, out=tmp)
+
+        np.subtract(b, r, out=aux)
+        np.abs(aux, out=aux)
+        aux *= 3
+        croma *= 2
+        mask &= np.less_equal(aux, croma, out=tmp)
+
+        # Threshold: pelo menos 50 pixels verdes na ROI inteira (~12 na amostra)
+        return np.count_nonzero(mask) > 12
+
+    def _alocar_buffers_verde(self, shape):
+        """Buffers de trabalho do detectar_linha_verde para uma ROI (h, w, 3)"""
+        h, w = shape[:2]
+        self._verde_roi = np.empty((h, w, 3), dtype=np.int32)
+        self._verde_minimo = np.empty((h, w), dtype=np.int32)
+        self._verde_croma = np.empty((h, w), dtype=np.int32)
+        self._verde_aux = np.empty((h, w), dtype=np.int32)
+        self._verde_mask = np.empty((h, w), dtype=bool)
+        self._verde_tmp = np.empty((h, w), dtype=bool)
+
+    def verificar_movimento_completo(self, img, now=None):
         """
         Verifica se movimento atual foi completado
 
         Args:
             img: screenshot atual para detectar linha verde
+            now: time.time() já lido pelo chamador (opcional)
 
         Returns:
             True se movimento completo, False se ainda em progresso
@@ -260,22 +409,18 @@ class MapaVirtualComTempo:
         if not self.movimento_ativo:
             return True  # Não há movimento ativo
 
-        tempo_decorrido = time.time() - self.movimento_inicio
+        agora = time.time() if now is None else now
 
         # Critério 1: Timeout (tempo estimado + margem passou)
-        timeout = self.movimento_tempo_estimado * 1.5  # 50% margem extra
-        if tempo_decorrido > timeout:
-            print(f"   ⏱️ Movimento completo por timeout ({tempo_decorrido:.3f}s)")
+        if agora > self._prazo_timeout:
+            print(f"   ⏱️ Movimento completo por timeout ({agora - self.movimento_inicio:.3f}s)")
             return True
 
-        # Critério 2: Linha verde desapareceu (e já passou tempo mínimo)
-        # Só checar linha verde se já passou pelo menos 30% do tempo estimado
-        # (evita falsos positivos no início)
-        if tempo_decorrido > self.movimento_tempo_estimado * 0.3:
-            linha_verde_presente = self.detectar_linha_verde(img)
-
-            if not linha_verde_presente:
-                print(f"   🟢 Movimento completo (linha verde sumiu em {tempo_decorrido:.3f}s)")
+        # Critério 2: Linha verde desapareceu (e já passou tempo mínimo).
+        # Sem frame não dá para afirmar que sumiu: fica só o timeout
+        if img is not None and agora > self._prazo_checar_verde:
+            if not self.detectar_linha_verde(img):
+                print(f"   🟢 Movimento completo (linha verde sumiu em {agora - self.movimento_inicio:.3f}s)")
                 return True
 
         return False
@@ -332,20 +477,36 @@ class MapaVirtualComTempo:
         Returns:
             True se tap foi executado, False se bloqueado (parede/movimento ativo)
         """
+        return self.tap_and_move(tela_x, tela_y, executar_tap_callback)
+
+    def tap_and_move(self, tela_x, tela_y, executar_tap_callback):
+        """
+        Converte, valida, executa o tap e inicia o movimento numa passada só
+
+        Mesmo resultado de converter_tela_para_mundo → validar_click →
+        iniciar_movimento, sem refazer limites e distância em cada etapa.
+
+        Returns:
+            True se tap foi executado, False se bloqueado
+        """
         # 1. Verificar se há movimento ativo
         if self.movimento_ativo:
             print(f"⚠️ Tap bloqueado: movimento em progresso")
             return False
 
-        # 2. Converter coordenadas tela -> mundo
-        mundo_x, mundo_y = self.converter_tela_para_mundo(tela_x, tela_y)
-
-        if mundo_x is None or mundo_y is None:
+        if self.player_x is None or self.player_y is None:
             print(f"⚠️ Tap bloqueado: posição virtual desconhecida (precisa GPS)")
             return False
 
-        # 3. Validar se destino é walkable
-        if not self.validar_click(mundo_x, mundo_y):
+        # 2. Converter coordenadas tela -> mundo (offset = distância percorrida)
+        dx = tela_x - self.centro_x
+        dy = tela_y - self.centro_y
+        mundo_x = self.player_x + dx
+        mundo_y = self.player_y + dy
+
+        # 3. Validar limites e se destino é walkable
+        if not (0 <= mundo_x < self.mundo_largura and 0 <= mundo_y < self.mundo_altura
+                and self.matriz_walkable[int(mundo_y), int(mundo_x)]):
             print(f"❌ Tap bloqueado: destino não-walkable ({mundo_x:.0f}, {mundo_y:.0f})")
             return False
 
@@ -354,8 +515,19 @@ class MapaVirtualComTempo:
 
         executar_tap_callback(tela_x, tela_y)
 
-        # 5. Iniciar rastreamento de movimento
-        self.iniciar_movimento(mundo_x, mundo_y)
+        # 5. Iniciar rastreamento de movimento (+20% de margem no tempo)
+        distancia = math.sqrt(dx * dx + dy * dy)
+        tempo_estimado = distancia / self.velocidade_px_s if self.velocidade_px_s > 0 else 1.0
+        tempo_estimado *= 1.2
+
+        self.movimento_ativo = True
+        self.movimento_destino_x = mundo_x
+        self.movimento_destino_y = mundo_y
+        self.movimento_inicio = time.time()
+        self.movimento_tempo_estimado = tempo_estimado
+        self._calcular_prazos_movimento()
+
+        print(f"🏃 Movimento iniciado: {distancia:.1f} px, estimado {tempo_estimado:.3f}s")
 
         return True
 
@@ -0,0 +1,88 @@
+"""
+Shell ADB persistente
+
+Cada device.shell("input tap ...") do adbutils abre uma conexão nova com
+o adb server e um shell novo no dispositivo. Aqui um único `sh` fica
+aberto e os comandos são escritos nele, um por linha.
+
+Uso:
+    shell = ShellPersistente(device)
+    shell.enviar("input tap 800 450")
+    shell.fechar()
+"""
+
+import threading
+
+
+class ShellPersistente:
+    """Um `sh` aberto no dispositivo que recebe comandos por stdin"""
+
+    def __init__(self, device):
+        """
+        Args:
+            device: AdbDevice do adbutils
+        """
+        self.device = device
+        self._conn = None
+        self._lock = threading.Lock()
+        self._thread_leitura = None
+
+    def abrir(self):
+        """
+        Abre o shell
+
+        Pode ser chamado logo de início (a conexão não entra no primeiro
+        tap); enviar só chama abrir() se ainda não houver conexão aberta.
+        """
+        self._conn = self.device.shell("sh", stream=True)
+
+        # Consumir a saída: sem isso o buffer do socket enche e o sh trava
+        self._thread_leitura = threading.Thread(
+            target=self._drenar_saida, args=(self._conn,), name="shell-saida", daemon=True)
+        self._thread_leitura.start()
+
+    def _drenar_saida(self, conn):
+        """Descarta a saída do shell até a conexão fechar"""
+        try:
+            while conn.read(4096):
+                pass
+        except Exception:
+            pass
+
+    def enviar(self, comando):
+        """
+        Escreve um comando no shell (não espera ele terminar)
+
+        Se a conexão tiver caído, reabre uma vez e tenta de novo.
+
+        Args:
+            comando: Linha de shell, ex: "input tap 800 450"
+        """
+        dados = (comando + "\n").encode()
+        with self._lock:
+            if self._conn is None:
+                self.abrir()
+            try:
+                self._conn.send(dados)
+            except (OSError, AttributeError):
+                self._fechar_conexao()
+                self.abrir()
+                self._conn.send(dados)
+
+    def _fechar_conexao(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def fechar(self):
+        """Encerra o shell (manda `exit` para o sh sair sozinho no dispositivo)"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(b"exit\n")
+                except Exception:
+                    pass
+            self._fechar_conexao()
@@ -7,55 +7,102 @@ Testa diferentes valores de escala e compara resultados
 
 import json
 
-def testar_escala(escala_x, escala_y, descricao):
+import numpy as np
+
+# Tela do jogo e centro (player sempre no centro)
+TAMANHO_TELA = np.array([1600, 900])
+CENTRO_TELA = np.array([800, 450])
+
+# 1 tile = 20px no mapa
+PIXELS_POR_TILE = 20
+
+# Exemplo de conversão: player em (374, 1342), destino em (400, 1350)
+PLAYER_EXEMPLO = (374, 1342)
+DESTINO_EXEMPLO = (400, 1350)
+DELTA_EXEMPLO = np.array(DESTINO_EXEMPLO) - np.array(PLAYER_EXEMPLO)  # (26, 8)
+
+
+def calcular_escalas(escalas, cliques_int=None):
+    """
+    Calcula FOV, tiles e clique de exemplo para várias escalas de uma vez
+
+    Args:
+        escalas: Array (N, 2) com (escala_x, escala_y) por linha
+        cliques_int: Buffer (N, 2) int32 para os cliques arredondados
+                     (reaproveitável entre varreduras; alocado se None)
+
+    Returns:
+        dict de arrays (N, 2): 'fov_mapa', 'tiles', 'exemplo_clique'
+        (int32, pixels da tela) e (N,) bool 'dentro_tela'
+    """
+    escalas = np.asarray(escalas, dtype=np.float64)
+
+    # FOV no mapa mundo
+    fov = TAMANHO_TELA / escalas
+
+    # Em tiles
+    tiles = fov / PIXELS_POR_TILE
+
+    # Clique na tela para o destino de exemplo, arredondado para o pixel
+    cliques = CENTRO_TELA + DELTA_EXEMPLO * escalas
+    np.rint(cliques, out=cliques)
+    if cliques_int is None or cliques_int.shape != cliques.shape:
+        cliques_int = np.empty(cliques.shape, dtype=np.int32)
+    cliques_int[:] = cliques
+
+    dentro = ((cliques_int[:, 0] >= 0) & (cliques_int[:, 0] <= TAMANHO_TELA[0]) &
+              (cliques_int[:, 1] >= 0) & (cliques_int[:, 1] <= TAMANHO_TELA[1]))
+
+    return {
+        'fov_mapa': fov,
+        'tiles': tiles,
+        'exemplo_clique': cliques_int,
+        'dentro_tela': dentro
+    }
+
+
+def testar_escala(escala_x, escala_y, descricao, calculo=None, i=0):
     """
     Testa uma escala específica
 
     Args:
         escala_x, escala_y: Valores de escala a testar
         descricao: Descrição do teste
+        calculo: Resultado de calcular_escalas já feito em lote (opcional)
+        i: Linha desta escala em `calculo`
     """
+    if calculo is None:
+        calculo = calcular_escalas([[escala_x, escala_y]])
+        i = 0
+
+    fov_mapa_x, fov_mapa_y = calculo['fov_mapa'][i]
+    tiles_x, tiles_y = calculo['tiles'][i]
+    x_tela, y_tela = calculo['exemplo_clique'][i]
+
     print("\n" + "="*70)
     print(f"🧪 TESTE: {descricao}")
     print(f"   Escala X: {escala_x:.2f}")
     print(f"   Escala Y: {escala_y:.2f}")
     print("="*70)
 
-    # Calcular FOV no mapa mundo
-    tela_largura = 1600
-    tela_altura = 900
-
-    fov_mapa_x = tela_largura / escala_x
-    fov_mapa_y = tela_altura / escala_y
-
     print(f"\n📐 FOV no mapa mundo:")
     print(f"   Largura: {fov_mapa_x:.1f}px")
     print(f"   Altura: {fov_mapa_y:.1f}px")
 
-    # Calcular em tiles (assumindo 1 tile = 20px no mapa)
-    tiles_x = fov_mapa_x / 20
-    tiles_y = fov_mapa_y / 20
-
-    print(f"\n🎮 Em tiles (20px/tile):")
+    print(f"\n🎮 Em tiles ({PIXELS_POR_TILE}px/tile):")
     print(f"   Horizontal: {tiles_x:.1f} tiles")
     print(f"   Vertical: {tiles_y:.1f} tiles")
 
     # Exemplo de conversão
+    delta_x, delta_y = DELTA_EXEMPLO
     print(f"\n📍 Exemplo de conversão:")
-    print(f"   Player em (374, 1342) no mapa mundo")
-    print(f"   Destino em (400, 1350) no mapa mundo")
-
-    delta_x = 400 - 374  # 26px
-    delta_y = 1350 - 1342  # 8px
-
-    x_tela = 800 + (delta_x * escala_x)
-    y_tela = 450 + (delta_y * escala_y)
-
+    print(f"   Player em {PLAYER_EXEMPLO} no mapa mundo")
+    print(f"   Destino em {DESTINO_EXEMPLO} no mapa mundo")
     print(f"   Delta: ({delta_x}, {delta_y}) pixels mundo")
-    print(f"   Clique na tela: ({int(x_tela)}, {int(y_tela)})")
+    print(f"   Clique na tela: ({x_tela}, {y_tela})")
 
     # Verificar se está dentro da tela
-    if 0 <= x_tela <= 1600 and 0 <= y_tela <= 900:
+    if calculo['dentro_tela'][i]:
         print(f"   ✅ Clique dentro da tela")
     else:
         print(f"   ❌ Clique FORA da tela!")
@@ -63,36 +110,38 @@ def testar_escala(escala_x, escala_y, descricao):
     return {
         'escala_x': escala_x,
         'escala_y': escala_y,
-        'fov_mapa': (fov_mapa_x, fov_mapa_y),
-        'tiles': (tiles_x, tiles_y),
-        'exemplo_clique': (x_tela, y_tela)
+        'fov_mapa': (float(fov_mapa_x), float(fov_mapa_y)),
+        'tiles': (float(tiles_x), float(tiles_y)),
+        'exemplo_clique': (int(x_tela), int(y_tela))
     }
 
 
+# (nome, escala_x, escala_y, descrição)
+TESTES = [
+    # TESTE 1: Configuração atual (ERRADA)
+    ('atual', 20.0, 20.0, "Configuração ATUAL (20.0)"),
+    # TESTE 2: Medição do usuário (Photoshop)
+    ('photoshop', 4.78, 4.76, "Medição PHOTOSHOP (334×189px)"),
+    # TESTE 3: Arredondado para 5.0 (igual navegador)
+    ('navegador', 5.0, 5.0, "Arredondado 5.0 (igual navegador)"),
+    # TESTE 4: Baseado no NCC (320×180)
+    ('ncc', 1600 / 320, 900 / 180, "Baseado NCC (320×180px)"),
+]
+
+
 def main():
     print("="*70)
     print("🎯 TESTE DE CALIBRAÇÃO DE ESCALA - CÂMERA VIRTUAL")
     print("="*70)
 
-    resultados = []
-
-    # TESTE 1: Configuração atual (ERRADA)
-    resultado1 = testar_escala(20.0, 20.0, "Configuração ATUAL (20.0)")
-    resultados.append(('atual', resultado1))
-
-    # TESTE 2: Medição do usuário (Photoshop)
-    resultado2 = testar_escala(4.78, 4.76, "Medição PHOTOSHOP (334×189px)")
-    resultados.append(('photoshop', resultado2))
-
-    # TESTE 3: Arredondado para 5.0 (igual navegador)
-    resultado3 = testar_escala(5.0, 5.0, "Arredondado 5.0 (igual navegador)")
-    resultados.append(('navegador', resultado3))
+    # Todas as escalas calculadas em uma passada; o loop só imprime
+    escalas = np.array([[ex, ey] for _, ex, ey, _ in TESTES])
+    calculo = calcular_escalas(escalas)
 
-    # TESTE 4: Baseado no NCC (320×180)
-    escala_ncc_x = 1600 / 320
-    escala_ncc_y = 900 / 180
-    resultado4 = testar_escala(escala_ncc_x, escala_ncc_y, "Baseado NCC (320×180px)")
-    resultados.append(('ncc', resultado4))
+    resultados = []
+    for i, (nome, escala_x, escala_y, descricao) in enumerate(TESTES):
+        resultado = testar_escala(escala_x, escala_y, descricao, calculo, i)
+        resultados.append((nome, resultado))
 
     # COMPARAÇÃO FINAL
     print("\n" + "="*70)
@@ -11,28 +11,161 @@ Uso:
 4. Clica no mapa e vê se linha verde aparece correta
 """
 
+import os
 import cv2
 import numpy as np
 import time
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    ORJSON_DISPONIVEL = False
+
 sys.path.append('.')
 from gps_ncc_realtime import GPSRealtimeNCC
 from fast_capture import FastCapture
+from minitouch_tap import MinitouchTap
+from FARM.shell_persistente import ShellPersistente
+from FARM.farm_kernels import NUMBA_DISPONIVEL, bresenham_corredor, contar_verde, tem_verde_roi, aquecer
+
+
+# Direção → deslocamento unitário em tiles (x, y)
+DIRECOES_UNITARIAS = {
+    'cima': (0, -1),
+    'baixo': (0, 1),
+    'esquerda': (-1, 0),
+    'direita': (1, 0),
+}
+
+
+@lru_cache(maxsize=256)
+def _click_offset(direcao, tiles, fator, cx, cy):
+    """
+    Ponto do mapa a `tiles` tiles do centro (cx, cy) na direção dada
+
+    Função pura em cache: voltar a um fator de escala já testado (ou
+    repetir direção × tiles) não refaz a conta.
+
+    Returns:
+        (x, y) ou None se a direção não existe
+    """
+    unitario = DIRECOES_UNITARIAS.get(direcao)
+    if unitario is None:
+        return None
+    dx, dy = unitario
+
+    # Posição final no mapa (player sempre no centro)
+    return (int(cx + dx * fator * tiles), int(cy + dy * fator * tiles))
+
+
+class Metronomo:
+    """
+    Espera o próximo tick de um período fixo
+
+    Com timerfd (Linux, Python 3.13+) o kernel acorda a thread no tick
+    certo do CLOCK_MONOTONIC (o mesmo do perf_counter); sem ele, sleep
+    até o próximo instante. Nos dois casos os atrasos não acumulam:
+    ticks perdidos são pulados.
+    """
+
+    def __init__(self):
+        self._fd = None
+        if hasattr(os, 'timerfd_create'):
+            self._fd = os.timerfd_create(time.CLOCK_MONOTONIC)
+        self._periodo = None
+        self._proximo = time.perf_counter()
+
+    def esperar(self, periodo):
+        """Bloqueia até o próximo tick (rearma o timer se o período mudou)"""
+        if self._fd is not None:
+            if periodo != self._periodo:
+                os.timerfd_settime(self._fd, initial=periodo, interval=periodo)
+                self._periodo = periodo
+            os.read(self._fd, 8)  # nº de ticks desde a última leitura
+            return
+
+        agora = time.perf_counter()
+        self._proximo = max(self._proximo + periodo, agora)
+        espera = self._proximo - agora
+        if espera > 0:
+            time.sleep(espera)
+
+    def fechar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
 
 
 class CalibradorManual:
+    DIRECOES_UNITARIAS = DIRECOES_UNITARIAS
+
+    # Meia largura (px) da região em volta do centro onde a linha verde
+    # pode aparecer (10 tiles × fator ~20 = 200px, com folga)
+    RAIO_LINHA_VERDE = 250
+
+    # Quantidades de tiles aceitas pelo menu
+    TILES_MENU = range(1, 11)
+
+    # Opções do menu → direção ('1'..'4' na ordem de DIRECOES_UNITARIAS:
+    # cima, baixo, esquerda, direita - uma tabela só para menu e clicks)
+    DIRECOES_MENU = {str(i): direcao for i, direcao in enumerate(DIRECOES_UNITARIAS, 1)}
+
+    # Textos fixos dos menus (montados uma vez, escritos de uma vez)
+    TEXTO_MENU = "\n".join([
+        "=" * 70,
+        "\n🎯 MODO DE OPERAÇÃO:",
+        "   e - Testar ESCALA (ver se linha verde aparece)",
+        "   v - Calibrar VELOCIDADE (medir timing preciso)",
+        "\n⚙️ AJUSTES:",
+        "   + - Aumentar fator de escala (+0.1)",
+        "   - - Diminuir fator de escala (-0.1)",
+        "   ++ - Aumentar muito (+1.0)",
+        "   -- - Diminuir muito (-1.0)",
+        "\n   r - Ver resultados das medições",
+        "   s - Salvar resultados em arquivo",
+        "   q - Sair e fechar mapa",
+    ]) + "\n"
+
+    TEXTO_MENU_DIRECAO = "\n".join([
+        "\n   🎯 ESCOLHA A DIREÇÃO:",
+        "      1 - ↑ CIMA (Norte)",
+        "      2 - ↓ BAIXO (Sul)",
+        "      3 - ← ESQUERDA (Oeste)",
+        "      4 - → DIREITA (Leste)",
+    ]) + "\n"
+
     def __init__(self):
         """Inicializa calibrador manual"""
         print("🚀 Inicializando GPS...")
         self.gps = GPSRealtimeNCC()
         self.device = self.gps.device
 
+        # Taps pelo minitouch (socket aberto); sem ele, `input tap` em um
+        # shell persistente (sem abrir conexão nova por tap)
+        self.shell_tap = ShellPersistente(self.device)
+        self.toque = MinitouchTap(self.device)
+        try:
+            self.toque.abrir()
+        except Exception as e:
+            print(f"⚠️ minitouch indisponível, usando input tap: {e}")
+            self.toque.fechar()
+            self.toque = None
+            # Abrir já: a conexão do primeiro tap não entra na 1ª medição
+            self.shell_tap.abrir()
+
+        # Screenshots de debug são gravadas em segundo plano
+        # (encode não trava o polling da linha verde)
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="debug-io")
+
         # Inicializar captura rápida (scrcpy ou ADB)
         print("🚀 Inicializando captura rápida...")
-        self.fast_capture = FastCapture(device=self.device, preferred_method='auto')
+        self.fast_capture = FastCapture(device=self.device, preferred_method='auto', adb_em_thread=True)
         self.fast_capture.start()
 
         # Centro do mapa (player sempre aqui)
@@ -46,29 +179,89 @@ class CalibradorManual:
         # Tamanho do tile em pixels no mundo
         self.pixels_por_tile = 32
 
+        # Cache do corredor da linha verde (ver _corredor_linha)
+        self._corredor_chave = None
+        self._corredor = None
+
+        # Somas acumuladas das medições: médias e regressão em O(1)
+        # (x = distância em px, y = duração) - ver _calcular_estatisticas
+        self._agg = {'soma_vel': 0.0, 'soma_tempo': 0.0, 'n': 0,
+                     'sx': 0.0, 'sy': 0.0, 'sxy': 0.0, 'sxx': 0.0}
+
+        # Compilar os kernels Numba agora, não no primeiro click
+        aquecer()
+
         # Posição do player
         self.player_x = None
         self.player_y = None
 
         print("✅ Inicialização completa!\n")
 
+    @property
+    def fator_escala(self):
+        """Pixels no mapa por tile"""
+        return self._fator_escala
+
+    @fator_escala.setter
+    def fator_escala(self, valor):
+        self._fator_escala = valor
+
+        # Todos os clicks do menu (direção × tiles) já prontos
+        self._click_table = {
+            (direcao, tiles): self._click_mapa(direcao, tiles)
+            for direcao in self.DIRECOES_UNITARIAS
+            for tiles in self.TILES_MENU
+        }
+
     def executar_tap(self, x, y):
         """Executa tap em coordenada específica"""
+        if self.toque is not None:
+            try:
+                self.toque.tap(x, y)
+                return True
+            except OSError as e:
+                print(f"⚠️ minitouch caiu, voltando para input tap: {e}")
+                self.toque.fechar()
+                self.toque = None
+
+        comando = f"input tap {x} {y}"
         try:
-            self.device.shell(f"input tap {x} {y}")
+            self.shell_tap.enviar(comando)
+            return True
+        except Exception as e:
+            print(f"⚠️ Shell persistente falhou, usando shell avulso: {e}")
+
+        try:
+            self.device.shell(comando)
             return True
         except Exception as e:
             print(f"❌ Erro ao executar tap: {e}")
             return False
 
-    def capturar_tela(self):
-        """Captura screenshot do dispositivo via FastCapture"""
+    def capturar_tela(self, depois_de=None):
+        """
+        Captura screenshot do dispositivo via FastCapture
+
+        Args:
+            depois_de: time.perf_counter() do tap; ignora frames capturados antes dele
+        """
         try:
-            return self.fast_capture.get_frame(timeout=1.0)
+            return self.fast_capture.get_frame(timeout=1.0, depois_de=depois_de)
         except Exception as e:
             print(f"❌ Erro ao capturar tela: {e}")
             return None
 
+    def capturar_tela_com_tempo(self, depois_de=None):
+        """
+        Como capturar_tela, mas devolve (img, tempo) com o instante em que
+        a captura começou (o que a tela mostrava, não quando chegou)
+        """
+        try:
+            return self.fast_capture.get_frame_com_tempo(timeout=1.0, depois_de=depois_de)
+        except Exception as e:
+            print(f"❌ Erro ao capturar tela: {e}")
+            return None, None
+
     def calcular_click_mapa(self, direcao, tiles):
         """
         Calcula onde clicar no mapa baseado em direção e quantidade de tiles
@@ -80,40 +273,27 @@ class CalibradorManual:
         Returns:
             (x, y): coordenadas para clicar no mapa
         """
-        # Delta em tiles
-        if direcao == 'cima':
-            delta_tiles_x = 0
-            delta_tiles_y = -tiles
-        elif direcao == 'baixo':
-            delta_tiles_x = 0
-            delta_tiles_y = tiles
-        elif direcao == 'esquerda':
-            delta_tiles_x = -tiles
-            delta_tiles_y = 0
-        elif direcao == 'direita':
-            delta_tiles_x = tiles
-            delta_tiles_y = 0
-        else:
-            return None
-
-        # Converter tiles → pixels no mapa
-        # Fórmula: delta_tiles * fator_escala = pixels no mapa
-        delta_mapa_x = delta_tiles_x * self.fator_escala
-        delta_mapa_y = delta_tiles_y * self.fator_escala
-
-        # Posição final no mapa (player sempre no centro)
-        mapa_x = int(self.centro_mapa_x + delta_mapa_x)
-        mapa_y = int(self.centro_mapa_y + delta_mapa_y)
+        coords = self._click_table.get((direcao, tiles))
+        if coords is None:
+            coords = self._click_mapa(direcao, tiles)
+        return coords
 
-        return (mapa_x, mapa_y)
+    def _click_mapa(self, direcao, tiles):
+        """Conta do calcular_click_mapa (usada para montar _click_table)"""
+        return _click_offset(direcao, tiles, self._fator_escala,
+                             self.centro_mapa_x, self.centro_mapa_y)
 
-    def detectar_linha_verde(self, img, retornar_contagem=False):
+    def detectar_linha_verde(self, img, retornar_contagem=False, destino=None):
         """
         Detecta se há linha verde no mapa
 
         Args:
             img: imagem capturada
             retornar_contagem: se True, retorna (bool, pixels_verdes)
+            destino: (x, y) do click; se passado, só olha o corredor de
+                     ±3px entre o centro do mapa e o click (a linha verde
+                     sempre liga os dois). Sem ele, olha o quadrado de
+                     ±RAIO_LINHA_VERDE px em volta do centro do mapa
 
         Returns:
             bool ou (bool, int): True se detectou linha verde, opcionalmente com contagem
@@ -121,26 +301,133 @@ class CalibradorManual:
         if img is None:
             return (False, 0) if retornar_contagem else False
 
-        # Converter para HSV
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # Linha verde: #00ff00 (verde puro)
-        verde_lower = np.array([50, 150, 150])
-        verde_upper = np.array([70, 255, 255])
-
-        # Criar máscara
-        mask = cv2.inRange(hsv, verde_lower, verde_upper)
+        if destino is None:
+            # A linha sai do player (centro do mapa) e vai no máximo
+            # 10 tiles × fator: o resto do frame nunca tem linha
+            r = self.RAIO_LINHA_VERDE
+            y0 = max(0, self.centro_mapa_y - r)
+            x0 = max(0, self.centro_mapa_x - r)
+            y1 = min(img.shape[0], self.centro_mapa_y + r)
+            x1 = min(img.shape[1], self.centro_mapa_x + r)
+            # Se encontrou pelo menos 100 pixels verdes, tem linha
+            minimo_verdes = 100
+
+            if NUMBA_DISPONIVEL and not retornar_contagem:
+                # Uma passada só e para no 101º pixel verde
+                return bool(tem_verde_roi(img, y0, y1, x0, x1, minimo_verdes))
+            pixels = img[y0:y1, x0:x1, :3]
+        else:
+            xs, ys = self._corredor_linha(destino, img.shape)
+            # Pelo menos 10% do corredor verde
+            minimo_verdes = max(5, len(xs) // 10)
 
         # Contar pixels verdes
-        pixels_verdes = cv2.countNonZero(mask)
+        if destino is not None and NUMBA_DISPONIVEL:
+            # Sem a cópia com fancy indexing nem as máscaras intermediárias
+            pixels_verdes = int(contar_verde(img, xs, ys))
+        else:
+            if destino is not None:
+                pixels = img[ys, xs, :3]
+            pixels_verdes = int(np.count_nonzero(self._mascara_verde(pixels)))
 
-        # Se encontrou pelo menos 100 pixels verdes, tem linha
-        tem_linha = pixels_verdes > 100
+        tem_linha = pixels_verdes > minimo_verdes
 
         if retornar_contagem:
             return tem_linha, pixels_verdes
         return tem_linha
 
+    def detectar_linha_nova(self, img_antes, img_depois, destino):
+        """
+        Detecta linha verde que APARECEU entre dois frames (antes/depois do click)
+
+        Só o corredor centro → destino é comparado: pixel conta se está
+        verde depois do click e mudou em relação ao frame de antes.
+
+        Args:
+            img_antes, img_depois: frames capturados antes e depois do tap
+            destino: (x, y) do click
+
+        Returns:
+            bool: True se uma linha verde nova surgiu no corredor
+        """
+        if img_antes is None or img_depois is None or img_antes.shape != img_depois.shape:
+            return self.detectar_linha_verde(img_depois, destino=destino)
+
+        xs, ys = self._corredor_linha(destino, img_depois.shape)
+        antes = img_antes[ys, xs, :3]
+        depois = img_depois[ys, xs, :3]
+
+        # Diferença, limiar e verde numa passada só sobre o corredor
+        mudou = cv2.absdiff(depois, antes).max(axis=-1) > 40
+        novos = np.count_nonzero(mudou & self._mascara_verde(depois))
+
+        return novos > max(5, len(xs) // 10)
+
+    @staticmethod
+    def _mascara_verde(pixels):
+        """
+        Máscara dos pixels da linha verde (#00ff00) em uma imagem ou lista BGR
+
+        Mesmo critério do inRange em HSV (H 50-70, S >= 150, V >= 150),
+        escrito direto em BGR para não converter o frame inteiro:
+          H entre 100° e 140° → verde é o canal máximo e |B-R| <= (V-min) / 3
+          V = G >= 150;  S = 255 (V-min) / V >= 150  ⇔  17 (V-min) >= 10 V
+        """
+        # int16 basta com o S dividido por 15 (máximo 17 * 255)
+        b = pixels[..., 0].astype(np.int16)
+        g = pixels[..., 1].astype(np.int16)
+        r = pixels[..., 2].astype(np.int16)
+        croma = g - np.minimum(b, r)
+
+        mask = (g >= b) & (g >= r) & (g >= 150)
+        mask &= np.int16(17) * croma >= np.int16(10) * g
+        mask &= np.int16(3) * np.abs(b - r) <= croma
+        return mask
+
+    def _corredor_linha(self, destino, shape, meia_banda=3):
+        """
+        Pixels do segmento centro do mapa → destino, com ±meia_banda px
+
+        Com Numba usa o Bresenham compilado (farm_kernels); sem ele, um
+        ponto por pixel do eixo maior em NumPy (mesma cobertura), a banda
+        vai no eixo menor. Fica em cache enquanto o click e o
+        tamanho do frame não mudam (o polling chama isso a cada captura).
+
+        Returns:
+            (xs, ys): índices (N,) dentro do frame
+        """
+        chave = (destino, shape[:2], meia_banda)
+        if self._corredor_chave == chave:
+            return self._corredor
+
+        x0, y0 = self.centro_mapa_x, self.centro_mapa_y
+        x1, y1 = destino
+        altura, largura = shape[:2]
+
+        if NUMBA_DISPONIVEL:
+            self._corredor = bresenham_corredor(x0, y0, x1, y1, meia_banda, largura, altura)
+            self._corredor_chave = chave
+            return self._corredor
+
+        n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        t = np.linspace(0.0, 1.0, n)
+        xs = np.rint(x0 + (x1 - x0) * t).astype(np.intp)
+        ys = np.rint(y0 + (y1 - y0) * t).astype(np.intp)
+
+        desvios = np.arange(-meia_banda, meia_banda + 1)
+        if abs(x1 - x0) >= abs(y1 - y0):
+            xs = np.repeat(xs, len(desvios))
+            ys = (ys[:, None] + desvios).ravel()
+        else:
+            xs = (xs[:, None] + desvios).ravel()
+            ys = np.repeat(ys, len(desvios))
+
+        dentro = (xs >= 0) & (xs < largura) & (ys >= 0) & (ys < altura)
+
+        self._corredor = (xs[dentro], ys[dentro])
+        self._corredor_chave = chave
+        return self._corredor
+
     def medir_velocidade(self, direcao, tiles):
         """
         Mede velocidade de movimento com timing preciso
@@ -164,7 +451,7 @@ class CalibradorManual:
         print(f"   📍 Click no mapa: ({mapa_x}, {mapa_y})")
 
         # IMPORTANTE: Capturar tempo ANTES do click
-        tempo_click = time.time()
+        tempo_click = time.perf_counter()
 
         # Executar click
         print(f"   👆 Clicando...")
@@ -178,52 +465,29 @@ class CalibradorManual:
         time.sleep(0.1)
 
         # Aguardar linha verde sumir (fim do movimento)
-        tempo_fim = None
-        timeout = time.time() + 15.0
-        ultima_contagem = 0
-
         print(f"   ⏱️ Aguardando movimento completar...")
-        while time.time() < timeout:
-            img = self.capturar_tela()
-            tem_linha, pixels_verdes = self.detectar_linha_verde(img, retornar_contagem=True)
-            ultima_contagem = pixels_verdes
-
-            # CRITÉRIO MAIS RIGOROSO: linha verde sumiu = MENOS de 10 pixels verdes
-            # (antes era <100, agora é <10 para ser mais preciso)
-            if pixels_verdes < 10:
-                tempo_fim = time.time()
-                duracao = tempo_fim - tempo_inicio
-
-                # SALVAR SCREENSHOT DO FIM (linha verde sumiu!)
-                timestamp = time.strftime('%H%M%S')
-                filename_fim = f'DEBUG_FIM_{tiles}tiles_{direcao}_{timestamp}.png'
-
-                # Adicionar texto na imagem para debug
-                img_debug = img.copy()
-                velocidade_temp = (tiles * self.pixels_por_tile) / duracao
-                cv2.putText(img_debug, f'FIM - {tiles} tiles {direcao}', (50, 50),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                cv2.putText(img_debug, f'Duracao: {duracao:.3f}s', (50, 100),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                cv2.putText(img_debug, f'Velocidade: {velocidade_temp:.1f} px/s', (50, 150),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                cv2.putText(img_debug, f'Pixels verdes: {pixels_verdes}', (50, 200),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                cv2.putText(img_debug, f'Tempo: {timestamp}', (50, 250),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-                cv2.imwrite(filename_fim, img_debug)
-
-                print(f"   ✅ Movimento completo em {duracao:.3f}s")
-                print(f"   📊 Pixels verdes no fim: {pixels_verdes}")
-                print(f"   📸 Screenshot fim: {filename_fim}")
-                break
-            time.sleep(0.01)  # 10ms polling = 100 FPS!
+        img, tempo_fim, pixels_verdes = self._aguardar_fim_linha(
+            (mapa_x, mapa_y), 15.0, depois_de=tempo_click)
 
         if tempo_fim is None:
             print(f"   ⚠️ Timeout aguardando fim do movimento")
             return None
 
+        duracao = tempo_fim - tempo_inicio
+
+        # SALVAR SCREENSHOT DO FIM (linha verde sumiu!)
+        timestamp = time.strftime('%H%M%S')
+        filename_fim = f'DEBUG_FIM_{tiles}tiles_{direcao}_{timestamp}.jpg'
+
+        # Texto e gravação em thread (putText + encode não atrasam a
+        # próxima medição); a cópia fica aqui, antes do frame ser reaproveitado
+        self._io_pool.submit(self._salvar_debug_fim, img.copy(), filename_fim,
+                             tiles, direcao, duracao, pixels_verdes, timestamp)
+
+        print(f"   ✅ Movimento completo em {duracao:.3f}s")
+        print(f"   📊 Pixels verdes no fim: {pixels_verdes}")
+        print(f"   📸 Screenshot fim: {filename_fim}")
+
         # Calcular velocidade (usando distância solicitada, sem GPS de verificação)
         distancia_px = tiles * self.pixels_por_tile
         velocidade = distancia_px / duracao
@@ -232,6 +496,15 @@ class CalibradorManual:
         print(f"   🏃 Velocidade: {velocidade:.1f} px/s")
         print(f"   ⏱️ Tempo por tile: {tempo_por_tile:.3f}s")
 
+        agg = self._agg
+        agg['soma_vel'] += velocidade
+        agg['soma_tempo'] += tempo_por_tile
+        agg['n'] += 1
+        agg['sx'] += distancia_px
+        agg['sy'] += duracao
+        agg['sxy'] += distancia_px * duracao
+        agg['sxx'] += distancia_px * distancia_px
+
         return {
             'direcao': direcao,
             'tiles_solicitados': tiles,
@@ -242,6 +515,117 @@ class CalibradorManual:
             'tempo_por_tile': tempo_por_tile
         }
 
+    def _salvar_debug_fim(self, img_debug, filename, tiles, direcao, duracao,
+                          pixels_verdes, timestamp):
+        """Anota e grava o screenshot do fim do movimento (roda no _io_pool)"""
+        velocidade_temp = (tiles * self.pixels_por_tile) / duracao
+        cv2.putText(img_debug, f'FIM - {tiles} tiles {direcao}', (50, 50),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        cv2.putText(img_debug, f'Duracao: {duracao:.3f}s', (50, 100),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        cv2.putText(img_debug, f'Velocidade: {velocidade_temp:.1f} px/s', (50, 150),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        cv2.putText(img_debug, f'Pixels verdes: {pixels_verdes}', (50, 200),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.putText(img_debug, f'Tempo: {timestamp}', (50, 250),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+        # JPEG q=80: PNG (zlib) custava dezenas de ms e é só diagnóstico
+        cv2.imwrite(filename, img_debug, [cv2.IMWRITE_JPEG_QUALITY, 80])
+
+    def _aguardar_fim_linha(self, destino, timeout, depois_de, hz=100, hz_lento=20,
+                            janela_rapida=0.5):
+        """
+        Espera a linha verde do corredor centro → destino sumir
+
+        Polling adaptativo: `hz` nas transições (primeiros `janela_rapida`
+        segundos depois do tap e quando a linha já caiu para menos da
+        metade do pico, ou seja, perto do fim) e `hz_lento` no meio do
+        trajeto, onde a linha está estável. A espera (Metronomo) só cobre
+        o que falta até o próximo tick (captura + detecção contam dentro
+        do período). Com a thread de captura o get já bloqueia até o próximo
+        frame, então normalmente nem dorme.
+
+        Args:
+            destino: (x, y) do click
+            timeout: Espera máxima (s)
+            depois_de: Ignora frames capturados antes disso (instante do tap)
+            hz: Frequência máxima de captura nas transições
+            hz_lento: Frequência com a linha estável
+            janela_rapida: Segundos em `hz` logo depois do início
+
+        Returns:
+            (img, tempo do frame, pixels verdes) - img/tempo None se deu timeout
+        """
+        periodo_rapido = 1.0 / hz
+        periodo_lento = 1.0 / hz_lento
+        inicio = time.perf_counter()
+        limite = inicio + timeout
+        pixels_verdes = 0
+        pico = 0
+
+        metronomo = Metronomo()
+        try:
+            while True:
+                img, tempo_img = self.capturar_tela_com_tempo(depois_de=depois_de)
+                if img is not None:
+                    _, pixels_verdes = self.detectar_linha_verde(
+                        img, retornar_contagem=True, destino=destino)
+
+                    # CRITÉRIO MAIS RIGOROSO: linha verde sumiu = MENOS de 10 pixels verdes
+                    # (antes era <100, agora é <10 para ser mais preciso)
+                    if pixels_verdes < 10:
+                        # O fim é o instante do frame, não o de agora
+                        return img, tempo_img, pixels_verdes
+                    pico = max(pico, pixels_verdes)
+
+                agora = time.perf_counter()
+                if agora >= limite:
+                    return None, None, pixels_verdes
+
+                rapido = agora - inicio < janela_rapida or 2 * pixels_verdes < pico
+                metronomo.esperar(periodo_rapido if rapido else periodo_lento)
+        finally:
+            metronomo.fechar()
+
+    def _calcular_estatisticas(self):
+        """
+        Médias e regressão linear das medições, direto das somas acumuladas
+
+        medir_velocidade soma cada medição em self._agg, então aqui é
+        O(1): nada de percorrer a lista nem montar arrays para o polyfit.
+
+        REGRESSÃO LINEAR: tempo = a * distancia + b (mínimos quadrados)
+        a = 1/velocidade, b = overhead fixo (que a regressão elimina!)
+
+        Returns:
+            (vel_media, tempo_medio, regressao) - regressao é
+            (velocidade_real, overhead) ou None com menos de 3 medições
+            (ou todas na mesma distância)
+        """
+        agg = self._agg
+        n = agg['n']
+        vel_media = agg['soma_vel'] / n
+        tempo_medio = agg['soma_tempo'] / n
+
+        regressao = None
+        denominador = n * agg['sxx'] - agg['sx'] * agg['sx']
+        if n >= 3 and denominador != 0:
+            a = (n * agg['sxy'] - agg['sx'] * agg['sy']) / denominador
+            b = (agg['sy'] - a * agg['sx']) / n
+            if a != 0:
+                regressao = (1.0 / a, b)
+
+        return vel_media, tempo_medio, regressao
+
+    def fechar(self):
+        """Espera as screenshots pendentes, fecha o minitouch e para a captura"""
+        self._io_pool.shutdown(wait=True)
+        if self.toque is not None:
+            self.toque.fechar()
+        self.shell_tap.fechar()
+        self.fast_capture.stop()
+
     def menu_principal(self):
         """Menu principal interativo"""
         print("=" * 70)
@@ -284,20 +668,12 @@ class CalibradorManual:
 
         try:
             while True:
-                print("\n" + "=" * 70)
-                print(f"📏 FATOR DE ESCALA ATUAL: {self.fator_escala:.2f}")
-                print("=" * 70)
-                print("\n🎯 MODO DE OPERAÇÃO:")
-                print("   e - Testar ESCALA (ver se linha verde aparece)")
-                print("   v - Calibrar VELOCIDADE (medir timing preciso)")
-                print("\n⚙️ AJUSTES:")
-                print("   + - Aumentar fator de escala (+0.1)")
-                print("   - - Diminuir fator de escala (-0.1)")
-                print("   ++ - Aumentar muito (+1.0)")
-                print("   -- - Diminuir muito (-1.0)")
-                print("\n   r - Ver resultados das medições")
-                print("   s - Salvar resultados em arquivo")
-                print("   q - Sair e fechar mapa")
+                # Menu inteiro em uma escrita só (input() faz o flush)
+                sys.stdout.write(
+                    "\n" + "=" * 70 + "\n" +
+                    f"📏 FATOR DE ESCALA ATUAL: {self.fator_escala:.2f}\n" +
+                    self.TEXTO_MENU
+                )
 
                 escolha = input("\nSua escolha: ").strip().lower()
 
@@ -323,26 +699,14 @@ class CalibradorManual:
                         print(f"      ⏱️ Tempo/tile: {m['tempo_por_tile']:.3f}s")
 
                     # Calcular média
-                    vel_media = sum(m['velocidade_px_s'] for m in medicoes) / len(medicoes)
-                    tempo_medio = sum(m['tempo_por_tile'] for m in medicoes) / len(medicoes)
+                    vel_media, tempo_medio, regressao = self._calcular_estatisticas()
 
                     print(f"\n   📊 MÉDIAS:")
                     print(f"      🏃 Velocidade média: {vel_media:.1f} px/s")
                     print(f"      ⏱️ Tempo médio por tile: {tempo_medio:.3f}s")
 
-                    # REGRESSÃO LINEAR: distância vs tempo
-                    # Isso elimina o overhead fixo!
-                    if len(medicoes) >= 3:
-                        import numpy as np
-
-                        distancias = np.array([m['distancia_px'] for m in medicoes])
-                        tempos = np.array([m['duracao'] for m in medicoes])
-
-                        # Regressão linear: tempo = a * distancia + b
-                        # a = 1/velocidade, b = overhead
-                        coef = np.polyfit(distancias, tempos, 1)
-                        velocidade_real = 1.0 / coef[0]
-                        overhead = coef[1]
+                    if regressao is not None:
+                        velocidade_real, overhead = regressao
 
                         print(f"\n   📈 REGRESSÃO LINEAR (elimina overhead!):")
                         print(f"      🏃 Velocidade REAL: {velocidade_real:.1f} px/s")
@@ -360,24 +724,15 @@ class CalibradorManual:
                     Path("FARM").mkdir(exist_ok=True)
 
                     # Calcular estatísticas
-                    vel_media = sum(m['velocidade_px_s'] for m in medicoes) / len(medicoes)
-                    tempo_medio = sum(m['tempo_por_tile'] for m in medicoes) / len(medicoes)
+                    vel_media, tempo_medio, regressao = self._calcular_estatisticas()
 
                     # REGRESSÃO LINEAR para velocidade real
                     velocidade_real = vel_media
                     overhead = 0.0
                     tempo_real = tempo_medio
 
-                    if len(medicoes) >= 3:
-                        import numpy as np
-
-                        distancias = np.array([m['distancia_px'] for m in medicoes])
-                        tempos = np.array([m['duracao'] for m in medicoes])
-
-                        # Regressão linear
-                        coef = np.polyfit(distancias, tempos, 1)
-                        velocidade_real = 1.0 / coef[0]
-                        overhead = coef[1]
+                    if regressao is not None:
+                        velocidade_real, overhead = regressao
                         tempo_real = self.pixels_por_tile / velocidade_real
 
                         print(f"\n   📈 Regressão linear aplicada:")
@@ -395,8 +750,13 @@ class CalibradorManual:
                     }
 
                     filename = 'FARM/velocidade_personagem.json'
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(resultado, f, indent=2, ensure_ascii=False)
+                    # Serializa inteiro e grava numa escrita só
+                    if ORJSON_DISPONIVEL:
+                        Path(filename).write_bytes(orjson.dumps(
+                            resultado, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+                    else:
+                        Path(filename).write_text(
+                            json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
 
                     print(f"\n   ✅ Resultados salvos: {filename}")
                     print(f"   🏃 Velocidade REAL: {velocidade_real:.1f} px/s")
@@ -426,31 +786,19 @@ class CalibradorManual:
                     modo_velocidade = (escolha == 'v')
 
                     # Escolher direção
-                    print("\n   🎯 ESCOLHA A DIREÇÃO:")
-                    print("      1 - ↑ CIMA (Norte)")
-                    print("      2 - ↓ BAIXO (Sul)")
-                    print("      3 - ← ESQUERDA (Oeste)")
-                    print("      4 - → DIREITA (Leste)")
+                    sys.stdout.write(self.TEXTO_MENU_DIRECAO)
 
                     dir_escolha = input("   Direção: ").strip()
 
-                    direcoes = {
-                        '1': 'cima',
-                        '2': 'baixo',
-                        '3': 'esquerda',
-                        '4': 'direita'
-                    }
-
-                    if dir_escolha not in direcoes:
+                    direcao = self.DIRECOES_MENU.get(dir_escolha)
+                    if direcao is None:
                         print("   ❌ Opção inválida!")
                         continue
 
-                    direcao = direcoes[dir_escolha]
-
                     # Pedir quantidade de tiles
                     try:
                         tiles = int(input("   📏 Quantos tiles? (1-10): "))
-                        if tiles < 1 or tiles > 10:
+                        if tiles not in self.TILES_MENU:
                             print("   ❌ Valor inválido! Use 1-10")
                             continue
                     except ValueError:
@@ -477,16 +825,23 @@ class CalibradorManual:
                         print(f"   📐 Fator de escala: {self.fator_escala:.2f}")
                         print(f"   📍 Click no mapa: ({mapa_x}, {mapa_y})")
 
+                        # Frame de referência (verde que já estava no mapa não conta)
+                        img_antes = self.capturar_tela()
+
                         # Executar click
                         print(f"   👆 Clicando...")
+                        tempo_tap = time.perf_counter()
                         self.executar_tap(mapa_x, mapa_y)
 
                         # IMEDIATAMENTE verificar linha verde (sem delay!)
                         print("   🟢 Verificando linha verde...")
                         time.sleep(0.05)  # Mínimo delay para linha aparecer
-                        img = self.capturar_tela()
+                        img = self.capturar_tela(depois_de=tempo_tap)
 
-                        tem_linha = self.detectar_linha_verde(img)
+                        if img_antes is not None:
+                            tem_linha = self.detectar_linha_nova(img_antes, img, (mapa_x, mapa_y))
+                        else:
+                            tem_linha = self.detectar_linha_verde(img, destino=(mapa_x, mapa_y))
 
                         if tem_linha:
                             print("   ✅ LINHA VERDE DETECTADA!")
@@ -514,8 +869,7 @@ class CalibradorManual:
             print(f"   📊 Medições realizadas: {len(medicoes)}")
 
             if medicoes:
-                vel_media = sum(m['velocidade_px_s'] for m in medicoes) / len(medicoes)
-                tempo_medio = sum(m['tempo_por_tile'] for m in medicoes) / len(medicoes)
+                vel_media, tempo_medio, _ = self._calcular_estatisticas()
 
                 print(f"\n   🏃 Velocidade média: {vel_media:.1f} px/s")
                 print(f"   ⏱️ Tempo médio por tile: {tempo_medio:.3f}s")
@@ -542,4 +896,4 @@ if __name__ == "__main__":
     finally:
         # Limpar fast_capture
         if calibrador is not None and hasattr(calibrador, 'fast_capture'):
-            calibrador.fast_capture.stop()
+            calibrador.fechar()
@@ -11,6 +11,7 @@ Funcionamento:
 6. Salva em FARM/velocidade_personagem.json
 """
 
+import os
 import cv2
 import numpy as np
 import time
@@ -20,11 +21,18 @@ import sys
 import random
 import math
 
+# cvtColor/inRange/morfologia do polling divididos entre até 4 núcleos
+# (o resto fica para a thread de captura e o adb)
+cv2.setUseOptimized(True)
+cv2.setNumThreads(min(4, os.cpu_count() or 1))
+
 # Importar GPS e A*
 sys.path.append('.')
 from gps_ncc_realtime import GPSRealtimeNCC
 from pathfinding_astar import AStarPathfinder
 from fast_capture import FastCapture
+from FARM.shell_persistente import ShellPersistente
+from minitouch_tap import MinitouchTap
 
 
 class CalibradorVelocidade:
@@ -34,9 +42,24 @@ class CalibradorVelocidade:
         # Usar device do GPS (já conectado)
         self.device = self.gps.device
 
+        # Taps pelo minitouch (toque nativo por socket, sem o app_process
+        # Java do `input`); sem ele, `input tap` em um shell ADB que fica
+        # aberto. O atraso entre tempo_click e o tap real entra na medição
+        self.shell_tap = ShellPersistente(self.device)
+        self.toque = MinitouchTap(self.device)
+        try:
+            self.toque.abrir()
+        except Exception as e:
+            print(f"⚠️ minitouch indisponível, usando input tap: {e}")
+            self.toque.fechar()
+            self.toque = None
+            self.shell_tap.abrir()
+
         # Inicializar captura rápida (scrcpy ou ADB)
+        # Frames chegam continuamente (thread/minicap): o polling da linha
+        # verde acorda a cada frame novo em vez de dormir entre capturas
         print("🚀 Inicializando captura rápida...")
-        self.fast_capture = FastCapture(device=self.device, preferred_method='auto')
+        self.fast_capture = FastCapture(device=self.device, preferred_method='auto', adb_em_thread=True)
         self.fast_capture.start()
 
         # Carregar matriz walkable para validar destinos
@@ -59,10 +82,17 @@ class CalibradorVelocidade:
         self.verde_x2 = 900
         self.verde_y2 = 550
 
-        # Configurações HSV para linha verde
-        # Verde em HSV: H=50-70 (tom), S>100 (saturação), V>100 (brilho)
-        self.verde_lower = np.array([40, 100, 100])
-        self.verde_upper = np.array([80, 255, 255])
+        # Linha verde na tela de jogo: HSV H 40-80, S >= 100, V >= 100,
+        # testado direto em BGR (ver _mascara_verde_bgr):
+        #   S = 255 (V-min) / V >= 100  ⇔  51 (V-min) >= 20 V
+        #   H entre 80° e 160°  ⇔  3 |B-R| <= 2 (V-min)
+        self.verde_v_min = 100
+        self.verde_sat = (51, 20)
+        self.verde_matiz = (3, 2)
+
+        # Buffers de máscara reaproveitados entre chamadas (alocados no
+        # primeiro frame; o polling chama os detectores a cada captura)
+        self._buffers_verde = {}
 
         # Distâncias para testar (em tiles)
         # Assumindo 1 tile = ~32 pixels
@@ -270,6 +300,8 @@ class CalibradorVelocidade:
 
             else:
                 # Fallback: sem A*, usar Manhattan
+                # (de propósito, não hypot: o personagem só anda em 4 direções,
+                # diagonal vira escada, então o caminho livre mede |dx| + |dy|)
                 distancia_manhattan = abs(offset_x) + abs(offset_y)
                 return mundo_x, mundo_y, distancia_manhattan, None
 
@@ -284,6 +316,50 @@ class CalibradorVelocidade:
             print(f"❌ Erro ao capturar tela: {e}")
             return None
 
+    def capturar_tela_com_tempo(self, depois_de=None):
+        """
+        Captura (img, tempo) - tempo é o time.perf_counter() do frame
+
+        Args:
+            depois_de: Ignora frames capturados antes disso (ex: do tap)
+        """
+        try:
+            return self.fast_capture.get_frame_com_tempo(timeout=1.0, depois_de=depois_de)
+        except Exception as e:
+            print(f"❌ Erro ao capturar tela: {e}")
+            return None, None
+
+    def aguardar_frame(self, condicao, timeout, depois_de=None):
+        """
+        Espera o primeiro frame novo em que condicao(img) é verdadeira
+
+        Sem sleep entre verificações: cada get bloqueia até o próximo
+        frame do produtor, e o tempo devolvido é o do frame (o que a tela
+        mostrava), não o de quando a detecção terminou.
+
+        Args:
+            condicao: Função img -> bool
+            timeout: Espera máxima (s)
+            depois_de: Ignora frames capturados antes disso
+
+        Returns:
+            tempo do frame (time.perf_counter()) ou None se deu timeout
+        """
+        limite = time.perf_counter() + timeout
+        ultimo = depois_de
+        while time.perf_counter() < limite:
+            img, tempo = self.capturar_tela_com_tempo(depois_de=ultimo)
+            if img is None:
+                continue
+            if tempo == ultimo:
+                # Mesmo frame de novo (adbnativeblitz devolve o último)
+                time.sleep(0.005)
+                continue
+            ultimo = tempo
+            if condicao(img):
+                return tempo
+        return None
+
     def detectar_linha_verde(self, img):
         """
         Detecta se linha verde está presente na imagem (TELA DE JOGO)
@@ -295,11 +371,17 @@ class CalibradorVelocidade:
         # Recortar região em torno do personagem
         roi = img[self.verde_y1:self.verde_y2, self.verde_x1:self.verde_x2]
 
-        # Converter para HSV
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        # Checagem grossa (1 a cada 2 px em cada eixo, 4x menos pixels):
+        # a maioria das chamadas do polling é "sem linha" e para aqui.
+        # Com passo 2, uma linha de 2+ px de espessura sempre cruza uma
+        # linha/coluna par da amostra (com passo 4, uma reta horizontal
+        # de 3 px podia passar entre as amostras)
+        if not self._linha_verde_grossa(roi[::2, ::2]):
+            return False
 
-        # Criar máscara para cor verde
-        mask = cv2.inRange(hsv, self.verde_lower, self.verde_upper)
+        # Máscara verde direto em BGR (nos buffers da ROI, sem HSV)
+        mask = self._mascara_verde_bgr(roi, 'roi', self.verde_v_min,
+                                       self.verde_sat, self.verde_matiz)
 
         # Contar pixels verdes
         pixels_verdes = cv2.countNonZero(mask)
@@ -307,7 +389,89 @@ class CalibradorVelocidade:
         # Threshold: precisa de pelo menos 50 pixels verdes para considerar linha presente
         return pixels_verdes > 50
 
-    def detectar_linha_verde_no_mapa(self, img):
+    def _linha_verde_grossa(self, amostra):
+        """True se a amostra subamostrada da ROI tem algum pixel verde"""
+        mask = self._mascara_verde_bgr(amostra, 'grossa', self.verde_v_min,
+                                       self.verde_sat, self.verde_matiz)
+        return cv2.countNonZero(mask) > 0
+
+    def _buffer(self, nome, shape, dtype):
+        """
+        Buffer de trabalho reaproveitado entre chamadas dos detectores
+
+        Realoca só se o tamanho da imagem mudar.
+        """
+        buf = self._buffers_verde.get(nome)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers_verde[nome] = buf
+        return buf
+
+    def _mascara_verde_pura(self, img):
+        """
+        Máscara 0/255 do verde puro (#00ff00) testada direto em BGR
+
+        Mesmo critério do inRange em HSV (H 50-70, S >= 150, V >= 150):
+          V = G >= 150;  S = 255 (V-min) / V >= 150  ⇔  17 (V-min) >= 10 V
+          H entre 100° e 140°  ⇔  3 |B-R| <= (V-min)
+        """
+        return self._mascara_verde_bgr(img, 'mapa', 150, (17, 10), (3, 1))
+
+    def _mascara_verde_bgr(self, img, prefixo, v_min, sat, matiz):
+        """
+        Máscara 0/255 de um inRange em HSV centrado no verde, sem HSV
+
+        Com H em volta de 60 (120°) o verde é o canal máximo, então
+        V = G e o resto vira comparação inteira nos canais:
+          G >= B, G >= R, G >= v_min
+          sat[0] (V-min) >= sat[1] V      (saturação mínima)
+          matiz[0] |B-R| <= matiz[1] (V-min)  (faixa de H)
+
+        int16 (metade da memória do int32): com a fração do S reduzida o
+        maior valor fica bem abaixo de 32767. Tudo com out= nos buffers
+        `prefixo_*` (o polling chama isso a cada captura).
+
+        Args:
+            img: Imagem BGR/BGRA (pode ser uma view com passo)
+            prefixo: Nome dos buffers ('roi', 'grossa', 'mapa')
+            v_min: V mínimo
+            sat, matiz: Pares (a, b) das desigualdades acima
+        """
+        h, w = img.shape[:2]
+
+        bgr = self._buffer(prefixo + '_bgr', (h, w, 3), np.int16)
+        croma = self._buffer(prefixo + '_croma', (h, w), np.int16)
+        aux = self._buffer(prefixo + '_aux', (h, w), np.int16)
+        aux2 = self._buffer(prefixo + '_aux2', (h, w), np.int16)
+        verde = self._buffer(prefixo + '_verde', (h, w), np.bool_)
+        tmp = self._buffer(prefixo + '_tmp', (h, w), np.bool_)
+        mask = self._buffer(prefixo + '_mask', (h, w), np.uint8)
+
+        np.copyto(bgr, img[..., :3])
+        b, g, r = bgr[..., 0], bgr[..., 1], bgr[..., 2]
+
+        np.minimum(b, r, out=croma)
+        np.subtract(g, croma, out=croma)
+
+        np.greater_equal(g, b, out=verde)
+        verde &= np.greater_equal(g, r, out=tmp)
+        verde &= np.greater_equal(g, v_min, out=tmp)
+
+        np.multiply(g, np.int16(sat[1]), out=aux)
+        np.multiply(croma, np.int16(sat[0]), out=aux2)
+        verde &= np.greater_equal(aux2, aux, out=tmp)
+
+        np.subtract(b, r, out=aux)
+        np.abs(aux, out=aux)
+        aux *= np.int16(matiz[0])
+        np.multiply(croma, np.int16(matiz[1]), out=aux2)
+        verde &= np.less_equal(aux, aux2, out=tmp)
+
+        # uint8 0/255 (morfologia e findContours)
+        np.multiply(verde, np.uint8(255), out=mask)
+        return mask
+
+    def detectar_linha_verde_no_mapa(self, img, raio=None):
         """
         Detecta e conta tiles da linha verde NO MAPA
 
@@ -316,6 +480,12 @@ class CalibradorVelocidade:
 
         IMPORTANTE: Após processamento de levels, a cor é #00ff00 (verde puro)
 
+        Args:
+            img: Screenshot com o mapa aberto
+            raio: Se passado, só olha o quadrado de ±raio px em volta do
+                  centro do mapa (o caminho sai do player, no centro, e
+                  não vai mais longe que o próprio comprimento)
+
         Retorna:
             int: Número de tiles da linha verde (ground truth!)
             None: Se não detectou linha
@@ -323,16 +493,14 @@ class CalibradorVelocidade:
         if img is None:
             return None
 
-        # Converter para HSV
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        if raio is not None:
+            y0 = max(0, int(self.centro_mapa_y) - raio)
+            x0 = max(0, int(self.centro_mapa_x) - raio)
+            img = img[y0:int(self.centro_mapa_y) + raio, x0:int(self.centro_mapa_x) + raio]
 
         # Linha verde após levels: #00ff00 (RGB: 0, 255, 0) = verde puro
-        # Em HSV: H~60 (verde puro), S alta, V alta
-        verde_lower = np.array([50, 150, 150])  # Mais restritivo para verde puro
-        verde_upper = np.array([70, 255, 255])
-
-        # Criar máscara
-        mask = cv2.inRange(hsv, verde_lower, verde_upper)
+        # Criar máscara direto em BGR (sem converter o frame para HSV)
+        mask = self._mascara_verde_pura(img)
 
         # Contar pixels da linha
         pixels_linha = cv2.countNonZero(mask)
@@ -365,8 +533,24 @@ class CalibradorVelocidade:
 
     def executar_tap(self, x, y):
         """Executa tap em coordenada específica"""
+        if self.toque is not None:
+            try:
+                self.toque.tap(x, y)
+                return True
+            except OSError as e:
+                print(f"⚠️ minitouch caiu, voltando para input tap: {e}")
+                self.toque.fechar()
+                self.toque = None
+
+        comando = f"input tap {x} {y}"
+        try:
+            self.shell_tap.enviar(comando)
+            return True
+        except Exception as e:
+            print(f"⚠️ Shell persistente falhou, usando shell avulso: {e}")
+
         try:
-            self.device.shell(f"input tap {x} {y}")
+            self.device.shell(comando)
             return True
         except Exception as e:
             print(f"❌ Erro ao executar tap: {e}")
@@ -452,6 +636,10 @@ class CalibradorVelocidade:
                     print(f"      🗺️ Destino mundo: ({destino_mundo_x}, {destino_mundo_y})")
                     print(f"      📏 A* calculou: {distancia_estimada}px = {tiles_astar:.1f} tiles")
 
+                    # Região do mapa onde a linha pode estar: comprimento
+                    # do caminho em px do mapa, com folga para desvios
+                    raio_linha = int(2 * tiles_astar * max(self.escala_x, self.escala_y)) + 40
+
                     # CONVERTER MUNDO → TELA DO MAPA
                     mapa_x, mapa_y = self.mundo_para_tela_mapa(
                         destino_mundo_x, destino_mundo_y,
@@ -473,13 +661,15 @@ class CalibradorVelocidade:
                     img_mapa = self.capturar_tela()
 
                     # Salvar screenshot para debug
+                    # (JPEG q=80: bem mais rápido que PNG no frame inteiro)
                     try:
-                        cv2.imwrite(f'DEBUG_linha_verde_{distancia_tiles}tiles_t{tentativa+1}.png', img_mapa)
-                        print(f"      💾 Debug salvo: DEBUG_linha_verde_{distancia_tiles}tiles_t{tentativa+1}.png")
+                        filename_debug = f'DEBUG_linha_verde_{distancia_tiles}tiles_t{tentativa+1}.jpg'
+                        cv2.imwrite(filename_debug, img_mapa, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                        print(f"      💾 Debug salvo: {filename_debug}")
                     except:
                         pass
 
-                    tiles_linha_verde = self.detectar_linha_verde_no_mapa(img_mapa)
+                    tiles_linha_verde = self.detectar_linha_verde_no_mapa(img_mapa, raio_linha)
 
                     if tiles_linha_verde is None or tiles_linha_verde == 0:
                         print("      ⚠️ Linha verde não detectada no mapa")
@@ -493,32 +683,22 @@ class CalibradorVelocidade:
 
                     # AGUARDAR MOVIMENTO COMPLETAR (MAPA AINDA ABERTO)
                     print(f"      ⏱️ Aguardando movimento completar...")
-                    tempo_inicio = time.time()
+                    tempo_inicio = time.perf_counter()
 
                     # Timeout baseado em distância (1 segundo por tile + margem)
                     timeout_movimento = tiles_linha_verde * 1.0 + 5.0
-                    timeout_final = time.time() + timeout_movimento
-
-                    movimento_completo = False
-                    while time.time() < timeout_final:
-                        # Verificar se personagem parou (pode usar GPS ou detecção visual)
-                        # Por simplicidade, vamos usar tempo estimado + pequena margem
-                        time.sleep(0.1)
-
-                        # Verificar se linha verde sumiu (movimento completo)
-                        img_check = self.capturar_tela()
-                        tiles_check = self.detectar_linha_verde_no_mapa(img_check)
-
-                        if tiles_check is None or tiles_check == 0:
-                            tempo_fim = time.time()
-                            duracao = tempo_fim - tempo_inicio
-                            movimento_completo = True
-                            print(f"      ✅ Movimento completo em {duracao:.3f}s")
-                            break
-
-                    if not movimento_completo:
+
+                    # Verificar se linha verde sumiu (movimento completo) a cada frame novo
+                    tempo_fim = self.aguardar_frame(
+                        lambda img: not self.detectar_linha_verde_no_mapa(img, raio_linha),
+                        timeout_movimento, depois_de=tempo_inicio)
+
+                    if tempo_fim is not None:
+                        duracao = tempo_fim - tempo_inicio
+                        print(f"      ✅ Movimento completo em {duracao:.3f}s")
+                    else:
                         # Timeout - assumir que chegou
-                        tempo_fim = time.time()
+                        tempo_fim = time.perf_counter()
                         duracao = tempo_fim - tempo_inicio
                         print(f"      ⚠️ Timeout - assumindo movimento completo em {duracao:.3f}s")
 
@@ -645,35 +825,24 @@ class CalibradorVelocidade:
         if linha_antes:
             print("   ⚠️ Linha verde já presente, aguardando...")
             # Aguardar movimento anterior terminar
-            timeout = time.time() + 10
-            while time.time() < timeout:
-                img = self.capturar_tela()
-                if img is not None and not self.detectar_linha_verde(img):
-                    print("   ✅ Movimento anterior finalizado")
-                    break
-                time.sleep(0.1)
-            else:
+            if self.aguardar_frame(lambda img: not self.detectar_linha_verde(img), 10) is None:
                 print("   ❌ Timeout aguardando movimento anterior")
                 return None
+            print("   ✅ Movimento anterior finalizado")
 
             time.sleep(0.5)  # Delay adicional
 
         # 2. Executar tap
         print(f"   🎯 Executando tap...")
+        tempo_tap = time.perf_counter()
         if not self.executar_tap(destino_x, destino_y):
             return None
 
         # 3. Aguardar linha verde aparecer (início do movimento)
-        tempo_inicio = None
-        timeout = time.time() + 3  # 3 segundos para linha verde aparecer
-
-        while time.time() < timeout:
-            img = self.capturar_tela()
-            if img is not None and self.detectar_linha_verde(img):
-                tempo_inicio = time.time()
-                print(f"   🟢 Linha verde detectada!")
-                break
-            time.sleep(0.05)  # 50ms entre verificações
+        # 3 segundos para linha verde aparecer; só frames capturados depois do tap
+        tempo_inicio = self.aguardar_frame(self.detectar_linha_verde, 3, depois_de=tempo_tap)
+        if tempo_inicio is not None:
+            print(f"   🟢 Linha verde detectada!")
 
         if tempo_inicio is None:
             print("   ⚠️ Linha verde não apareceu (movimento muito rápido ou destino inválido)")
@@ -682,16 +851,13 @@ class CalibradorVelocidade:
             return 0.5  # Retornar estimativa para movimentos muito curtos
 
         # 4. Aguardar linha verde desaparecer (fim do movimento)
-        timeout = time.time() + 15  # 15 segundos max para movimento
-
-        while time.time() < timeout:
-            img = self.capturar_tela()
-            if img is not None and not self.detectar_linha_verde(img):
-                tempo_fim = time.time()
-                duracao = tempo_fim - tempo_inicio
-                print(f"   ✅ Movimento completo em {duracao:.3f}s")
-                return duracao
-            time.sleep(0.05)  # 50ms entre verificações
+        # 15 segundos max para movimento
+        tempo_fim = self.aguardar_frame(
+            lambda img: not self.detectar_linha_verde(img), 15, depois_de=tempo_inicio)
+        if tempo_fim is not None:
+            duracao = tempo_fim - tempo_inicio
+            print(f"   ✅ Movimento completo em {duracao:.3f}s")
+            return duracao
 
         print("   ❌ Timeout aguardando fim do movimento")
         return None
@@ -934,3 +1100,7 @@ if __name__ == "__main__":
         # Limpar fast_capture
         if calibrador is not None and hasattr(calibrador, 'fast_capture'):
             calibrador.fast_capture.stop()
+        if calibrador is not None:
+            if calibrador.toque is not None:
+                calibrador.toque.fechar()
+            calibrador.shell_tap.fechar()
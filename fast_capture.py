@@ -17,20 +17,155 @@ import threading
 import queue
 import time
 import shutil
+import struct
+import os
+
+from minicap_capture import MinicapCapture, binarios_no_dispositivo
+
+
+def _formato_raw(raw):
+    """
+    Cabeçalho do `screencap` cru: width, height, format (uint32
+    little-endian) e, no Android 9+, mais um uint32 de colorspace (12 ou
+    16 bytes)
+
+    Returns:
+        (width, height, conversão cv2, tamanho do cabeçalho) ou None se
+        não for um formato conhecido
+    """
+    if not raw or len(raw) < 12:
+        return None
+    width, height, pixel_format = struct.unpack_from('<III', raw, 0)
+    cabecalho = len(raw) - width * height * 4
+
+    # PixelFormat: 1 = RGBA_8888, 2 = RGBX_8888 (4º byte ignorado), 5 = BGRA_8888
+    conversao = {1: cv2.COLOR_RGBA2BGR, 2: cv2.COLOR_RGBA2BGR,
+                 5: cv2.COLOR_BGRA2BGR}.get(pixel_format)
+    if cabecalho not in (12, 16) or conversao is None:
+        return None
+    return width, height, conversao, cabecalho
+
+
+# Dispositivos (serial) cujo screencap cru não foi reconhecido: vão
+# direto para o PNG, sem rodar os dois screencaps a cada captura
+_SEM_SCREENCAP_RAW = set()
+
+
+def _chave_dispositivo(device):
+    return getattr(device, 'serial', None) or id(device)
+
+
+def screencap_bytes(device):
+    """
+    Bytes do screenshot sem decodificar: `screencap` cru (sem -p) ou,
+    se o formato for desconhecido, o PNG
+
+    Evita comprimir PNG no Android e descomprimir aqui. O formato
+    desconhecido é lembrado por dispositivo (como ArcherFarmBot.screencap_raw).
+    """
+    chave = _chave_dispositivo(device)
+    if chave not in _SEM_SCREENCAP_RAW:
+        raw = device.shell("screencap", encoding=None)
+        if _formato_raw(raw) is not None:
+            return raw
+        print("⚠️ screencap cru não reconhecido, usando PNG")
+        _SEM_SCREENCAP_RAW.add(chave)
+    return device.shell("screencap -p", encoding=None)
+
+
+def decodificar_screencap_raw(raw, destino=None):
+    """
+    Converte a saída de `screencap` (sem -p) em imagem BGR
+
+    Args:
+        raw: Bytes (ou memoryview) da saída do screencap
+        destino: Opcional, função (height, width) → buffer BGR onde
+                 escrever o resultado em vez de alocar um novo
+
+    Returns:
+        Imagem BGR, ou None se o formato cru não for reconhecido
+    """
+    formato = _formato_raw(raw)
+    if formato is None:
+        return None
+
+    width, height, conversao, cabecalho = formato
+    pixels = np.frombuffer(raw, dtype=np.uint8, count=width * height * 4, offset=cabecalho)
+    if destino is None:
+        return cv2.cvtColor(pixels.reshape(height, width, 4), conversao)
+    return cv2.cvtColor(pixels.reshape(height, width, 4), conversao,
+                        dst=destino(height, width))
+
+
+def decodificar_screencap(dados):
+    """
+    Converte bytes de screencap_bytes em imagem BGR (ou None)
+
+    cvtColor/imdecode soltam o GIL: rodando em outra thread, a leitura
+    do próximo screenshot continua enquanto este é decodificado.
+    """
+    img = decodificar_screencap_raw(dados)
+    if img is not None:
+        return img
+
+    nparr = np.frombuffer(dados, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def screencap_bgr(device):
+    """
+    Screenshot BGR via `screencap` cru (sem -p); formato desconhecido
+    cai para o PNG
+
+    Args:
+        device: AdbDevice do adbutils
+
+    Returns:
+        Imagem BGR ou None
+    """
+    return decodificar_screencap(screencap_bytes(device))
+
+
+def _colocar_mais_novo(fila, item):
+    """put_nowait descartando o item antigo (fila de tamanho 1)"""
+    try:
+        fila.put_nowait(item)
+    except queue.Full:
+        try:
+            fila.get_nowait()
+        except queue.Empty:
+            pass
+        fila.put_nowait(item)
 
 
 class FastCapture:
     """Captura rápida com fallback automático adbnativeblitz → ADB"""
 
-    def __init__(self, device=None, preferred_method='auto'):
+    def __init__(self, device=None, preferred_method='auto', adb_em_thread=False):
         """
         Args:
             device: Device ppadb (para fallback ADB)
-            preferred_method: 'adbnativeblitz', 'adb', ou 'auto' (tenta adbnativeblitz primeiro)
+            preferred_method: 'adbnativeblitz', 'minicap', 'adb', ou 'auto'
+                              (adbnativeblitz → minicap, se a pasta minicap/ existir ou
+                              os binários já estiverem no dispositivo → adb)
+            adb_em_thread: No modo ADB, captura continuamente em uma thread
+                           (get_frame pega o último frame em vez de esperar o screencap)
         """
         self.device = device
         self.preferred_method = preferred_method
         self.active_method = None
+        self.adb_em_thread = adb_em_thread
+        self.adb_thread = None
+        self.adb_decode_thread = None
+        # Pipeline de 2 estágios: leitura (bytes) → decodificação (frame).
+        # (início do screencap, bytes/frame) - só o mais novo em cada fila
+        self.adb_raw_queue = queue.Queue(maxsize=1)
+        self.adb_queue = queue.Queue(maxsize=1)
+        # Conexão do `screencap` em loop (stream de frames crus)
+        self._adb_stream = None
+
+        # minicap (stream de JPEG por socket)
+        self.minicap = None
 
         # Extrair serial do device
         self.device_serial = None
@@ -55,27 +190,162 @@ class FastCapture:
             print("📱 Usando ADB screencap (~300ms latência)")
             return
 
+        if self.preferred_method == 'minicap':
+            self.active_method = 'minicap'
+            print("🚀 Usando minicap (~50ms latência)")
+            return
+
         # Verificar se adbnativeblitz está disponível
         try:
             import adbnativeblitz
             self.active_method = 'adbnativeblitz'
             print("🚀 Usando adbnativeblitz (~50-80ms latência)")
         except ImportError:
+            if self.device is not None and self._minicap_disponivel():
+                self.active_method = 'minicap'
+                print("🚀 Usando minicap (~50ms latência)")
+                return
             self.active_method = 'adb'
             print("📱 Usando ADB screencap (~300ms latência)")
             print("\n⚠️  ADBNATIVEBLITZ NÃO ENCONTRADO - Para captura 5x mais rápida:")
             print("    pip install adbnativeblitz")
             print()
 
+    def _minicap_disponivel(self):
+        """minicap pode ser iniciado: cópia local (minicap/) ou já enviado antes"""
+        if os.path.isdir('minicap'):
+            return True
+        try:
+            return binarios_no_dispositivo(self.device)
+        except Exception:
+            return False
+
     def start(self):
         """Inicia captura"""
         if self.active_method == 'adbnativeblitz':
             return self._start_adbnativeblitz()
+        elif self.active_method == 'minicap':
+            return self._start_minicap()
+        elif self.adb_em_thread and self.device is not None:
+            return self._start_adb_thread()
         else:
             # ADB não precisa start
             print("✅ ADB pronto para capturas")
             return True
 
+    def _start_minicap(self):
+        """Inicia captura via minicap (fallback para ADB se falhar)"""
+        try:
+            self.minicap = MinicapCapture(self.device)
+            self.minicap.start()
+            return True
+        except Exception as e:
+            print(f"⚠️ minicap falhou: {e}")
+            print("   Voltando para ADB...")
+            if self.minicap is not None:
+                self.minicap.stop()
+            self.minicap = None
+            self.active_method = 'adb'
+            return self.start()
+
+    def _start_adb_thread(self):
+        """Inicia o produtor de screencaps ADB (leitura + decodificação) em background"""
+        self.running = True
+        self.adb_thread = threading.Thread(target=self._adb_loop, name="adb-captura", daemon=True)
+        self.adb_decode_thread = threading.Thread(target=self._adb_decode_loop,
+                                                  name="adb-decode", daemon=True)
+        self.adb_thread.start()
+        self.adb_decode_thread.start()
+        print("✅ ADB pronto para capturas (thread de captura contínua)")
+        return True
+
+    def _adb_loop(self):
+        """
+        Loop de leitura ADB: só baixa os bytes do screencap
+
+        A decodificação do frame N roda em _adb_decode_loop enquanto
+        este loop já lê o N+1. Com screencap cru, os frames vêm todos
+        por uma conexão só (_adb_stream_loop); PNG cai para um shell
+        por frame.
+        """
+        while self.running:
+            inicio = time.perf_counter()
+            try:
+                dados = screencap_bytes(self.device)
+                if _formato_raw(dados) is not None:
+                    _colocar_mais_novo(self.adb_raw_queue, (inicio, dados))
+                    self._adb_stream_loop(len(dados))
+                    continue
+            except Exception as e:
+                if self.running:
+                    print(f"⚠️ Erro no loop ADB: {e}")
+                time.sleep(0.1)
+                continue
+
+            if dados:
+                _colocar_mais_novo(self.adb_raw_queue, (inicio, dados))
+
+    def _adb_stream_loop(self, tamanho):
+        """
+        Lê frames crus de um `screencap` em loop no dispositivo
+
+        Um shell só para todos os frames: sem conexão com o adb server,
+        autenticação e processo `sh` novos a cada captura. Todos os
+        frames têm o tamanho do primeiro (cabeçalho + pixels).
+
+        O screencap N+1 só começa depois que o N foi escrito por inteiro,
+        então o fim da leitura do N é o início da captura do próximo.
+
+        Args:
+            tamanho: Bytes de um frame (cabeçalho incluso)
+        """
+        conn = self.device.shell("while true; do screencap; done", stream=True)
+        self._adb_stream = conn
+        try:
+            inicio = time.perf_counter()
+            while self.running:
+                dados = bytearray(tamanho)
+                visao = memoryview(dados)
+                lidos = 0
+                while lidos < tamanho:
+                    parte = conn.read(tamanho - lidos)
+                    if not parte:
+                        return
+                    visao[lidos:lidos + len(parte)] = parte
+                    lidos += len(parte)
+
+                _colocar_mais_novo(self.adb_raw_queue, (inicio, dados))
+                inicio = time.perf_counter()
+        finally:
+            self._adb_stream = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _adb_decode_loop(self):
+        """Loop de decodificação: mantém só o frame mais novo na queue"""
+        while self.running:
+            try:
+                inicio, dados = self.adb_raw_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                frame = decodificar_screencap(dados)
+            except Exception as e:
+                print(f"⚠️ Erro ao decodificar screencap: {e}")
+                continue
+
+            if frame is None:
+                continue
+
+            self.last_frame = frame
+            self.last_frame_time = time.perf_counter()
+
+            # Atualizar queue (descarta o frame antigo)
+            _colocar_mais_novo(self.adb_queue, (inicio, frame))
+
     def _start_adbnativeblitz(self):
         """Inicia captura via adbnativeblitz"""
         try:
@@ -113,8 +383,8 @@ class FastCapture:
 
             # Aguardar primeiro frame
             print("⏳ Aguardando primeiro frame...")
-            timeout = time.time() + 5
-            while self.last_frame is None and time.time() < timeout:
+            timeout = time.perf_counter() + 5
+            while self.last_frame is None and time.perf_counter() < timeout:
                 time.sleep(0.1)
 
             if self.last_frame is not None:
@@ -141,8 +411,9 @@ class FastCapture:
                 if not self.running:
                     break
 
+                chegada = time.perf_counter()
                 self.last_frame = frame
-                self.last_frame_time = time.time()
+                self.last_frame_time = chegada
 
                 # Atualizar queue
                 try:
@@ -153,6 +424,9 @@ class FastCapture:
                     except queue.Empty:
                         pass
                     self.frame_queue.put_nowait(frame)
+
+                # Frames com tempo para get_frame_com_tempo/depois_de
+                _colocar_mais_novo(self.adb_queue, (chegada, frame))
         except Exception as e:
             if self.running:
                 print(f"⚠️ Erro no loop adbnativeblitz: {e}")
@@ -204,8 +478,8 @@ class FastCapture:
 
             # Aguardar primeiro frame
             print("⏳ Aguardando primeiro frame...")
-            timeout = time.time() + 5
-            while self.last_frame is None and time.time() < timeout:
+            timeout = time.perf_counter() + 5
+            while self.last_frame is None and time.perf_counter() < timeout:
                 time.sleep(0.1)
 
             if self.last_frame is not None:
@@ -286,7 +560,7 @@ class FastCapture:
                     frame = frame.reshape((height, width, 3))
 
                     self.last_frame = frame
-                    self.last_frame_time = time.time()
+                    self.last_frame_time = time.perf_counter()
                     frames_recebidos += 1
 
                     # Atualizar queue
@@ -309,10 +583,23 @@ class FastCapture:
         except Exception as e:
             print(f"❌ Erro no loop scrcpy: {e}")
 
-    def get_frame(self, timeout=1.0):
-        """Captura frame (automático via adbnativeblitz ou ADB)"""
+    def get_frame(self, timeout=1.0, depois_de=None):
+        """
+        Captura frame (automático via adbnativeblitz ou ADB)
+
+        Args:
+            timeout: Espera máxima por um frame (s)
+            depois_de: time.perf_counter() mínimo do início da captura; com a thread
+                       ADB, descarta frames que começaram antes (ex: do tap)
+        """
         if self.active_method == 'adbnativeblitz':
+            if depois_de is not None:
+                return self._get_frame_adb_thread(timeout, depois_de)[0]
             return self._get_frame_adbnativeblitz(timeout)
+        elif self.active_method == 'minicap':
+            return self.minicap.get_frame(timeout, depois_de)
+        elif self.adb_thread is not None:
+            return self._get_frame_adb_thread(timeout, depois_de)[0]
         else:
             return self._get_frame_adb()
 
@@ -323,7 +610,7 @@ class FastCapture:
 
         # Retornar último frame se recente
         if self.last_frame is not None:
-            age = time.time() - self.last_frame_time
+            age = time.perf_counter() - self.last_frame_time
             if age < 1.0:
                 return self.last_frame.copy()
 
@@ -341,7 +628,7 @@ class FastCapture:
 
         # Retornar último frame se recente
         if self.last_frame is not None:
-            age = time.time() - self.last_frame_time
+            age = time.perf_counter() - self.last_frame_time
             if age < 1.0:
                 return self.last_frame.copy()
 
@@ -352,15 +639,52 @@ class FastCapture:
         except queue.Empty:
             return None
 
+    def get_frame_com_tempo(self, timeout=1.0, depois_de=None):
+        """
+        Como get_frame, mas devolve (frame, tempo) com o time.perf_counter() do
+        início da captura - o instante que o frame mostra, não o de quando
+        ele chegou aqui (útil para medir tempo de movimento)
+        """
+        if self.active_method == 'minicap':
+            return self.minicap.get_frame_com_tempo(timeout, depois_de)
+        if self.active_method == 'adbnativeblitz' or self.adb_thread is not None:
+            # Frame novo, com o tempo do próprio frame (não o do último)
+            return self._get_frame_adb_thread(timeout, depois_de)
+
+        inicio = time.perf_counter()
+        frame = self.get_frame(timeout, depois_de)
+        return frame, inicio
+
+    def _get_frame_adb_thread(self, timeout=1.0, depois_de=None):
+        """
+        Pega (frame, tempo) mais novo ainda não consumido do produtor em
+        background (thread ADB ou adbnativeblitz)
+        """
+        limite = time.perf_counter() + timeout
+        while self.running:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                return None, None
+
+            # Frame ainda não consumido: nenhuma cópia, o produtor não reutiliza
+            try:
+                inicio, frame = self.adb_queue.get(timeout=restante)
+            except queue.Empty:
+                return None, None
+
+            if depois_de is None or inicio >= depois_de:
+                if self.active_method == 'adbnativeblitz':
+                    frame = frame.copy()  # o iterador pode reaproveitar o buffer
+                return frame, inicio
+        return None, None
+
     def _get_frame_adb(self):
         """Captura via ADB (fallback)"""
         if self.device is None:
             raise Exception("Device ADB não fornecido para fallback")
 
         try:
-            screenshot_bytes = self.device.shell("screencap -p", encoding=None)
-            nparr = np.frombuffer(screenshot_bytes, np.uint8)
-            return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            return screencap_bgr(self.device)
         except Exception as e:
             print(f"❌ Erro ao capturar via ADB: {e}")
             return None
@@ -381,10 +705,29 @@ class FastCapture:
 
             print("✅ adbnativeblitz parado")
 
+        elif self.active_method == 'minicap':
+            self.minicap.stop()
+            print("✅ minicap parado")
+
+        elif self.adb_thread is not None:
+            self.running = False
+            # Desbloqueia o read do stream de screencap
+            if self._adb_stream is not None:
+                try:
+                    self._adb_stream.close()
+                except Exception:
+                    pass
+            self.adb_thread.join(timeout=2)
+            self.adb_decode_thread.join(timeout=2)
+            self.adb_thread = None
+            self.adb_decode_thread = None
+
     def get_latency_estimate(self):
         """Retorna estimativa de latência do método ativo"""
         if self.active_method == 'adbnativeblitz':
             return 0.06  # ~60ms
+        elif self.active_method == 'minicap':
+            return 0.05  # ~50ms
         else:
             return 0.30  # ~300ms
 
@@ -412,9 +755,9 @@ if __name__ == "__main__":
         print("\n🧪 Testando scrcpy...")
         if capture.start():
             for i in range(5):
-                start = time.time()
+                start = time.perf_counter()
                 frame = capture.get_frame()
-                latency = (time.time() - start) * 1000
+                latency = (time.perf_counter() - start) * 1000
 
                 if frame is not None:
                     h, w = frame.shape[:2]
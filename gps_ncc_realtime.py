@@ -21,9 +21,17 @@ import numpy as np
 from skimage.feature import match_template
 from skimage import img_as_float
 from adbutils import adb
+from fast_capture import screencap_bgr
 import json
 import time
 import os
+import hashlib
+
+try:
+    import xxhash
+    XXHASH_DISPONIVEL = True
+except ImportError:
+    XXHASH_DISPONIVEL = False
 
 
 # Tabela de cores das zonas
@@ -62,6 +70,9 @@ class GPSRealtimeNCC:
         # 3. Carregar mapas de referência
         self.load_maps()
 
+        # Cache da última posição: (hash do recorte do mapa, resultado)
+        self._pos_cache = None
+
         print("✅ GPS Realtime inicializado com sucesso!\n")
 
     def connect_device(self):
@@ -111,10 +122,8 @@ class GPSRealtimeNCC:
             print(f"   ✅ Mapa colorido: {self.mapa_colorido.shape[1]}x{self.mapa_colorido.shape[0]} pixels")
 
     def capture_screen(self):
-        """Captura screenshot do BlueStacks via ADB"""
-        screenshot_bytes = self.device.shell("screencap -p", encoding=None)
-        nparr = np.frombuffer(screenshot_bytes, np.uint8)
-        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        """Captura screenshot do BlueStacks via ADB (screencap cru, sem PNG)"""
+        return screencap_bgr(self.device)
 
     def click_button(self, button_type):
         """Clica em um botão (open_map ou close_map)"""
@@ -387,7 +396,8 @@ class GPSRealtimeNCC:
         cv2.imwrite(filename_map, mapa_visual)
         print(f"   ✅ Mapa salvo: {filename_map}")
 
-    def get_current_position(self, keep_map_open=False, verbose=True, map_already_open=False):
+    def get_current_position(self, keep_map_open=False, verbose=True, map_already_open=False,
+                             usar_cache=False):
         """
         FUNÇÃO PRINCIPAL: Obtém posição atual do player
 
@@ -395,6 +405,9 @@ class GPSRealtimeNCC:
             keep_map_open: Se True, mantém mapa aberto após captura
             verbose: Se True, mostra detalhes no console
             map_already_open: Se True, não abre o mapa (assume que já está aberto)
+            usar_cache: Se True e o recorte do mapa for idêntico ao da última
+                        chamada (player parado), reaproveita o resultado sem NCC.
+                        Para verificações repetidas, não para o primeiro fix.
 
         Returns:
             dict com:
@@ -428,6 +441,16 @@ class GPSRealtimeNCC:
             print("3️⃣ Extraindo região do mapa...")
         map_region = self.extract_map_region(screenshot)
 
+        # Mesma cena da última chamada → mesma posição
+        chave = self._hash_recorte(map_region) if usar_cache else None
+        if chave is not None and self._pos_cache is not None and self._pos_cache[0] == chave:
+            if verbose:
+                print("   ♻️ Cena idêntica à anterior, reaproveitando posição (sem NCC)")
+            if not keep_map_open:
+                self.click_button('close')
+                time.sleep(0.4)
+            return dict(self._pos_cache[1])
+
         # 4. Aplicar levels
         if verbose:
             print("4️⃣ Aplicando processamento (levels)...")
@@ -485,8 +508,19 @@ class GPSRealtimeNCC:
             print(f"📊 Confiança: {confidence}%")
             print("=" * 60 + "\n")
 
+        if chave is None:
+            chave = self._hash_recorte(map_region)
+        self._pos_cache = (chave, dict(resultado))
+
         return resultado
 
+    def _hash_recorte(self, map_region):
+        """Hash de uma miniatura 80x45 do recorte do mapa (chave do cache de posição)"""
+        miniatura = cv2.resize(map_region, (80, 45), interpolation=cv2.INTER_AREA)
+        if XXHASH_DISPONIVEL:
+            return xxhash.xxh3_64_intdigest(miniatura.tobytes())
+        return hashlib.blake2b(miniatura.tobytes(), digest_size=8).digest()
+
 
 def test_gps_realtime():
     """Teste: Captura posição 5 vezes em intervalos"""
@@ -0,0 +1,224 @@
+"""
+MINICAP CAPTURE - Frames contínuos via minicap (socket aberto)
+
+O minicap fica rodando no dispositivo e manda um JPEG por frame em um
+socket local: sem subir o `screencap` a cada captura. Os frames chegam
+com ~30-60 FPS, decodificados aqui em uma thread.
+
+Binários: prebuilt do openstf/minicap em
+    minicap/<abi>/minicap
+    minicap/<abi>/lib/android-<sdk>/minicap.so
+Se já estiverem em /data/local/tmp no dispositivo, não precisa da cópia local.
+
+Protocolo: cabeçalho global de 24 bytes, depois cada frame é um
+uint32 little-endian com o tamanho + o JPEG.
+"""
+
+import os
+import socket
+import struct
+import threading
+import queue
+import time
+
+import cv2
+import numpy as np
+
+PASTA_REMOTA = "/data/local/tmp"
+PORTA_LOCAL = 1313
+
+
+def binarios_no_dispositivo(device):
+    """True se minicap e minicap.so já estão em PASTA_REMOTA no dispositivo"""
+    saida = device.shell(f"ls {PASTA_REMOTA}/minicap {PASTA_REMOTA}/minicap.so")
+    return "No such file" not in saida and saida.strip().endswith("minicap.so")
+
+
+class MinicapCapture:
+    """Captura frames via minicap em tempo real"""
+
+    def __init__(self, device, porta=PORTA_LOCAL):
+        """
+        Args:
+            device: AdbDevice do adbutils
+            porta: Porta TCP local encaminhada para o socket do minicap
+        """
+        self.device = device
+        self.porta = porta
+
+        self._processo = None
+        self._sock = None
+        self.capture_thread = None
+        # (chegada, frame) - só o mais novo
+        self.frame_queue = queue.Queue(maxsize=1)
+        self.running = False
+        self.last_frame = None
+        self.last_frame_time = 0
+
+    def start(self, timeout=5.0):
+        """
+        Envia (se preciso) e inicia o minicap, conecta e começa a ler frames
+
+        Raises:
+            RuntimeError/OSError se o minicap não puder ser iniciado
+        """
+        self._garantir_binarios()
+
+        # minicap quer o tamanho na orientação natural do painel + a rotação
+        # (como no MinitouchTap.abrir): window_size() já vem trocado em 90°/270°
+        rotacao = self.device.rotation()
+        largura, altura = self.device.window_size()
+        if rotacao % 2:
+            largura, altura = altura, largura
+        tamanho = f"{largura}x{altura}"
+        self._processo = self.device.shell(
+            f"LD_LIBRARY_PATH={PASTA_REMOTA} {PASTA_REMOTA}/minicap "
+            f"-P {tamanho}@{tamanho}/{rotacao * 90}",
+            stream=True)
+        self.device.forward(f"tcp:{self.porta}", "localabstract:minicap")
+
+        # O socket abstrato só existe depois que o minicap sobe
+        limite = time.perf_counter() + timeout
+        while True:
+            try:
+                self._sock = socket.create_connection(("127.0.0.1", self.porta), timeout=timeout)
+                self._ler_cabecalho()
+                break
+            except (OSError, RuntimeError):
+                self._fechar_socket()
+                if time.perf_counter() > limite:
+                    self.stop()
+                    raise
+                time.sleep(0.2)
+
+        self._sock.settimeout(None)
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, name="minicap", daemon=True)
+        self.capture_thread.start()
+        print(f"✅ minicap ativo! Resolução natural: {tamanho}, rotação {rotacao * 90}°")
+
+    def _garantir_binarios(self):
+        """Copia minicap e minicap.so para o dispositivo se ainda não estiverem lá"""
+        if binarios_no_dispositivo(self.device):
+            return
+
+        abi = self.device.getprop("ro.product.cpu.abi").strip()
+        sdk = self.device.getprop("ro.build.version.sdk").strip()
+        binario = os.path.join("minicap", abi, "minicap")
+        biblioteca = os.path.join("minicap", abi, "lib", f"android-{sdk}", "minicap.so")
+        for local in (binario, biblioteca):
+            if not os.path.exists(local):
+                raise RuntimeError(f"minicap não encontrado ({local})")
+
+        self.device.push(binario, f"{PASTA_REMOTA}/minicap")
+        self.device.push(biblioteca, f"{PASTA_REMOTA}/minicap.so")
+        self.device.shell(f"chmod 755 {PASTA_REMOTA}/minicap")
+
+    def _ler_exato(self, n):
+        """Lê exatamente n bytes do socket"""
+        dados = bytearray(n)
+        visao = memoryview(dados)
+        lidos = 0
+        while lidos < n:
+            k = self._sock.recv_into(visao[lidos:])
+            if k == 0:
+                raise RuntimeError("minicap fechou a conexão")
+            lidos += k
+        return dados
+
+    def _ler_cabecalho(self):
+        """Cabeçalho global: versão, tamanho do cabeçalho, pid, tamanhos, orientação"""
+        versao, tamanho = struct.unpack("<BB", self._ler_exato(2))
+        resto = self._ler_exato(tamanho - 2)
+        if versao != 1 or len(resto) < 22:
+            raise RuntimeError(f"cabeçalho do minicap inválido (versão {versao})")
+
+    def _capture_loop(self):
+        """Lê e decodifica frames; mantém só o mais novo na queue"""
+        try:
+            while self.running:
+                (tamanho,) = struct.unpack("<I", self._ler_exato(4))
+                jpeg = self._ler_exato(tamanho)
+                chegada = time.perf_counter()
+
+                frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+
+                self.last_frame = frame
+                self.last_frame_time = chegada
+
+                # Atualizar queue (descarta o frame antigo)
+                item = (chegada, frame)
+                try:
+                    self.frame_queue.put_nowait(item)
+                except queue.Full:
+                    try:
+                        self.frame_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self.frame_queue.put_nowait(item)
+        except Exception as e:
+            if self.running:
+                print(f"⚠️ Erro no loop minicap: {e}")
+            self.running = False
+
+    def get_frame_com_tempo(self, timeout=1.0, depois_de=None):
+        """
+        Frame mais novo e o time.perf_counter() em que chegou
+
+        O minicap só manda frame quando a tela muda: sem depois_de, o último
+        frame recebido (mesmo antigo) é a tela atual e volta na hora, em vez
+        de esperar o timeout numa tela parada. Com depois_de, espera um
+        frame ainda não consumido que chegou depois disso.
+
+        Args:
+            timeout: Espera máxima por um frame (s)
+            depois_de: Descarta frames que chegaram antes disso
+
+        Returns:
+            (frame BGR, tempo) ou (None, None)
+        """
+        if depois_de is None and self.running and self.last_frame is not None:
+            return self.last_frame.copy(), self.last_frame_time
+
+        limite = time.perf_counter() + timeout
+        while self.running:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                chegada, frame = self.frame_queue.get(timeout=restante)
+            except queue.Empty:
+                break
+            if depois_de is None or chegada >= depois_de:
+                return frame, chegada
+        return None, None
+
+    def get_frame(self, timeout=1.0, depois_de=None):
+        """Frame mais novo (BGR) ou None"""
+        return self.get_frame_com_tempo(timeout, depois_de)[0]
+
+    def _fechar_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def stop(self):
+        """Para a leitura e encerra o minicap"""
+        self.running = False
+        self._fechar_socket()
+
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2)
+            self.capture_thread = None
+
+        if self._processo is not None:
+            try:
+                self._processo.close()
+            except Exception:
+                pass
+            self._processo = None
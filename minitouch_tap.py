@@ -0,0 +1,171 @@
+"""
+MINITOUCH TAP - Taps por socket persistente (minitouch)
+
+`adb shell input tap` sobe um app_process Java no Android a cada toque
+(~150-300ms). O minitouch fica rodando no dispositivo e recebe os
+toques por um socket já aberto: cada tap é uma escrita de poucos bytes.
+
+Binário: prebuilt do openstf/minitouch em minitouch/<abi>/minitouch
+(ex: minitouch/arm64-v8a/minitouch). Se já estiver em /data/local/tmp
+no dispositivo, não precisa da cópia local.
+
+Uso:
+    toque = MinitouchTap(device)
+    toque.abrir()
+    toque.tap(800, 450)
+    toque.fechar()
+"""
+
+import os
+import socket
+import threading
+import time
+
+CAMINHO_REMOTO = "/data/local/tmp/minitouch"
+PORTA_LOCAL = 1111
+
+
+class MinitouchTap:
+    """Cliente minitouch: um socket aberto para todos os taps"""
+
+    def __init__(self, device, porta=PORTA_LOCAL):
+        """
+        Args:
+            device: AdbDevice do adbutils
+            porta: Porta TCP local encaminhada para o socket do minitouch
+        """
+        self.device = device
+        self.porta = porta
+        self._sock = None
+        self._processo = None
+        self._lock = threading.Lock()
+
+        # Do cabeçalho do minitouch (coordenadas do touch panel)
+        self.max_x = None
+        self.max_y = None
+        self.pressao = 50
+
+        # Tamanho da tela na orientação natural do painel e rotação atual
+        # (0-3, Surface.ROTATION_*): os taps chegam na orientação da tela
+        self.largura_natural = None
+        self.altura_natural = None
+        self.rotacao = 0
+
+    def abrir(self, timeout=3.0):
+        """
+        Envia (se preciso) e inicia o minitouch, encaminha a porta e conecta
+
+        Raises:
+            RuntimeError/OSError se o minitouch não puder ser iniciado
+        """
+        self._garantir_binario()
+
+        # Processo no dispositivo fica vivo enquanto este stream estiver aberto
+        self._processo = self.device.shell(CAMINHO_REMOTO, stream=True)
+        self.device.forward(f"tcp:{self.porta}", "localabstract:minitouch")
+
+        # O socket abstrato só existe depois que o minitouch sobe
+        limite = time.perf_counter() + timeout
+        while True:
+            try:
+                self._sock = socket.create_connection(("127.0.0.1", self.porta), timeout=timeout)
+                self._ler_cabecalho()
+                break
+            except (OSError, RuntimeError):
+                self._fechar_socket()
+                if time.perf_counter() > limite:
+                    raise
+                time.sleep(0.1)
+
+        self._sock.settimeout(None)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # window_size() já vem trocado em 90°/270°; o painel do minitouch
+        # fica sempre na orientação natural
+        self.rotacao = self.device.rotation()
+        largura, altura = self.device.window_size()
+        if self.rotacao % 2:
+            largura, altura = altura, largura
+        self.largura_natural, self.altura_natural = largura, altura
+        print(f"   ✅ minitouch ativo (touch {self.max_x}x{self.max_y}, "
+              f"tela natural {largura}x{altura}, rotação {self.rotacao * 90}°)")
+
+    def _garantir_binario(self):
+        """Copia o minitouch para o dispositivo se ainda não estiver lá"""
+        if self.device.shell(f"ls {CAMINHO_REMOTO}").strip() == CAMINHO_REMOTO:
+            return
+
+        abi = self.device.getprop("ro.product.cpu.abi").strip()
+        local = os.path.join("minitouch", abi, "minitouch")
+        if not os.path.exists(local):
+            raise RuntimeError(f"minitouch não encontrado ({local})")
+
+        self.device.push(local, CAMINHO_REMOTO)
+        self.device.shell(f"chmod 755 {CAMINHO_REMOTO}")
+
+    def _ler_cabecalho(self):
+        """
+        Lê o banner do minitouch:
+            v <versão>
+            ^ <max contatos> <max x> <max y> <max pressão>
+            $ <pid>
+        """
+        arquivo = self._sock.makefile("rb")
+        try:
+            for _ in range(3):
+                linha = arquivo.readline().decode(errors="replace").split()
+                if not linha:
+                    raise RuntimeError("minitouch fechou a conexão")
+                if linha[0] == "^":
+                    self.max_x = int(linha[2])
+                    self.max_y = int(linha[3])
+                    self.pressao = min(50, int(linha[4])) or 50
+        finally:
+            arquivo.close()
+
+        if self.max_x is None:
+            raise RuntimeError("cabeçalho do minitouch inválido")
+
+    def tap(self, x, y):
+        """
+        Toca em (x, y) da tela
+
+        A rotação é lida no abrir(): o jogo fica sempre na mesma orientação.
+
+        Args:
+            x, y: Coordenadas da tela (as mesmas do `input tap`)
+        """
+        # Girar para a orientação natural (jogo em paisagem num aparelho
+        # retrato: rotação 1 ou 3)
+        w, h = self.largura_natural, self.altura_natural
+        if self.rotacao == 1:
+            x, y = w - y, x
+        elif self.rotacao == 2:
+            x, y = w - x, h - y
+        elif self.rotacao == 3:
+            x, y = y, h - x
+
+        # Touch panel pode ter resolução diferente da tela
+        tx = min(self.max_x, max(0, int(x * self.max_x / w)))
+        ty = min(self.max_y, max(0, int(y * self.max_y / h)))
+        comando = f"d 0 {tx} {ty} {self.pressao}\nc\nu 0\nc\n".encode()
+        with self._lock:
+            self._sock.sendall(comando)
+
+    def _fechar_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def fechar(self):
+        """Fecha o socket e encerra o minitouch"""
+        with self._lock:
+            self._fechar_socket()
+        if self._processo is not None:
+            try:
+                self._processo.close()
+            except Exception:
+                pass
+            self._processo = None
@@ -46,6 +46,20 @@ ZONAS_DISPONIVEIS = {
 class NavegadorAutomaticoNCC:
     """Navegador automático usando NCC para GPS"""
 
+    # Range de verde PURO (#00ff00) em HSV: H=60 (±10 para tolerância).
+    # CIANO é H=90, então range 50-70 evita pegar ciano. uint8 e montados
+    # uma vez só (o inRange não converte os limites a cada chamada)
+    VERDE_LOWER = np.array([50, 180, 180], dtype=np.uint8)  # Verde puro, saturação e valor altos
+    VERDE_UPPER = np.array([70, 255, 255], dtype=np.uint8)  # Não pega ciano (H=90)
+    # Segunda faixa (OR com a primeira): borda da linha misturada com o
+    # fundo escuro do mapa - continua bem saturada, mas com V mais baixo.
+    # Saturação alta evita pegar grama e outros verdes do mapa
+    VERDE_BORDA_LOWER = np.array([50, 220, 120], dtype=np.uint8)
+    VERDE_BORDA_UPPER = np.array([70, 255, 255], dtype=np.uint8)
+
+    # Pixels ao redor do centro do mapa ignorados (player ciano)
+    RAIO_EXCLUSAO_CENTRO = 40
+
     def __init__(self):
         """Inicializa navegador"""
         print("🚀 Inicializando Navegador Automático com NCC...")
@@ -85,6 +99,9 @@ class NavegadorAutomaticoNCC:
         self.wait_after_click = 0.3  # Tempo de espera após clique para garantir que comando foi processado
         self.max_steps = 100  # Máximo de passos para evitar loop infinito
         self.tolerance_pixels = 30  # Tolerância para considerar "chegou" (em pixels)
+
+        # Buffers HSV/máscara do detectar_linha_verde (ver _buffers_linha_verde)
+        self._buffers_verde = None
         
         # Visualização em tempo real
         self.show_visualization = True
@@ -305,35 +322,25 @@ class NavegadorAutomaticoNCC:
         # Aplicar levels (mesma transformação do GPS)
         map_processed = self.gps.apply_levels(map_region)
 
-        # Converter para HSV
-        hsv = cv2.cvtColor(map_processed, cv2.COLOR_BGR2HSV)
-
-        # Range de verde PURO (#00ff00)
-        # Verde puro em HSV: H=60 (±10 para tolerância)
-        # CIANO é H=90, então range 50-70 evita pegar ciano
-        lower_green = np.array([50, 180, 180])  # Verde puro, saturação e valor altos
-        upper_green = np.array([70, 255, 255])  # Não pega ciano (H=90)
+        # Checagem grossa (1 a cada 2 px em cada eixo, 4x menos pixels):
+        # parado não há nenhum verde e a resposta sai aqui. Com passo 2,
+        # uma linha de 2+ px de espessura sempre cruza uma linha/coluna par
+        # da amostra (com passo 4, uma reta horizontal de 3 px escapava)
+        if not self._tem_verde_amostra(map_processed[::2, ::2]):
+            return (False, 0.0) if return_ratio else False
 
-        # Máscara de verde
-        green_mask = cv2.inRange(hsv, lower_green, upper_green)
+        # Converter para HSV e criar máscara de verde (nos buffers, sem alocar)
+        hsv, green_mask, borda_mask, fora_centro = self._buffers_linha_verde(map_processed.shape)
+        cv2.cvtColor(map_processed, cv2.COLOR_BGR2HSV, dst=hsv)
+        cv2.inRange(hsv, self.VERDE_LOWER, self.VERDE_UPPER, dst=green_mask)
+        cv2.inRange(hsv, self.VERDE_BORDA_LOWER, self.VERDE_BORDA_UPPER, dst=borda_mask)
+        cv2.bitwise_or(green_mask, borda_mask, dst=green_mask)
 
         # IMPORTANTE: Remover região central (onde fica o player ciano)
-        # Player está sempre no centro do mapa
-        height, width = green_mask.shape
-        centro_x = width // 2
-        centro_y = height // 2
-        raio_exclusao = 40  # Pixels ao redor do centro (aumentado)
-
-        # Criar máscara para excluir centro
-        y_indices, x_indices = np.ogrid[:height, :width]
-        distancia_centro = np.sqrt((x_indices - centro_x)**2 + (y_indices - centro_y)**2)
-        mascara_centro = distancia_centro > raio_exclusao
-
-        # Aplicar exclusão do centro
-        green_mask = green_mask & mascara_centro.astype(np.uint8) * 255
+        cv2.bitwise_and(green_mask, fora_centro, dst=green_mask)
 
         # Contar pixels verdes (excluindo centro)
-        green_pixels = np.sum(green_mask > 0)
+        green_pixels = cv2.countNonZero(green_mask)
         total_pixels = green_mask.shape[0] * green_mask.shape[1]
 
         if total_pixels == 0:
@@ -355,6 +362,33 @@ class NavegadorAutomaticoNCC:
             return (is_moving, green_percentage)
         return is_moving
 
+    def _tem_verde_amostra(self, amostra):
+        """True se algum pixel da amostra (subamostrada) cai nas faixas de verde"""
+        hsv = cv2.cvtColor(amostra, cv2.COLOR_BGR2HSV)
+        return (cv2.inRange(hsv, self.VERDE_LOWER, self.VERDE_UPPER).any()
+                or cv2.inRange(hsv, self.VERDE_BORDA_LOWER, self.VERDE_BORDA_UPPER).any())
+
+    def _buffers_linha_verde(self, shape):
+        """
+        (hsv, máscara, máscara da borda, fora_centro) reaproveitados entre chamadas
+
+        fora_centro é 255 fora do círculo de RAIO_EXCLUSAO_CENTRO em volta
+        do centro do mapa (player está sempre no centro) e só é
+        recalculado se o tamanho da região do mapa mudar.
+        """
+        height, width = shape[:2]
+        if self._buffers_verde is None or self._buffers_verde[1].shape != (height, width):
+            y_indices, x_indices = np.ogrid[:height, :width]
+            distancia2 = (x_indices - width // 2) ** 2 + (y_indices - height // 2) ** 2
+            fora_centro = np.where(distancia2 > self.RAIO_EXCLUSAO_CENTRO ** 2, 255, 0).astype(np.uint8)
+            self._buffers_verde = (
+                np.empty((height, width, 3), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                np.empty((height, width), dtype=np.uint8),
+                fora_centro,
+            )
+        return self._buffers_verde
+
     def aguardar_chegada(self, destino_x, destino_y, x_antes, y_antes, max_wait=10.0, use_gps_confirm=True):
         """
         Aguarda player chegar no destino clicado
@@ -422,7 +456,8 @@ class NavegadorAutomaticoNCC:
             # Verificar com GPS se player andou
             if use_gps_confirm:
                 print(f"      🔍 Verificando se player andou (GPS)...")
-                pos_depois = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True)
+                pos_depois = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True,
+                                                           usar_cache=True)
                 x_depois, y_depois = pos_depois['x'], pos_depois['y']
 
                 # Calcular movimento (delta X e Y)
@@ -514,7 +549,8 @@ class NavegadorAutomaticoNCC:
                     # FASE 3: CONFIRMAÇÃO POR GPS
                     if use_gps_confirm:
                         print(f"      🔍 Confirmando com GPS...")
-                        pos_atual = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True)
+                        pos_atual = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True,
+                                                                  usar_cache=True)
                         x_atual, y_atual = pos_atual['x'], pos_atual['y']
                         dist = self.calcular_distancia(x_atual, y_atual, destino_x, destino_y)
 
@@ -538,7 +574,8 @@ class NavegadorAutomaticoNCC:
         # Verificação final por GPS
         if use_gps_confirm:
             print(f"      🔍 Verificação final com GPS...")
-            pos_atual = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True)
+            pos_atual = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True,
+                                                      usar_cache=True)
             x_atual, y_atual = pos_atual['x'], pos_atual['y']
             dist = self.calcular_distancia(x_atual, y_atual, destino_x, destino_y)
 
@@ -554,6 +591,13 @@ class NavegadorAutomaticoNCC:
     def calcular_distancia(self, x1, y1, x2, y2):
         """Calcula distância euclidiana entre dois pontos"""
         return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+
+    @staticmethod
+    def _dist_sq(x1, y1, x2, y2):
+        """Distância ao quadrado (para comparar/achar o mínimo sem sqrt)"""
+        dx = x2 - x1
+        dy = y2 - y1
+        return dx * dx + dy * dy
     
     def _atualizar_visualizacao(self, vis_state):
         """
@@ -611,7 +655,7 @@ class NavegadorAutomaticoNCC:
                 indice_atual = 0
                 dist_minima = float('inf')
                 for i, (px, py) in enumerate(vis_state['path_completo']):
-                    dist = self.calcular_distancia(vis_state['x_atual'], vis_state['y_atual'], px, py)
+                    dist = self._dist_sq(vis_state['x_atual'], vis_state['y_atual'], px, py)
                     if dist < dist_minima:
                         dist_minima = dist
                         indice_atual = i
@@ -988,7 +1032,7 @@ class NavegadorAutomaticoNCC:
             
             # Procurar ponto do path mais próximo da posição inicial
             for i, (px, py) in enumerate(path_completo):
-                dist = self.calcular_distancia(x_inicial, y_inicial, px, py)
+                dist = self._dist_sq(x_inicial, y_inicial, px, py)
                 if dist < dist_minima_encontrada:
                     dist_minima_encontrada = dist
                     indice_mais_proximo = i
@@ -1024,7 +1068,8 @@ class NavegadorAutomaticoNCC:
 
             # 1. CAPTURAR TELA ATUAL e obter posição atual (mapa JÁ está aberto)
             print("   1️⃣ Capturando tela atual e obtendo posição...")
-            pos = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True)
+            pos = self.gps.get_current_position(keep_map_open=True, verbose=False, map_already_open=True,
+                                                usar_cache=True)
             x_atual, y_atual = pos['x'], pos['y']
             print(f"      📍 Posição atual: ({x_atual}, {y_atual}) - {pos['zone']}")
             
@@ -1151,7 +1196,7 @@ class NavegadorAutomaticoNCC:
                         # Procurar do índice atual até o final do path
                         for i in range(indice_waypoint_atual, len(path_completo)):
                             px, py = path_completo[i]
-                            dist = self.calcular_distancia(x_atual, y_atual, px, py)
+                            dist = self._dist_sq(x_atual, y_atual, px, py)
                             
                             # Se encontrou ponto mais próximo E está à frente (índice maior)
                             if dist < dist_minima_encontrada:
@@ -1159,7 +1204,7 @@ class NavegadorAutomaticoNCC:
                                 indice_mais_proximo = i
                         
                         # Se encontrou ponto mais próximo, atualizar índice
-                        if dist_minima_encontrada < dist_minima_para_atualizar:
+                        if dist_minima_encontrada < dist_minima_para_atualizar ** 2:
                             indice_waypoint_atual = indice_mais_proximo + 1  # +1 para estar à frente
                             if indice_waypoint_atual >= len(path_completo):
                                 indice_waypoint_atual = len(path_completo) - 1